@@ -2,10 +2,35 @@ import streamlit as st
 import os
 import pandas as pd
 import time
-from utils import extract_text_from_pdf, extract_text_from_pptx
-from flashcard_generator import generate_flashcards, Flashcard, get_sample_flashcards
+from utils import PAGE_BREAK, extract_text_from_upload, extraction_cache
+from cache import response_cache
+from card_parser import get_parse_stats
+from deck import Deck
+from deck_format import CorruptDeckError, DeckFile
+from deck_io import (
+    FORMATS,
+    MIME_TYPES,
+    download_data,
+    export_deck,
+    import_deck,
+    import_format,
+)
+from deck_store import StaleSetError, deck_store
+from dedup import dedupe_cards
+from flashcard_generator import (
+    generate_flashcards,
+    generate_flashcards_offline,
+    Flashcard,
+    get_sample_flashcards,
+)
 from lang_manager import language_manager as lang_manager
 from online_ai import online_generator
+from singleflight import generation_flights
+from token_budget import token_stats
+from upload_ingest import spooled_upload
+
+# Saved sets listed per page in the sets view
+SETS_PAGE_SIZE = 50
 
 # Set page configuration
 st.set_page_config(
@@ -16,15 +41,15 @@ st.set_page_config(
 
 # Initialize session state variables
 if "flashcards" not in st.session_state:
-    st.session_state.flashcards = []
+    st.session_state.flashcards = Deck()
 if "current_card_index" not in st.session_state:
     st.session_state.current_card_index = 0
 if "card_flipped" not in st.session_state:
     st.session_state.card_flipped = False
-if "sets" not in st.session_state:
-    st.session_state.sets = {}
 if "current_set" not in st.session_state:
     st.session_state.current_set = None
+if "set_revision" not in st.session_state:
+    st.session_state.set_revision = None  # Revision of current_set edits are based on
 if "edit_mode" not in st.session_state:
     st.session_state.edit_mode = False
 if "edit_card_index" not in st.session_state:
@@ -39,13 +64,18 @@ if "ai_method" not in st.session_state:
     st.session_state.ai_method = "gemini"
 if "language" not in st.session_state:
     st.session_state.language = "vi"
+if "export_file" not in st.session_state:
+    st.session_state.export_file = None  # (set name, format, spooled file)
 
 # Set current language
 lang_manager.set_language(st.session_state.language)
 
+# Open the pooled Gemini connection early (once per process)
+online_generator.warm_up()
+
 
 def clear_flashcards():
-    st.session_state.flashcards = []
+    st.session_state.flashcards = Deck()
     st.session_state.current_card_index = 0
     st.session_state.card_flipped = False
     st.session_state.edit_mode = False
@@ -72,12 +102,53 @@ def flip_card():
     st.session_state.card_flipped = not st.session_state.card_flipped
 
 
+def show_set(set_name):
+    """Show a saved set; O(1): the deck is a lazy view of its current revision"""
+    stored = deck_store.deck(set_name, Flashcard)
+    st.session_state.flashcards = Deck.over(stored)
+    st.session_state.current_set = set_name
+    st.session_state.set_revision = stored.revision
+
+
+def reload_changed_set():
+    """
+    The loaded set was changed in another session: show its saved version
+    rather than a mix of old and new cards.
+    """
+    set_name = st.session_state.current_set
+    st.warning(lang_manager.get_text("set_changed_reloaded", name=set_name))
+    st.session_state.edit_mode = False
+    st.session_state.edit_card_index = None
+    if deck_store.has_set(set_name):
+        show_set(set_name)
+        st.session_state.current_card_index = min(
+            st.session_state.current_card_index,
+            max(0, len(st.session_state.flashcards) - 1),
+        )
+    else:
+        st.session_state.flashcards = Deck()
+        st.session_state.current_set = st.session_state.set_revision = None
+    if not st.session_state.flashcards:
+        st.session_state.view_mode = "input"
+        st.rerun()
+
+
+def close_damaged_archive(error):
+    """A block of the opened .fcdeck file is damaged: leave the viewer"""
+    st.error(lang_manager.get_text("archive_damaged", error=str(error)))
+    clear_flashcards()
+    st.session_state.view_mode = "input"
+    st.stop()
+
+
 def save_set(set_name):
     if not set_name:
         st.error(lang_manager.get_text("set_save_error_name"))
         return
 
-    if set_name in st.session_state.sets:
+    # Saving under the loaded set's name stores the edits made to it
+    overwrite = set_name == st.session_state.current_set
+    if deck_store.has_set(set_name) and not overwrite:
         st.error(lang_manager.get_text("set_save_error_exists", name=set_name))
         return
 
@@ -85,23 +156,36 @@ def save_set(set_name):
         st.error(lang_manager.get_text("set_save_error_empty"))
         return
 
-    st.session_state.sets[set_name] = st.session_state.flashcards.copy()
-    st.session_state.current_set = set_name
-    st.success(
-        lang_manager.get_text(
-            "set_save_success", count=len(st.session_state.flashcards), name=set_name
+    try:
+        # Read the cards first: the deck may be a view of the set being replaced
+        cards = [(card.front, card.back) for card in st.session_state.flashcards]
+        # Never overwrite a change made to the set in another session
+        revision = st.session_state.set_revision if overwrite else None
+        count = deck_store.save_set(
+            set_name, cards, replace=overwrite, revision=revision
         )
-    )
+    except StaleSetError:
+        st.error(lang_manager.get_text("set_changed_error", name=set_name))
+        return
+    except CorruptDeckError as e:
+        close_damaged_archive(e)
+    if overwrite:
+        # The old versions referred to the replaced rows; start a new history
+        show_set(set_name)
+    else:
+        st.session_state.current_set = set_name
+        st.session_state.set_revision = deck_store.set_revision(set_name)[0]
+    st.success(lang_manager.get_text("set_save_success", count=count, name=set_name))
     st.session_state.view_mode = "sets"
     st.rerun()
 
 
-def load_set(set_name):
-    if set_name in st.session_state.sets:
-        st.session_state.flashcards = st.session_state.sets[set_name].copy()
-        st.session_state.current_card_index = 0
+def load_set(set_name, position=0):
+    if deck_store.has_set(set_name):
+        # Only the card on screen is read
+        show_set(set_name)
+        st.session_state.current_card_index = position
         st.session_state.card_flipped = False
-        st.session_state.current_set = set_name
         st.session_state.view_mode = "view"
         st.rerun()
     else:
@@ -109,21 +193,111 @@ def load_set(set_name):
 
 
 def delete_set(set_name):
-    if set_name in st.session_state.sets:
-        del st.session_state.sets[set_name]
+    if deck_store.delete_set(set_name):
         st.success(lang_manager.get_text("set_delete_success", name=set_name))
         if st.session_state.current_set == set_name:
-            st.session_state.current_set = None
-            st.session_state.flashcards = []
+            st.session_state.current_set = st.session_state.set_revision = None
+            st.session_state.flashcards = Deck()
             st.session_state.current_card_index = 0
         st.rerun()
     else:
         st.error(lang_manager.get_text("set_not_found", name=set_name))
 
 
+def clean_set(set_name):
+    """Remove near-duplicate cards from a saved set"""
+    if deck_store.has_set(set_name):
+        stored = deck_store.deck(set_name, Flashcard)
+        try:
+            cards = list(stored)
+            cleaned = dedupe_cards(cards)
+            deck_store.save_set(
+                set_name,
+                ((card.front, card.back) for card in cleaned),
+                replace=True,
+                revision=stored.revision,
+            )
+        except StaleSetError:
+            st.error(lang_manager.get_text("set_changed_error", name=set_name))
+            return
+        if st.session_state.current_set == set_name:
+            show_set(set_name)
+            st.session_state.current_card_index = 0
+        st.success(
+            lang_manager.get_text(
+                "set_clean_success", count=len(cards) - len(cleaned), name=set_name
+            )
+        )
+        st.rerun()
+    else:
+        st.error(lang_manager.get_text("set_not_found", name=set_name))
+
+
+def prepare_export(set_name, fmt):
+    """Write a saved set to a temporary file for the download button"""
+    if not deck_store.has_set(set_name):
+        st.error(lang_manager.get_text("set_not_found", name=set_name))
+        return
+    if st.session_state.export_file is not None:
+        st.session_state.export_file[2].close()
+    # Cards are read from the store page by page, never all at once
+    exported = export_deck(deck_store.iter_cards(set_name), fmt, set_name)
+    st.session_state.export_file = (set_name, fmt, exported)
+
+
+def import_set(uploaded_file, set_name):
+    """Save the cards of an exported CSV, JSONL or .apkg file as a new set"""
+    if not set_name:
+        st.error(lang_manager.get_text("set_save_error_name"))
+        return
+    if deck_store.has_set(set_name):
+        st.error(lang_manager.get_text("set_save_error_exists", name=set_name))
+        return
+    try:
+        with spooled_upload(uploaded_file) as source:
+            result = import_deck(
+                deck_store, source, import_format(uploaded_file.name), set_name
+            )
+    except ValueError as e:
+        st.error(lang_manager.get_text("import_error", error=str(e)))
+        return
+    st.success(
+        lang_manager.get_text(
+            "import_success",
+            count=result.imported,
+            skipped=result.skipped,
+            name=result.set_name,
+        )
+    )
+
+
+def open_archive(uploaded_file):
+    """View a .fcdeck file without importing it: cards are decoded on demand"""
+    try:
+        # Reads the upload's buffer in place; only the shown card's block is
+        # decompressed
+        archive = DeckFile(uploaded_file, Flashcard)
+    except ValueError as e:
+        st.error(lang_manager.get_text("import_error", error=str(e)))
+        return
+    st.session_state.flashcards = Deck.over(archive)
+    st.session_state.current_card_index = 0
+    st.session_state.card_flipped = False
+    st.session_state.current_set = st.session_state.set_revision = None
+    st.session_state.view_mode = "view"
+    st.rerun()
+
+
 def delete_card(index):
     if 0 <= index < len(st.session_state.flashcards):
-        st.session_state.flashcards.pop(index)
+        try:
+            st.session_state.flashcards = st.session_state.flashcards.delete(index)
+        except StaleSetError:
+            # Splicing reads the saved set, which another session changed
+            reload_changed_set()
+            return
+        except CorruptDeckError as e:
+            close_damaged_archive(e)
         if st.session_state.current_card_index >= len(st.session_state.flashcards):
             st.session_state.current_card_index = max(
                 0, len(st.session_state.flashcards) - 1
@@ -131,6 +305,17 @@ def delete_card(index):
         st.rerun()
 
 
+def undo_edit():
+    """Go back to the deck version before the last edit or deletion"""
+    st.session_state.flashcards = st.session_state.flashcards.undo()
+    st.session_state.current_card_index = min(
+        st.session_state.current_card_index,
+        max(0, len(st.session_state.flashcards) - 1),
+    )
+    st.session_state.card_flipped = False
+    st.rerun()
+
+
 def enter_edit_mode(index):
     st.session_state.edit_mode = True
     st.session_state.edit_card_index = index
@@ -142,9 +327,15 @@ def save_edit(front, back):
         st.session_state.edit_card_index is not None
         and 0 <= st.session_state.edit_card_index < len(st.session_state.flashcards)
     ):
-        st.session_state.flashcards[st.session_state.edit_card_index] = Flashcard(
-            front, back
-        )
+        try:
+            st.session_state.flashcards = st.session_state.flashcards.replace(
+                st.session_state.edit_card_index, Flashcard(front, back)
+            )
+        except StaleSetError:
+            reload_changed_set()
+            return
+        except CorruptDeckError as e:
+            close_damaged_archive(e)
         st.session_state.edit_mode = False
         st.session_state.edit_card_index = None
         st.rerun()
@@ -183,7 +374,7 @@ with st.sidebar:
         st.rerun()
 
     st.markdown("---")  # AI Method selection
-    ai_method_options = ["gemini"]
+    ai_method_options = ["gemini", "offline"]
 
     # Get AI methods text safely
     ai_methods_dict = lang_manager.get_text("ai_methods")
@@ -236,6 +427,23 @@ with st.sidebar:
         """
         )
 
+    # Process-wide counters: which parser handled responses, cache hit rates,
+    # observed output tokens per card, shared in-flight generations
+    with st.expander(lang_manager.get_text("stats_title")):
+        st.caption(lang_manager.get_text("parse_stats_label"))
+        st.json(get_parse_stats())
+        st.caption(lang_manager.get_text("cache_stats_label"))
+        st.json(
+            {
+                "responses": response_cache.stats(),
+                "extraction": extraction_cache.stats(),
+            }
+        )
+        st.caption(lang_manager.get_text("token_stats_label"))
+        st.json(token_stats.snapshot())
+        st.caption(lang_manager.get_text("flight_stats_label"))
+        st.json(generation_flights.stats())
+
 # Navigation
 nav_col1, nav_col2, nav_col3 = st.columns(3)
 with nav_col1:
@@ -274,17 +482,46 @@ if st.session_state.view_mode == "input":
             file_extension = os.path.splitext(uploaded_file.name)[1].lower()
 
             try:
-                if file_extension == ".pdf":
-                    content_text = extract_text_from_pdf(uploaded_file)
-                elif file_extension == ".pptx":
-                    content_text = extract_text_from_pptx(uploaded_file)
+                # Pages for PDF, slides for PowerPoint
+                range_col1, range_col2 = st.columns(2)
+                with range_col1:
+                    first_page = st.number_input(
+                        lang_manager.get_text("first_page"), min_value=1, value=1
+                    )
+                with range_col2:
+                    last_page = st.number_input(
+                        lang_manager.get_text("last_page"),
+                        min_value=0,
+                        value=0,
+                        help=lang_manager.get_text("last_page_help"),
+                    )
+
+                include_notes = True
+                if file_extension == ".pptx":
+                    include_notes = st.checkbox(
+                        lang_manager.get_text("include_notes"), value=True
+                    )
+
+                progress_bar = st.progress(0.0)
+                content_text = extract_text_from_upload(
+                    uploaded_file,
+                    page_range=(first_page, last_page),
+                    progress_callback=lambda done, total: progress_bar.progress(
+                        done / total,
+                        text=lang_manager.get_text(
+                            "extracting_pages", done=done, total=total
+                        ),
+                    ),
+                    include_notes=include_notes,
+                )
+                progress_bar.empty()
 
                 st.success(
                     lang_manager.get_text("upload_success", filename=uploaded_file.name)
                 )
                 st.text_area(
                     lang_manager.get_text("extracted_content"),
-                    content_text,
+                    content_text.replace(PAGE_BREAK, "\n\n"),
                     height=250,
                 )
             except Exception as e:
@@ -301,23 +538,74 @@ if st.session_state.view_mode == "input":
             lang_manager.get_text("num_cards"), min_value=3, max_value=20, value=10
         )
 
-    # Generate button
-    if st.button(lang_manager.get_text("generate_btn"), key="generate_btn"):
+    # Generate buttons: "regenerate" bypasses the response cache
+    gen_col1, gen_col2 = st.columns(2)
+    with gen_col1:
+        generate_clicked = st.button(
+            lang_manager.get_text("generate_btn"), key="generate_btn"
+        )
+    with gen_col2:
+        regenerate_clicked = st.button(
+            lang_manager.get_text("regenerate_btn"),
+            key="regenerate_btn",
+            help=lang_manager.get_text("regenerate_help"),
+        )
+
+    if generate_clicked or regenerate_clicked:
         if not content_text.strip():
             st.error(lang_manager.get_text("content_required"))
         else:
-            with st.spinner("🧠 " + lang_manager.get_text("generating_gemini")):
+            offline = st.session_state.ai_method == "offline"
+            spinner_key = "generating_offline" if offline else "generating_gemini"
+            with st.spinner("🧠 " + lang_manager.get_text(spinner_key)):
                 try:
                     clear_flashcards()
-                    # Sử dụng online_generator với Gemini API key
-                    api_key = st.session_state.api_key
-                    st.session_state.flashcards = online_generator.generate_flashcards(
-                        content_text,
-                        subject,
-                        num_cards,
-                        st.session_state.language,
-                        api_key,
-                    )
+                    if offline:
+                        # Không cần API key: tạo thẻ từ chính nội dung
+                        st.session_state.flashcards = Deck.from_cards(
+                            generate_flashcards_offline(
+                                content_text,
+                                subject,
+                                num_cards,
+                                st.session_state.language,
+                            )
+                        )
+                    else:
+                        # Sử dụng online_generator với Gemini API key
+                        api_key = st.session_state.api_key
+
+                        # Show each card as soon as it is parsed from the stream
+                        live_cards = st.container()
+                        shown_cards = []
+
+                        def show_card(card):
+                            shown_cards.append(card)
+                            live_cards.markdown(
+                                f"**{len(shown_cards)}. {card.front}**  \n{card.back}"
+                            )
+
+                        if not api_key and os.getenv("GOOGLE_API_KEY"):
+                            # Không nhập key: dùng key của máy chủ qua SDK,
+                            # cũng stream từng thẻ
+                            cards = generate_flashcards(
+                                content_text,
+                                subject,
+                                num_cards,
+                                use_local_model=False,
+                                use_cache=not regenerate_clicked,
+                                on_card=show_card,
+                            )
+                        else:
+                            cards = online_generator.generate_flashcards(
+                                content_text,
+                                subject,
+                                num_cards,
+                                st.session_state.language,
+                                api_key,
+                                use_cache=not regenerate_clicked,
+                                on_card=show_card,
+                            )
+                        st.session_state.flashcards = Deck.from_cards(cards)
 
                     if st.session_state.flashcards:
                         st.success(
@@ -335,9 +623,9 @@ if st.session_state.view_mode == "input":
                     # Thử fallback methods
                     if st.session_state.use_sample_cards:
                         st.warning(lang_manager.get_text("using_sample_fallback"))
-                        st.session_state.flashcards = get_sample_flashcards(subject)[
-                            :num_cards
-                        ]
+                        st.session_state.flashcards = Deck.from_cards(
+                            get_sample_flashcards(subject)[:num_cards]
+                        )
                         st.session_state.view_mode = "view"
                         st.rerun()
 
@@ -365,9 +653,18 @@ elif st.session_state.view_mode == "view":
 
     # Display the current flashcard
     if st.session_state.flashcards:
-        current_card = st.session_state.flashcards[
-            st.session_state.current_card_index
-        ]  # Edit mode
+        try:
+            current_card = st.session_state.flashcards[
+                st.session_state.current_card_index
+            ]
+        except StaleSetError:
+            reload_changed_set()
+            current_card = st.session_state.flashcards[
+                st.session_state.current_card_index
+            ]
+        except CorruptDeckError as e:
+            close_damaged_archive(e)
+        # Edit mode
         if (
             st.session_state.edit_mode
             and st.session_state.edit_card_index == st.session_state.current_card_index
@@ -442,6 +739,16 @@ elif st.session_state.view_mode == "view":
                 if st.button(f"➡️ {lang_manager.get_text('next_btn')}", key="next_btn"):
                     next_card()
                     st.rerun()
+            with nav_cols[2]:
+                # Each edit or deletion is a new deck version; undo goes back one
+                if st.session_state.flashcards.parent is not None and st.button(
+                    f"↩️ {lang_manager.get_text('undo_btn')}",
+                    key="undo_btn",
+                    help=lang_manager.get_text(
+                        "undo_help", version=st.session_state.flashcards.version
+                    ),
+                ):
+                    undo_edit()
             with nav_cols[3]:
                 if st.button(f"✏️ {lang_manager.get_text('edit_btn')}", key="edit_btn"):
                     enter_edit_mode(st.session_state.current_card_index)
@@ -463,16 +770,96 @@ elif st.session_state.view_mode == "view":
 elif st.session_state.view_mode == "sets":
     st.header(lang_manager.get_text("saved_sets_title"))
 
-    if not st.session_state.sets:
+    # Import before listing, so a new set shows up in this run
+    with st.expander(lang_manager.get_text("import_set_title")):
+        import_file = st.file_uploader(
+            lang_manager.get_text("import_file_label"),
+            type=list(FORMATS),
+            key="import_file",
+        )
+        import_col1, import_col2 = st.columns([3, 1])
+        with import_col1:
+            import_name = st.text_input(
+                lang_manager.get_text("set_name_label"),
+                value=os.path.splitext(import_file.name)[0] if import_file else "",
+                key="import_set_name",
+            )
+        with import_col2:
+            if st.button(
+                lang_manager.get_text("import_set_btn"),
+                key="import_set_btn",
+                disabled=import_file is None,
+            ):
+                with st.spinner(lang_manager.get_text("importing_set")):
+                    import_set(import_file, import_name.strip())
+        if import_file is not None and import_file.name.endswith(".fcdeck"):
+            if st.button(
+                lang_manager.get_text("open_archive_btn"),
+                key="open_archive_btn",
+                help=lang_manager.get_text("open_archive_help"),
+            ):
+                open_archive(import_file)
+
+    total_sets = deck_store.count_sets()
+    if not total_sets:
         st.info(lang_manager.get_text("no_saved_sets_info"))
     else:
-        # Display a table of saved sets
+        # Search every saved card (front, back and set name, accents ignored)
+        if deck_store.search_enabled:
+            query = st.text_input(
+                lang_manager.get_text("search_cards_label"),
+                key="search_cards_input",
+                placeholder=lang_manager.get_text("search_cards_placeholder"),
+            )
+            if query.strip():
+                hits = deck_store.search(query)
+                if not hits:
+                    st.info(lang_manager.get_text("search_no_results"))
+                else:
+                    hit_data = []
+                    for hit in hits:
+                        hit_data.append(
+                            {
+                                lang_manager.get_text("set_name_column"): hit.set_name,
+                                "#": hit.position + 1,
+                                lang_manager.get_text("front_column"): hit.front,
+                                lang_manager.get_text("back_column"): hit.back,
+                            }
+                        )
+                    st.dataframe(pd.DataFrame(hit_data), use_container_width=True)
+                    hit_col1, hit_col2 = st.columns([3, 1])
+                    with hit_col1:
+                        chosen = st.selectbox(
+                            lang_manager.get_text("search_open_label"),
+                            range(len(hits)),
+                            format_func=lambda i: (
+                                f"{hits[i].set_name} #{hits[i].position + 1}: "
+                                f"{hits[i].front}"
+                            ),
+                        )
+                    with hit_col2:
+                        if st.button(
+                            lang_manager.get_text("search_open_btn"),
+                            key="search_open_btn",
+                        ):
+                            load_set(hits[chosen].set_name, hits[chosen].position)
+
+        # Display one page of saved sets (card counts come from the sets table)
+        page = 1
+        if total_sets > SETS_PAGE_SIZE:
+            page = st.number_input(
+                lang_manager.get_text("sets_page_label"),
+                min_value=1,
+                max_value=(total_sets - 1) // SETS_PAGE_SIZE + 1,
+                value=1,
+            )
+        saved_sets = deck_store.list_sets(SETS_PAGE_SIZE, (page - 1) * SETS_PAGE_SIZE)
         set_data = []
-        for set_name, cards in st.session_state.sets.items():
+        for info in saved_sets:
             set_data.append(
                 {
-                    lang_manager.get_text("set_name_column"): set_name,
-                    lang_manager.get_text("card_count_column"): len(cards),
+                    lang_manager.get_text("set_name_column"): info.name,
+                    lang_manager.get_text("card_count_column"): info.card_count,
                 }
             )
 
@@ -481,17 +868,49 @@ elif st.session_state.view_mode == "sets":
             st.dataframe(df, use_container_width=True)
 
             # Set selection and actions
-            col1, col2, col3 = st.columns(3)
+            col1, col2, col3, col4 = st.columns(4)
             with col1:
                 selected_set = st.selectbox(
                     lang_manager.get_text("select_set_label"),
-                    list(st.session_state.sets.keys()),
+                    [info.name for info in saved_sets],
                 )
             with col2:
                 if st.button(lang_manager.get_text("load_set_btn"), key="load_set_btn"):
                     load_set(selected_set)
             with col3:
+                if st.button(
+                    lang_manager.get_text("clean_set_btn"),
+                    key="clean_set_btn",
+                    help=lang_manager.get_text("clean_set_help"),
+                ):
+                    clean_set(selected_set)
+            with col4:
                 if st.button(
                     lang_manager.get_text("delete_set_btn"), key="delete_set_btn"
                 ):
                     delete_set(selected_set)
+
+            # Export: written to a temporary file on request, then downloaded
+            export_col1, export_col2, export_col3 = st.columns(3)
+            with export_col1:
+                export_fmt = st.selectbox(
+                    lang_manager.get_text("export_format_label"),
+                    FORMATS,
+                    format_func=lambda fmt: f".{fmt}",
+                )
+            with export_col2:
+                if st.button(
+                    lang_manager.get_text("export_set_btn"), key="export_set_btn"
+                ):
+                    with st.spinner(lang_manager.get_text("exporting_set")):
+                        prepare_export(selected_set, export_fmt)
+            with export_col3:
+                export = st.session_state.export_file
+                if export is not None and export[:2] == (selected_set, export_fmt):
+                    st.download_button(
+                        lang_manager.get_text("download_set_btn"),
+                        data=download_data(export[2]),
+                        file_name=f"{selected_set}.{export_fmt}",
+                        mime=MIME_TYPES[export_fmt],
+                        key="download_set_btn",
+                    )
@@ -0,0 +1,128 @@
+"""
+Benchmark: OnlineAIGenerator.request_cards_batch against a local stand-in
+for generateContent that answers after a fixed delay and records how many
+requests it is serving at once. For each concurrency limit it reports the
+wall time and the peak number of requests in flight, and checks that the
+peak never exceeds the limit (the semaphore bound) and reaches it when
+there are enough jobs (the requests really overlap).
+
+Usage:
+    python benchmarks/bench_async_requests.py [jobs] [delay_ms]
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from online_ai import MAX_CONCURRENT_REQUESTS, OnlineAIGenerator  # noqa: E402
+from retry_policy import RateLimiter  # noqa: E402
+
+CARDS_PER_JOB = 3
+
+
+class InFlight:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.current = 0
+        self.peak = 0
+
+    def enter(self):
+        with self.lock:
+            self.current += 1
+            self.peak = max(self.peak, self.current)
+
+    def leave(self):
+        with self.lock:
+            self.current -= 1
+
+
+def make_handler(in_flight, delay):
+    class StandInHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            prompt = body["contents"][0]["parts"][0]["text"]
+            in_flight.enter()
+            try:
+                time.sleep(delay)
+            finally:
+                in_flight.leave()
+            job = str(abs(hash(prompt)))
+            cards = [
+                {"front": f"Câu hỏi {job}-{i}?", "back": f"Trả lời {job}-{i}"}
+                for i in range(CARDS_PER_JOB)
+            ]
+            text = json.dumps(cards, ensure_ascii=False)
+            response = json.dumps(
+                {
+                    "candidates": [
+                        {
+                            "content": {"parts": [{"text": text}]},
+                            "finishReason": "STOP",
+                        }
+                    ]
+                }
+            ).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(response)))
+            self.end_headers()
+            self.wfile.write(response)
+
+        def log_message(self, *args):
+            pass
+
+    return StandInHandler
+
+
+def run(generator, in_flight, jobs, limit):
+    in_flight.peak = 0
+    start = time.perf_counter()
+    results = generator.request_cards_batch(
+        jobs, "Sinh học", "vi", "stand-in-key", max_concurrency=limit, use_cache=False
+    )
+    return time.perf_counter() - start, in_flight.peak, results
+
+
+def main():
+    n_jobs = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    delay = (int(sys.argv[2]) if len(sys.argv) > 2 else 200) / 1000
+    jobs = [(f"Đoạn nội dung số {i} về tế bào.", CARDS_PER_JOB) for i in range(n_jobs)]
+
+    in_flight = InFlight()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(in_flight, delay))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    generator = OnlineAIGenerator()
+    generator.apis["gemini"]["url"] = (
+        f"http://127.0.0.1:{server.server_address[1]}/generateContent"
+    )
+    # The per-key rate limit is not what is measured here
+    generator.rate_limiter = RateLimiter(requests_per_minute=60_000)
+
+    failures = 0
+    try:
+        print(f"{n_jobs} jobs, {delay * 1000:.0f} ms per request")
+        for limit in sorted({1, 2, MAX_CONCURRENT_REQUESTS, n_jobs}):
+            elapsed, peak, results = run(generator, in_flight, jobs, limit)
+            ideal = -(-n_jobs // limit) * delay
+            complete = all(len(cards) == CARDS_PER_JOB for cards in results)
+            ok = peak == min(limit, n_jobs) and complete
+            failures += not ok
+            print(
+                f"limit {limit:>3}: {elapsed * 1000:8.1f} ms "
+                f"(ideal {ideal * 1000:6.0f} ms), peak in flight {peak:>3}, "
+                f"{'ok' if ok else 'FAILED'}"
+            )
+    finally:
+        server.shutdown()
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
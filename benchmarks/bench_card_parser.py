@@ -0,0 +1,124 @@
+"""
+Benchmark: the shared single-pass card parser against the original
+per-line parsers, on normal and adversarial Gemini outputs.
+
+Times are the best of five runs. Each corpus is run at two sizes; a ratio
+close to 2x between them means linear behaviour.
+
+Usage:
+    python benchmarks/bench_card_parser.py [cards]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from card_parser import (  # noqa: E402
+    IncrementalCardParser,
+    iter_stream_cards,
+    parse_text_cards,
+)
+
+
+def legacy_qa(text):
+    """The original OnlineAIGenerator._parse_qa_format loop (without padding)."""
+    cards = []
+    for line in text.strip().split("\n"):
+        line = line.strip()
+        if line and "Q:" in line and ("A:" in line or "|" in line):
+            if "|" in line:
+                question_part, answer_part = line.split("|", 1)
+            else:
+                parts = line.split("A:", 1)
+                question_part, answer_part = parts[0], parts[1] if len(parts) > 1 else ""
+            question = question_part.replace("Q:", "").strip()
+            answer = answer_part.replace("A:", "").strip()
+            if question and answer:
+                cards.append((question, answer))
+    return cards
+
+
+def legacy_blocks(text):
+    """The original generate_flashcards_gemini block loop."""
+    cards = []
+    for block in text.split("THẺ ")[1:]:
+        lines = block.strip().split("\n")
+        front, back, front_section = "", "", True
+        for line in lines[1:]:
+            if line.startswith("Mặt trước:"):
+                front = line.replace("Mặt trước:", "").strip()
+                continue
+            if line.startswith("Mặt sau:"):
+                back = line.replace("Mặt sau:", "").strip()
+                front_section = False
+                continue
+            if front_section:
+                if front:
+                    front += " " + line.strip()
+            elif back:
+                back += " " + line.strip()
+        if front and back:
+            cards.append((front, back))
+    return cards
+
+
+def corpus(n):
+    """Named outputs scaled by n (roughly the number of cards)."""
+    answer = "Câu trả lời khá dài với nhiều từ ngữ khác nhau " * 3
+    return {
+        "qa": "".join(f"Q: Câu hỏi số {i}? | A: {answer}\n" for i in range(n)),
+        "blocks": "".join(
+            f"THẺ {i}\nMặt trước: Câu hỏi {i}\ncòn tiếp\nMặt sau: {answer}\n"
+            + f"{answer}\n" * 5
+            + "\n"
+            for i in range(n)
+        ),
+        # Adversarial outputs
+        "one long line": "Q: " + "từ | A: " * (n * 20),
+        "pipes and spaces": "Q: " + "|    " * (n * 40) + " A: x",
+        "answer spam": "Q: " + "xA: " * (n * 40),
+        "long continuation": "THẺ 1\nMặt trước: q\nMặt sau: a\n" + "tiếp tục\n" * (n * 20),
+        "bare markers": "THẺ 1\n" * (n * 10),
+    }
+
+
+def timed(fn, *args, repeat=5):
+    """Best of ``repeat`` runs, in ms."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def streamed(text, size=16):
+    fragments = (text[i : i + size] for i in range(0, len(text), size))
+    return list(iter_stream_cards(fragments, IncrementalCardParser()))
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    small, large = corpus(n), corpus(n * 2)
+
+    header = (
+        f"{'corpus':<20}{'legacy ms':>12}{'single-pass ms':>16}"
+        f"{'streamed ms':>14}{'2n/n':>7}"
+    )
+    print(header)
+    print("-" * len(header))
+    for name in small:
+        is_blocks = any(word in name for word in ("block", "marker", "continuation"))
+        legacy = legacy_blocks if is_blocks else legacy_qa
+        old = timed(legacy, large[name])
+        new_small = timed(parse_text_cards, small[name])
+        new = timed(parse_text_cards, large[name])
+        stream = timed(streamed, large[name])
+        ratio = new / max(new_small, 1e-6)
+        print(f"{name:<20}{old:12.1f}{new:16.1f}{stream:14.1f}{ratio:7.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Benchmark: the .fcdeck binary format at 100k cards - file size against
+the raw text and a CSV export, opening the file, reading random cards
+(jumping around a deck), the next card (the viewer), a whole scan, and
+the peak Python memory while reading random cards.
+
+Usage:
+    python benchmarks/bench_deck_format.py [cards]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from deck_format import DeckFile, write_deck  # noqa: E402
+from deck_io import iter_csv  # noqa: E402
+
+
+def cards(n, seed=0):
+    rng = random.Random(seed)
+    for i in range(n):
+        words = " ".join(str(rng.randrange(10**6)) for _ in range(8))
+        yield f"Câu hỏi {i}: {words}?", f"Câu trả lời {i}: {words} " * 3
+
+
+def timed(label, fn, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    elapsed = (time.perf_counter() - start) * 1e6 / repeat
+    print(f"{label:<28}{elapsed:14.1f} us")
+    return result
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    raw = sum(len(f.encode()) + len(b.encode()) for f, b in cards(n))
+    csv_size = sum(len(chunk.encode()) for chunk in iter_csv(cards(n)))
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.fcdeck")
+        with open(path, "wb") as target:
+            timed(f"write {n} cards", lambda: write_deck(cards(n), target))
+        size = os.path.getsize(path)
+        print(
+            f"{'size (raw / csv)':<28}{size / 2**20:11.1f} MiB"
+            f" ({raw / 2**20:.1f} / {csv_size / 2**20:.1f} MiB)"
+        )
+
+        deck = timed("open", lambda: DeckFile(path))
+        rng = random.Random(1)
+        positions = [rng.randrange(n) for _ in range(10_000)]
+        shown = iter(positions)
+        tracemalloc.start()
+        timed("random card", lambda: deck[next(shown)], repeat=len(positions))
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        following = iter(range(n))
+        timed("next card", lambda: deck[next(following)], repeat=min(n, 10_000))
+        timed("scan all cards", lambda: sum(1 for _ in deck))
+        print(f"{'peak memory (random reads)':<28}{peak / 2**10:11.1f} KiB")
+        deck.close()
+
+
+if __name__ == "__main__":
+    main()
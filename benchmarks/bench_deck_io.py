@@ -0,0 +1,77 @@
+"""
+Benchmark: exporting a 100k-card set to each format and importing it
+back, with the peak Python memory of each step (tracemalloc) to check it
+stays bounded by the batch and spool sizes, not the deck.
+
+The import reads the bytes the app hands to st.download_button, and the
+run fails unless they are bytes (a type the button accepts) and import
+back to every card.
+
+Usage:
+    python benchmarks/bench_deck_io.py [cards]
+"""
+
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from deck_io import FORMATS, download_data, export_deck, import_deck  # noqa: E402
+from deck_store import DeckStore  # noqa: E402
+
+
+def cards(n, seed=0):
+    rng = random.Random(seed)
+    for i in range(n):
+        words = " ".join(str(rng.randrange(10**6)) for _ in range(8))
+        yield f"Câu hỏi {i}: {words}?", f"Câu trả lời {i}: {words} " * 3
+
+
+def measured(label, fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"{label:<24}{elapsed * 1000:12.1f} ms{peak / 2**20:10.1f} MiB peak")
+    return result
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    with tempfile.TemporaryDirectory() as directory:
+        store = DeckStore(os.path.join(directory, "bench.db"))
+        store.save_set("bench", cards(n))
+        print(f"{n} cards")
+        failures = 0
+        for fmt in FORMATS:
+            exported = measured(
+                f"export {fmt}",
+                lambda: export_deck(store.iter_cards("bench"), fmt, "bench"),
+            )
+            size = exported.seek(0, os.SEEK_END)
+            exported.seek(0)
+            print(f"{'  size':<24}{size / 2**20:12.1f} MiB")
+            data = measured(f"  download {fmt}", lambda: download_data(exported))
+            exported.close()
+            result = measured(
+                f"import {fmt}",
+                lambda: import_deck(store, io.BytesIO(data), fmt, f"bench-{fmt}"),
+            )
+            if not isinstance(data, bytes) or len(data) != size:
+                print(f"  FAILED: download data is {type(data).__name__}")
+                failures += 1
+            elif result.imported != n:
+                print(f"  FAILED: {result.imported} of {n} cards imported")
+                failures += 1
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
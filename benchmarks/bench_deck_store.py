@@ -0,0 +1,65 @@
+"""
+Benchmark: the SQLite deck store at 100k cards - saving a set, listing
+sets, loading one card (what the app shows), loading one page, reading a
+whole set and deleting a card near the front.
+
+Usage:
+    python benchmarks/bench_deck_store.py [cards] [sets]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from deck_store import DeckStore  # noqa: E402
+
+
+def cards(n, seed=0):
+    rng = random.Random(seed)
+    for i in range(n):
+        words = " ".join(str(rng.randrange(10**6)) for _ in range(8))
+        yield f"Câu hỏi {i}: {words}?", f"Câu trả lời {i}: {words} " * 3
+
+
+def timed(label, fn, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    elapsed = (time.perf_counter() - start) * 1000 / repeat
+    print(f"{label:<36}{elapsed:12.3f} ms")
+    return result
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    n_sets = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    with tempfile.TemporaryDirectory() as directory:
+        store = DeckStore(os.path.join(directory, "decks.db"))
+        big = list(cards(n))
+        timed(f"save set ({n} cards)", lambda: store.save_set("big", big))
+        for i in range(n_sets):
+            store.save_set(f"set {i}", cards(20, seed=i))
+
+        label = f"list sets (page of 50 / {n_sets + 1})"
+        timed(label, lambda: store.list_sets(50), 100)
+        timed("count cards", lambda: store.count_cards("big"), 1000)
+        positions = [random.randrange(n) for _ in range(1000)]
+        it = iter(positions)
+        get_random = lambda: store.get_card("big", next(it))  # noqa: E731
+        timed("get one card (random position)", get_random, 1000)
+        timed("get one page (500 cards)", lambda: store.get_cards("big", n // 2), 100)
+        deck = store.deck("big")
+        timed("StoredDeck[i] + len()", lambda: (deck[n // 3], len(deck)), 1000)
+        loaded = timed("read whole set", lambda: list(store.iter_cards("big")))
+        assert len(loaded) == n
+        timed("delete card near the front", lambda: store.delete_card("big", 10), 10)
+        timed("delete set", lambda: store.delete_set("big"))
+        print(f"database size: {os.path.getsize(store.path) / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
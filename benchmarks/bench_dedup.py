@@ -0,0 +1,95 @@
+"""
+Benchmark: MinHash/LSH near-duplicate detection against the exhaustive
+pairwise Jaccard comparison it replaces, on synthetic decks where a share
+of the cards are paraphrases of earlier ones.
+
+Each deck is run at two sizes; a ratio close to 2x between them means
+linear behaviour. The pairwise baseline is only run on the small deck.
+
+Usage:
+    python benchmarks/bench_dedup.py [cards]
+"""
+
+import os
+import random
+import sys
+import time
+from collections import namedtuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from chunking import normalize_card_text  # noqa: E402
+from dedup import DEFAULT_THRESHOLD, SHINGLE_SIZE, find_duplicates  # noqa: E402
+
+Card = namedtuple("Card", "front back")
+
+SYLLABLES = "ba be bi bo bu ca co cu da de do du ga ge gi go ha he hi ho hu".split()
+
+
+def vocabulary(size=3000, seed=0):
+    """Synthetic two- and three-syllable words, so unrelated cards differ."""
+    rng = random.Random(seed)
+    return ["".join(rng.choices(SYLLABLES, k=rng.randint(2, 3))) for _ in range(size)]
+
+
+WORDS = vocabulary()
+
+
+def deck(n, duplicate_share=0.2, seed=1):
+    """n cards, ``duplicate_share`` of them lightly reworded copies."""
+    rng = random.Random(seed)
+    cards = []
+    for i in range(n):
+        if cards and rng.random() < duplicate_share:
+            front, back = rng.choice(cards)
+            # Same card, different casing/punctuation and one extra word
+            cards.append(Card(front.upper() + " ?", back + " " + rng.choice(WORDS)))
+        else:
+            front = f"Câu hỏi {i}: " + " ".join(rng.choices(WORDS, k=8))
+            back = " ".join(rng.choices(WORDS, k=20))
+            cards.append(Card(front, back))
+    return cards
+
+
+def pairwise(cards):
+    """Exact Jaccard over shingle sets, every pair: the quadratic baseline."""
+    sets = []
+    for card in cards:
+        text = f"{normalize_card_text(card.front)} {normalize_card_text(card.back)}"
+        sets.append({text[i : i + SHINGLE_SIZE] for i in range(len(text) - 3)})
+    duplicates = []
+    for i, current in enumerate(sets):
+        for earlier in sets[:i]:
+            union = len(current | earlier)
+            if union and len(current & earlier) / union >= DEFAULT_THRESHOLD:
+                duplicates.append(i)
+                break
+    return duplicates
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return (time.perf_counter() - start) * 1000, result
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    small, large = deck(n), deck(n * 2)
+    baseline = deck(min(n, 2000))
+
+    exact_ms, exact = timed(pairwise, baseline)
+    lsh_ms, found = timed(find_duplicates, baseline)
+    recall = len(set(exact) & set(found)) / max(len(exact), 1)
+    print(f"pairwise, {len(baseline)} cards: {exact_ms:10.1f} ms")
+    print(f"minhash,  {len(baseline)} cards: {lsh_ms:10.1f} ms  recall {recall:.2f}")
+
+    small_ms, _ = timed(find_duplicates, small)
+    large_ms, found = timed(find_duplicates, large)
+    print(f"minhash,  {len(small)} cards: {small_ms:10.1f} ms")
+    print(f"minhash,  {len(large)} cards: {large_ms:10.1f} ms  ({len(found)} found)")
+    print(f"2n/n: {large_ms / max(small_ms, 1e-6):.2f}")
+
+
+if __name__ == "__main__":
+    main()
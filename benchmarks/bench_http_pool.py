@@ -0,0 +1,105 @@
+"""
+Benchmark: per-request latency of module-level requests.post (new TCP + TLS
+connection every call) vs the pooled session used by OnlineAIGenerator.
+
+Starts a local HTTPS stand-in for generateContent with a throwaway
+self-signed certificate (requires the ``openssl`` command).
+
+Usage:
+    python benchmarks/bench_http_pool.py [requests]
+"""
+
+import json
+import os
+import ssl
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import warnings
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import requests  # noqa: E402
+import urllib3  # noqa: E402
+
+from online_ai import OnlineAIGenerator  # noqa: E402
+
+RESPONSE = json.dumps(
+    {"candidates": [{"content": {"parts": [{"text": "Q: a | A: b"}]}}]}
+).encode("utf-8")
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(RESPONSE)))
+        self.end_headers()
+        self.wfile.write(RESPONSE)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server(workdir):
+    cert = os.path.join(workdir, "cert.pem")
+    key = os.path.join(workdir, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+         "-subj", "/CN=localhost", "-keyout", key, "-out", cert],
+        check=True,
+        capture_output=True,
+    )
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert, key)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"https://127.0.0.1:{server.server_address[1]}/generateContent"
+
+
+def measure(post, url, count):
+    payload = {"contents": [{"parts": [{"text": "x" * 2000}]}]}
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        response = post(url, json=payload, timeout=10, verify=False)
+        response.json()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def report(label, latencies):
+    print(
+        f"{label:<22} mean {statistics.mean(latencies):7.2f} ms   "
+        f"median {statistics.median(latencies):7.2f} ms"
+    )
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    warnings.simplefilter("ignore", urllib3.exceptions.InsecureRequestWarning)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        server, url = start_server(workdir)
+        try:
+            fresh = measure(requests.post, url, count)
+            pooled = measure(OnlineAIGenerator().session.post, url, count)
+        finally:
+            server.shutdown()
+
+    report("requests.post (fresh)", fresh)
+    report("pooled session", pooled)
+    saved = statistics.mean(fresh) - statistics.mean(pooled)
+    print(f"saved per request: {saved:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
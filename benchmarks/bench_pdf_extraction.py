@@ -0,0 +1,65 @@
+"""
+Benchmark: serial vs process-pool PDF text extraction.
+
+Usage:
+    python benchmarks/bench_pdf_extraction.py path/to/large.pdf [workers ...]
+"""
+
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import PyPDF2  # noqa: E402
+
+from utils import iter_pdf_pages_parallel  # noqa: E402
+
+
+def legacy_serial(path):
+    """The original extract_text_from_pdf loop, kept here as the baseline."""
+    with open(path, "rb") as f:
+        pdf_reader = PyPDF2.PdfReader(f)
+        text = ""
+        for page_num in range(len(pdf_reader.pages)):
+            text += pdf_reader.pages[page_num].extract_text() + "\n\n"
+        return re.sub(r"\s+", " ", text).strip()
+
+
+def parallel(path, workers):
+    with open(path, "rb") as f:
+        pages = iter_pdf_pages_parallel(
+            f, max_workers=workers, min_pages=1, pdf_path=path
+        )
+        return "\n\n".join(page.text for page in pages if page.text)
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+
+    path = sys.argv[1]
+    worker_counts = [int(w) for w in sys.argv[2:]] or [2, 4, os.cpu_count() or 1]
+
+    with open(path, "rb") as f:
+        page_count = len(PyPDF2.PdfReader(f).pages)
+    print(f"{path}: {page_count} pages, {os.cpu_count()} CPUs")
+
+    baseline = timed(legacy_serial, path)
+    print(f"{'serial (legacy)':<20}{baseline:8.2f}s")
+
+    for workers in sorted(set(worker_counts)):
+        elapsed = timed(parallel, path, workers)
+        print(f"{f'parallel x{workers}':<20}{elapsed:8.2f}s  {baseline / elapsed:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark: full-text search over every saved card (SQLite FTS5) at 500k
+cards, for common, rare, multi-word and prefix queries, plus the cost the
+index adds to saving sets.
+
+Usage:
+    python benchmarks/bench_search.py [cards] [sets]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+import unicodedata
+from itertools import accumulate
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from deck_store import DeckStore, fold  # noqa: E402
+
+ONSETS = "b c ch d đ g gi h k kh l m n ng nh ph qu r s t th tr v x".split()
+VOWELS = "a à á ả ã ạ ă ắ â ấ e é ê ế i í o ó ô ố ơ ớ u ú ư ứ y ý".split()
+CODAS = ["", "c", "ch", "m", "n", "ng", "nh", "p", "t", "i", "o", "u"]
+
+
+def vocabulary(rng, size=20000):
+    """
+    Synthetic Vietnamese-like words of one to three syllables (about 7000
+    possible syllables); cards draw them with Zipf frequencies, like real
+    text, so a few words are very common and most are rare.
+    """
+    def syllable():
+        return rng.choice(ONSETS) + rng.choice(VOWELS) + rng.choice(CODAS)
+
+    return [
+        " ".join(syllable() for _ in range(rng.choice((1, 2, 2, 3))))
+        for _ in range(size)
+    ]
+
+
+def cards(n, rng, words):
+    cum_weights = list(accumulate(1 / (rank + 1) for rank in range(len(words))))
+    for i in range(n):
+        front = " ".join(rng.choices(words, cum_weights=cum_weights, k=8))
+        back = " ".join(rng.choices(words, cum_weights=cum_weights, k=16))
+        yield f"Câu {i}: {front} {rng.randrange(10**6)}?", back
+
+
+def timed(label, fn, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    elapsed = (time.perf_counter() - start) * 1000 / repeat
+    print(f"{label:<40}{elapsed:12.3f} ms")
+    return result
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    n_sets = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    rng = random.Random(0)
+    words = vocabulary(rng)
+    with tempfile.TemporaryDirectory() as directory:
+        store = DeckStore(os.path.join(directory, "decks.db"))
+        per_set = n // n_sets
+        decks = [list(cards(per_set, rng, words)) for _ in range(n_sets)]
+        start = time.perf_counter()
+        for i, deck in enumerate(decks):
+            store.save_set(f"Bộ thẻ {i}", deck)
+        elapsed = time.perf_counter() - start
+        print(f"saved {n} cards in {n_sets} sets: {elapsed:.1f} s (index included)")
+
+        # The random number at the end of one card's front
+        rare = decks[7][123][0].rsplit(" ", 1)[1].rstrip("?")
+        # A common word typed without accents
+        plain = unicodedata.normalize("NFKD", fold(words[1]))
+        plain = "".join(c for c in plain if not unicodedata.combining(c))
+        queries = {
+            "most common word": words[0],
+            "common, no accents": plain,
+            "two words": f"{words[2]} {words[3]}",
+            "prefix (typing)": words[4][:3],
+            "word from the long tail": words[5000],
+            "rare term": rare,
+            "set name": "bộ thẻ 42",
+            "no match": "zzzz",
+        }
+        for label, query in queries.items():
+            hits = timed(f"{label} ({query!r})", lambda: store.search(query), 20)
+            print(f"{'':<4}{len(hits)} hits")
+        print(f"database size: {os.path.getsize(store.path) / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""
+Bộ nhớ đệm hai tầng (RAM + đĩa) dùng chung cho mọi session trên cùng server
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+CACHE_DIR = os.getenv(
+    "FLASHCARD_CACHE_DIR",
+    os.path.join(tempfile.gettempdir(), "flashcard_master_cache"),
+)
+
+# Generated responses are reused for a week unless the user regenerates
+RESPONSE_TTL = 7 * 24 * 3600
+
+
+def hash_key(*parts) -> str:
+    """Build a stable SHA-256 cache key from string parts."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def response_cache_key(prompt: str, model: str, generation_config) -> str:
+    """Cache key for a model response: final prompt, model and config."""
+    return hash_key(prompt, model, json.dumps(generation_config, sort_keys=True))
+
+
+class LRUCache:
+    """
+    Thread-safe in-memory LRU cache for string values.
+
+    Bounded both by number of entries and by total characters stored.
+    Entries optionally expire after ``ttl`` seconds.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 128,
+        max_chars: Optional[int] = None,
+        ttl: Optional[float] = None,
+    ):
+        self.max_entries = max_entries
+        self.max_chars = max_chars
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (value, expires_at)
+        self._chars = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at and expires_at < time.time():
+                del self._data[key]
+                self._chars -= len(value)
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str):
+        if self.max_chars is not None and len(value) > self.max_chars:
+            return
+        expires_at = time.time() + self.ttl if self.ttl else 0
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._chars -= len(old[0])
+            self._data[key] = (value, expires_at)
+            self._chars += len(value)
+            while len(self._data) > self.max_entries or (
+                self.max_chars is not None and self._chars > self.max_chars
+            ):
+                _, (evicted, _) = self._data.popitem(last=False)
+                self._chars -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._chars = 0
+
+    def __len__(self):
+        return len(self._data)
+
+
+class DiskCache:
+    """
+    Directory of UTF-8 text files, one per key, with size-based eviction.
+
+    Each file starts with a line holding its expiry timestamp (0 = never).
+    Reads refresh a file's mtime so eviction removes the least recently
+    used entries first. Writes go through a temporary file and os.replace,
+    so concurrent readers never see a partial entry.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int = 256 * 1024 * 1024,
+        ttl: Optional[float] = None,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._size = sum(size for _, size, _ in self._entries())
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def _entries(self):
+        """List (path, size, mtime) for every stored entry."""
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.is_file() and not entry.name.endswith(".tmp"):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((entry.path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8", newline="") as f:
+                expires_at = float(f.readline() or 0)
+                value = f.read()
+        except (FileNotFoundError, UnicodeDecodeError, ValueError):
+            return None
+
+        if expires_at and expires_at < time.time():
+            self.delete(key)
+            return None
+
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return value
+
+    def set(self, key: str, value: str):
+        expires_at = time.time() + self.ttl if self.ttl else 0
+        data = f"{expires_at}\n{value}".encode("utf-8")
+        if len(data) > self.max_bytes:
+            return
+
+        path = self._path(key)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+
+        with self._lock:
+            try:
+                self._size -= os.path.getsize(path)
+            except FileNotFoundError:
+                pass
+            os.replace(tmp_path, path)
+            self._size += len(data)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def delete(self, key: str):
+        with self._lock:
+            try:
+                self._size -= os.path.getsize(self._path(key))
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def _evict(self):
+        # Other processes may share the directory, so recount from disk
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        self._size = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if self._size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                self._size -= size
+            except FileNotFoundError:
+                pass
+
+
+class TieredCache:
+    """
+    In-memory LRU in front of a persistent disk tier.
+
+    Disk hits are promoted into memory; writes go to both tiers. Hit and
+    miss counts are kept per tier.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_entries: int = 32,
+        max_chars: Optional[int] = None,
+        max_disk_bytes: int = 256 * 1024 * 1024,
+        ttl: Optional[float] = None,
+        directory: Optional[str] = None,
+    ):
+        self.memory = LRUCache(max_entries, max_chars, ttl)
+        self.disk = DiskCache(
+            directory or os.path.join(CACHE_DIR, name), max_disk_bytes, ttl
+        )
+        self._stats_lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+    def _count(self, name: str):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.memory.get(key)
+        if value is not None:
+            self._count("memory_hits")
+            return value
+
+        value = self.disk.get(key)
+        if value is not None:
+            self._count("disk_hits")
+            self.memory.set(key, value)
+            return value
+
+        self._count("misses")
+        return None
+
+    def set(self, key: str, value: str):
+        self.memory.set(key, value)
+        self.disk.set(key, value)
+
+    def stats(self) -> dict:
+        """Hit/miss counters since process start."""
+        with self._stats_lock:
+            return dict(self._stats)
+
+
+# Raw model output shared by both Gemini code paths
+response_cache = TieredCache(
+    "responses", max_entries=256, max_disk_bytes=64 * 1024 * 1024, ttl=RESPONSE_TTL
+)
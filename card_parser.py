@@ -0,0 +1,479 @@
+"""
+Bộ phân tích thẻ từ văn bản Gemini trả về, dùng chung cho online_ai.py và
+flashcard_generator.py, cả khi nhận toàn bộ kết quả lẫn khi streaming.
+
+Định dạng văn bản (Q/A và khối "THẺ n") được xử lý trong một lượt duy nhất
+bằng regex biên dịch sẵn tìm các dòng nhãn; phần văn bản giữa hai nhãn được
+cắt nguyên khối, nên thời gian chạy tuyến tính theo độ dài đầu ra. Đầu ra
+chỉ gồm thẻ Q/A (dạng phổ biến nhất) đi đường tắt: mỗi dòng chỉ qua vài
+phương thức chuỗi, như bộ phân tích cũ.
+"""
+
+import json
+import re
+import threading
+from collections import Counter
+from typing import Iterator, List, Optional, Tuple
+
+Card = Tuple[str, str]  # (front, back)
+
+# Gemini responseSchema for JSON output mode: a list of {front, back}
+CARD_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {
+            "front": {"type": "STRING"},
+            "back": {"type": "STRING"},
+        },
+        "required": ["front", "back"],
+    },
+}
+
+# Label lines: a card marker, a front/back label or "Q:". Optional list
+# bullets and markdown bold around labels are tolerated. Text between two
+# labels belongs to the first one, so continuation lines never go through
+# Python code individually.
+_LABEL_RE = re.compile(
+    r"""
+    \n[ \t]*(?:[-*•][ \t]*|\d+[.)][ \t]*)?(?:\*\*)?
+    (?:
+        (?P<marker>(?:THẺ|Thẻ|CARD|Card)[ \t]*\d+)\b
+      | (?P<front>Mặt[ \t]+trước|Front)[ \t]*:(?:\*\*)?
+      | (?P<back>Mặt[ \t]+sau|Back)[ \t]*:(?:\*\*)?
+      | (?P<qa>Q):(?:\*\*)?
+    )
+    """,
+    re.VERBOSE,
+)
+# The same labels at the start of one line, for the Q/A fast path
+_LINE_PREFIX = r"[ \t]*(?:[-*•][ \t]*|\d+[.)][ \t]*)?(?:\*\*)?"
+_QA_LINE_RE = re.compile(_LINE_PREFIX + r"Q:(?:\*\*)?")
+_BLOCK_LINE_RE = re.compile(
+    _LINE_PREFIX + r"(?:(?:THẺ|Thẻ|CARD|Card)[ \t]*\d"
+    r"|(?:Mặt[ \t]+trước|Front|Mặt[ \t]+sau|Back)[ \t]*:)"
+)
+# Answer labels, most specific first: "| A:" (the answer separator the
+# prompts ask for), an "A:" line, then any "A:" that starts a word (after
+# whitespace, "|" or markdown bold). In the last one the literal comes
+# first so the regex engine can skip ahead to each "A:"
+_PIPE_ANSWER_RE = re.compile(r"\|[ \t]*(?:\*\*)?A:")
+_LINE_ANSWER_RE = re.compile(r"\n[ \t]*(?:[-*•][ \t]*)?(?:\*\*)?A:")
+_ANSWER_LABEL_RE = re.compile(r"A:(?<=[\s|*]A:)")
+# A blank line ends a Q/A card
+_BLANK_LINE_RE = re.compile(r"\n[^\S\n]*\n")
+
+# How often each parsing path produced the cards: json, json_partial (complete
+# objects salvaged from truncated JSON), qa, blocks, failed
+_parse_stats = Counter()
+_parse_stats_lock = threading.Lock()
+
+
+def record_parse(path: str):
+    with _parse_stats_lock:
+        _parse_stats[path] += 1
+
+
+def get_parse_stats() -> dict:
+    """Counts of responses handled by each parsing path since start-up."""
+    with _parse_stats_lock:
+        return dict(_parse_stats)
+
+
+def _collapse(text: str) -> str:
+    """Join the stripped, non-empty lines of ``text`` with single spaces."""
+    if "\n" not in text:
+        return text.strip()
+    return " ".join(filter(None, map(str.strip, text.split("\n"))))
+
+
+def _answer_label(text: str) -> Optional[Tuple[int, int]]:
+    """
+    Span of the answer label in the text after "Q:": a "| A:" before the
+    first "A:" line, else that line, else the first "A:" that starts a
+    word. The question may itself contain "A:", as in
+    "Q: What is plan A: the best? | A: yes".
+    """
+    line = _LINE_ANSWER_RE.search(text)
+    pipe = _PIPE_ANSWER_RE.search(text, 0, line.start() if line else len(text))
+    if pipe or line:
+        return (pipe or line).span()
+    label = _ANSWER_LABEL_RE.search(text)
+    if not label:
+        return None
+    start, end = label.span()
+    if text.endswith("**", 0, start):  # **A:
+        start -= 2
+    return start, end
+
+
+def _split_qa(text: str) -> Tuple[str, str]:
+    """Split the text after "Q:" into question and (possibly empty) answer."""
+    label = _answer_label(text)
+    if label:
+        start, end = label
+        if text.startswith("**", end):  # **A:**
+            end += 2
+        return _collapse(text[:start]).rstrip("| \t"), _collapse(text[end:])
+    # No "A:" label: fall back to the first pipe, as the old parser did
+    question, sep, answer = text.partition("|")
+    return _collapse(question), _collapse(answer) if sep else ""
+
+
+def _qa_content(text: str) -> str:
+    """
+    The part of a "Q:" label's content that belongs to the card: its own
+    line and the lines after it up to a blank line, so multi-line answers
+    are kept. Anything after the blank line (trailing chatter) is not part
+    of the card.
+    """
+    blank = _BLANK_LINE_RE.search(text)
+    return text[: blank.start()] if blank else text
+
+
+def _qa_label_end(line: str) -> int:
+    """Where the content of a "Q:" label line starts; -1 for other lines."""
+    if line.startswith("Q:") and not line.startswith("*", 2):
+        return 2
+    if "Q:" not in line:
+        return -1
+    label = _QA_LINE_RE.match(line)
+    return label.end() if label else -1
+
+
+def _parse_qa_lines(text: str) -> Optional[List[Card]]:
+    """
+    Fast path for text holding only Q/A cards: a few string methods per
+    line, like the old per-line parser, with the same results as
+    TextCardParser. Returns None if the text has a block-format label.
+    """
+    if "Q:" not in text:
+        return None  # Block format (or no cards): not worth splitting
+    cards = []
+    lines = text.split("\n")
+    for number, line in enumerate(lines):
+        start = _qa_label_end(line)
+        if start < 0:
+            if _BLOCK_LINE_RE.match(line):
+                return None
+            continue
+        # Continuation lines run up to a blank line or the next "Q:" line
+        end = number + 1
+        while end < len(lines) and lines[end].strip() and _qa_label_end(lines[end]) < 0:
+            end += 1
+        pipe = line.find("|", start)
+        if (
+            end == number + 1
+            and pipe > start
+            and line.startswith(" A:", pipe + 1)
+            and not line.startswith("*", pipe + 4)
+        ):
+            # The usual one-line "Q: question | A: answer", no markdown bold
+            front = line[start:pipe].strip()
+            back = line[pipe + 4 :].strip()
+        else:
+            front, back = _split_qa("\n".join([line[start:], *lines[number + 1 : end]]))
+        if front and back:
+            cards.append((front, back))
+    return cards
+
+
+class TextCardParser:
+    """
+    Single-pass parser for the Q/A and ``THẺ n`` text formats.
+
+    One compiled regex finds label lines. The text up to the next label
+    (continuation lines included) is the content of the label, so
+    multi-line cards are kept and the cost stays linear; a blank line also
+    ends a Q/A card. Text can be fed in fragments of any size; each card is
+    returned as soon as it is known to be complete: the next card starts,
+    the blank line after a Q/A card arrives, or the stream closes.
+    """
+
+    def __init__(self):
+        self._pending = []  # Fragments received since the last newline
+        self._open = None  # Kind of the label whose content is being read
+        self._parts = []  # Content of the open label so far
+        self._front = None
+        self._back = None
+        self._kind = None  # "qa", "blocks" or None
+        self.counts = Counter()  # Cards emitted per format
+
+    def _flush(self, cards: List[Card]):
+        if self._kind and self._front and self._back:
+            cards.append((self._front, self._back))
+            self.counts[self._kind] += 1
+        self._front = self._back = self._kind = None
+
+    def _begin(self, kind: str, cards: List[Card]):
+        """A new label starts: finish the current card if this begins another."""
+        if kind == "front":
+            # A new front without a marker in between starts a new card
+            if self._kind != "blocks" or self._back is not None:
+                self._flush(cards)
+                self._kind = "blocks"
+        elif kind == "back":
+            if self._kind != "blocks":
+                self._flush(cards)
+                self._kind = "blocks"
+        else:  # "qa" or a card marker
+            if self._kind:
+                self._flush(cards)
+            self._kind = "qa" if kind == "qa" else "blocks"
+
+    def _end(self, kind: str, text: str, cards: List[Card]):
+        """The content of a label is complete."""
+        if kind == "qa":
+            self._front, self._back = _split_qa(_qa_content(text))
+            self._flush(cards)
+        elif kind == "front":
+            self._front = _collapse(text)
+        else:
+            self._back = _collapse(text)
+
+    def _scan(self, chunk: str, final: bool) -> List[Card]:
+        """Consume ``chunk``, which starts at a line start."""
+        cards = []
+        # Labels are matched from the line break before them: a literal
+        # prefix lets the regex engine skip ahead instead of trying "^" at
+        # every position
+        chunk = "\n" + chunk
+        pos = 1
+        for match in _LABEL_RE.finditer(chunk):
+            if self._open:
+                self._parts.append(chunk[pos : match.start()])
+                self._end(self._open, "".join(self._parts), cards)
+                self._parts = []
+            kind = match.lastgroup
+            self._begin(kind, cards)
+            # Text after a card marker (the card number line) is ignored
+            self._open = kind if kind != "marker" else None
+            pos = match.end()
+        if not self._open:
+            return cards  # Text outside any label is ignored
+
+        rest = chunk[pos:]
+        self._parts.append(rest)
+        # A Q/A card is complete at a blank line. Parts end at a line break,
+        # so one that starts with a blank line ends the card too
+        if self._open == "qa" and len(self._parts) > 1:
+            rest = "\n" + rest
+        if final or (self._open == "qa" and _BLANK_LINE_RE.search(rest)):
+            self._end(self._open, "".join(self._parts), cards)
+            self._open = None
+            self._parts = []
+        return cards
+
+    def feed(self, fragment: str) -> List[Card]:
+        self._pending.append(fragment)
+        if "\n" not in fragment:
+            return []
+        # Only complete lines are scanned so labels are never split
+        data = "".join(self._pending)
+        cut = data.rfind("\n") + 1
+        self._pending = [data[cut:]] if cut < len(data) else []
+        return self._scan(data[:cut], final=False)
+
+    def close(self) -> List[Card]:
+        cards = self._scan("".join(self._pending), final=True)
+        self._pending = []
+        self._flush(cards)
+        return cards
+
+
+def parse_text_cards(text: str) -> Tuple[List[Card], Counter]:
+    """Parse a complete text-format response; returns cards and per-format counts."""
+    cards = _parse_qa_lines(text)
+    if cards is not None:
+        return cards, Counter(qa=len(cards))
+    parser = TextCardParser()
+    cards = parser.feed(text)
+    cards.extend(parser.close())
+    return cards, parser.counts
+
+
+def _card_from_json(item) -> Optional[Card]:
+    if not isinstance(item, dict):
+        return None
+    front, back = item.get("front"), item.get("back")
+    if not isinstance(front, str) or not isinstance(back, str):
+        return None
+    front, back = front.strip(), back.strip()
+    if front and back:
+        return front, back
+    return None
+
+
+def _strip_code_fence(text: str) -> str:
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+        if text.rstrip().endswith("```"):
+            text = text.rstrip()[:-3]
+    return text
+
+
+def parse_json_cards(text: str) -> Optional[List[Card]]:
+    """
+    Parse and validate JSON-mode output.
+
+    Accepts a list of ``{"front", "back"}`` objects (or an object holding
+    such a list under ``"cards"``); items with missing or empty sides are
+    dropped. Returns None if the text is not JSON of that shape.
+    """
+    try:
+        data = json.loads(_strip_code_fence(text))
+    except ValueError:
+        return None
+    if isinstance(data, dict):
+        data = data.get("cards")
+    if not isinstance(data, list):
+        return None
+    return [card for card in map(_card_from_json, data) if card]
+
+
+def salvage_json_cards(text: str) -> List[Card]:
+    """
+    The complete ``{"front", "back"}`` objects of JSON output that does not
+    parse, typically an array cut off at maxOutputTokens. Text that does not
+    start like JSON yields nothing.
+    """
+    text = _strip_code_fence(text)
+    if not text.startswith(("[", "{")):
+        return []
+    return IncrementalJSONParser().feed(text)
+
+
+def _text_path(counts: Counter) -> str:
+    if not counts:
+        return "failed"
+    return "blocks" if counts["blocks"] >= counts["qa"] else "qa"
+
+
+def parse_cards(text: str) -> List[Card]:
+    """
+    Parse a complete response: JSON first, then the complete objects of
+    truncated JSON, then the Q/A and ``THẺ n`` text formats. The path that
+    succeeded is counted in the parse stats.
+    """
+    cards = parse_json_cards(text)
+    if cards:
+        record_parse("json")
+        return cards
+    if cards is None:
+        cards = salvage_json_cards(text)
+        if cards:
+            record_parse("json_partial")
+            return cards
+
+    cards, counts = parse_text_cards(text)
+    record_parse(_text_path(counts))
+    return cards
+
+
+class IncrementalJSONParser:
+    """
+    Streaming JSON-mode parser: emits each ``{"front", "back"}`` object of
+    the top-level array as soon as its closing brace arrives.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._pending = []
+        self._started = False
+        self._decoder = json.JSONDecoder()
+
+    def feed(self, fragment: str) -> List[Card]:
+        # An object can only complete on a closing brace; until one arrives
+        # just collect fragments instead of re-scanning the buffer
+        self._pending.append(fragment)
+        if not self._started:
+            if "[" not in fragment:
+                return []
+        elif "}" not in fragment:
+            return []
+
+        self._buffer += "".join(self._pending)
+        self._pending = []
+        if not self._started:
+            start = self._buffer.find("[")
+            self._buffer = self._buffer[start + 1 :]
+            self._started = True
+
+        cards = []
+        pos = 0
+        while True:
+            while pos < len(self._buffer) and self._buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos >= len(self._buffer) or self._buffer[pos] != "{":
+                break
+            try:
+                item, pos = self._decoder.raw_decode(self._buffer, pos)
+            except ValueError:
+                break  # Object not complete yet
+            card = _card_from_json(item)
+            if card:
+                cards.append(card)
+
+        self._buffer = self._buffer[pos:]
+        return cards
+
+    @property
+    def truncated(self) -> bool:
+        """Whether unparsed text other than the closing bracket is left."""
+        rest = (self._buffer + "".join(self._pending)).strip(" \t\r\n,")
+        return rest not in ("]", "]}", "")
+
+    def close(self) -> List[Card]:
+        return []
+
+
+class IncrementalCardParser:
+    """
+    Streaming parser for any supported format. JSON output is parsed object
+    by object, text output label by label; if nothing was parsed by the end of
+    the stream, the full text goes through parse_cards() once more. Records
+    the path used in the parse stats.
+    """
+
+    def __init__(self):
+        self._fragments = []
+        self._parser = None
+        self._emitted = 0
+
+    def feed(self, fragment: str) -> List[Card]:
+        self._fragments.append(fragment)
+        if self._parser is None:
+            head = "".join(self._fragments).lstrip()
+            if not head:
+                return []
+            if head[0] in "[{`":
+                self._parser = IncrementalJSONParser()
+            else:
+                self._parser = TextCardParser()
+            cards = self._parser.feed("".join(self._fragments))
+        else:
+            cards = self._parser.feed(fragment)
+        self._emitted += len(cards)
+        return cards
+
+    def close(self) -> List[Card]:
+        if self._parser is None:
+            return []
+        cards = self._parser.close()
+        self._emitted += len(cards)
+        if not self._emitted:
+            return parse_cards("".join(self._fragments))
+
+        if isinstance(self._parser, IncrementalJSONParser):
+            record_parse("json_partial" if self._parser.truncated else "json")
+        else:
+            record_parse(_text_path(self._parser.counts))
+        return cards
+
+
+def iter_stream_cards(fragments, parser) -> Iterator[Card]:
+    """Run a fragment iterator through an incremental parser."""
+    for fragment in fragments:
+        yield from parser.feed(fragment)
+    yield from parser.close()
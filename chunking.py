@@ -0,0 +1,137 @@
+"""
+Chia văn bản dài thành các đoạn theo ngân sách token để tạo thẻ theo từng phần
+"""
+
+import re
+import unicodedata
+from typing import List
+
+from token_budget import estimate_tokens
+
+# Rough size of one chunk sent to Gemini, in tokens
+CHUNK_TOKENS = 3000
+# Upper bound on chunks per document; chunks grow beyond CHUNK_TOKENS instead
+MAX_CHUNKS = 8
+
+# CJK full stops are not followed by a space
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+|(?<=[。！？])\s*|\n+")
+_NON_WORD_RE = re.compile(r"[\W_]+")
+# Combining marks left by NFKD decomposition (accents, Vietnamese tones, kana
+# voicing marks)
+_COMBINING_RE = re.compile(
+    "[\u0300-\u036f\u1ab0-\u1aff\u1dc0-\u1dff\u20d0-\u20ff\ufe20-\ufe2f\u3099\u309a]+"
+)
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split text on sentence punctuation and line breaks."""
+    return [s.strip() for s in _SENTENCE_END_RE.split(text) if s and s.strip()]
+
+
+def _split_long_sentence(sentence: str, max_tokens: int) -> List[str]:
+    """Hard-wrap a single sentence that is bigger than a whole chunk."""
+    pieces, current, current_tokens = [], [], 0
+    for word in sentence.split():
+        word_tokens = estimate_tokens(word) + 1
+        if current and current_tokens + word_tokens > max_tokens:
+            pieces.append(" ".join(current))
+            current, current_tokens = [], 0
+        current.append(word)
+        current_tokens += word_tokens
+    if current:
+        pieces.append(" ".join(current))
+    return pieces
+
+
+def split_into_chunks(text: str, max_tokens: int = CHUNK_TOKENS) -> List[str]:
+    """
+    Split text into sentence-aligned chunks of at most ``max_tokens``.
+
+    Args:
+        text: The extracted document text
+        max_tokens: Token budget per chunk
+
+    Returns:
+        list: Chunks in document order
+    """
+    chunks, current, current_tokens = [], [], 0
+
+    for sentence in split_sentences(text):
+        sentence_tokens = estimate_tokens(sentence) + 1
+        if sentence_tokens > max_tokens:
+            parts = _split_long_sentence(sentence, max_tokens)
+        else:
+            parts = [sentence]
+
+        for part in parts:
+            part_tokens = estimate_tokens(part) + 1
+            if current and current_tokens + part_tokens > max_tokens:
+                chunks.append(" ".join(current))
+                current, current_tokens = [], 0
+            current.append(part)
+            current_tokens += part_tokens
+
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def chunk_document(text: str, num_cards: int) -> List[str]:
+    """
+    Chunk a document so it is covered by at most ``min(MAX_CHUNKS, num_cards)``
+    requests, growing chunks past CHUNK_TOKENS for very long documents.
+    """
+    max_chunks = max(1, min(MAX_CHUNKS, num_cards))
+    total_tokens = estimate_tokens(text)
+    chunk_tokens = max(CHUNK_TOKENS, -(-total_tokens // max_chunks))
+
+    # Sentence packing leaves slack in each chunk, so widen until it fits
+    chunks = split_into_chunks(text, chunk_tokens)
+    while len(chunks) > max_chunks:
+        chunk_tokens = int(chunk_tokens * 1.1) + 1
+        chunks = split_into_chunks(text, chunk_tokens)
+    return chunks
+
+
+def allocate_cards(chunks: List[str], num_cards: int) -> List[int]:
+    """
+    Distribute ``num_cards`` across chunks proportionally to their size.
+
+    Uses the largest-remainder method, so the counts always add up to
+    ``num_cards``.
+    """
+    sizes = [estimate_tokens(chunk) for chunk in chunks]
+    total = sum(sizes)
+    if not total:
+        return [0] * len(chunks)
+
+    quotas = [num_cards * size / total for size in sizes]
+    counts = [int(quota) for quota in quotas]
+    by_remainder = sorted(
+        range(len(chunks)), key=lambda i: quotas[i] - counts[i], reverse=True
+    )
+    for i in by_remainder[: num_cards - sum(counts)]:
+        counts[i] += 1
+    return counts
+
+
+def normalize_card_text(text: str) -> str:
+    """Lower-case, accent-insensitive form of a card side for comparisons."""
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    stripped = _COMBINING_RE.sub("", decomposed)
+    return _NON_WORD_RE.sub(" ", stripped).strip()
+
+
+def merge_cards(card_lists, num_cards: int):
+    """
+    Merge per-chunk results in document order, dropping cards whose
+    normalized front was already seen.
+    """
+    merged, seen = [], set()
+    for cards in card_lists:
+        for card in cards:
+            key = normalize_card_text(card.front)
+            if key and key not in seen:
+                seen.add(key)
+                merged.append(card)
+    return merged[:num_cards]
@@ -0,0 +1,164 @@
+"""
+Chọn lọc nội dung trước khi gửi cho Gemini: với văn bản PDF nhiều trang, bỏ
+header/footer và số trang lặp lại trên mọi trang và dòng trùng; rồi giữ các
+câu giàu thông tin nhất
+(BM25 theo chủ đề + độ trung tâm TF-IDF) vừa với ngân sách token đầu vào
+"""
+
+import re
+from collections import Counter
+from typing import List
+
+import numpy as np
+
+from chunking import split_sentences
+from offline_generator import count_matrix, score_sentences, tfidf_weights, tokenize
+from token_budget import INPUT_TOKEN_BUDGET, estimate_tokens
+from utils import PAGE_BREAK
+
+# A short line at the top or bottom of at least this share of pages (and of
+# 3 or more) is a running header/footer
+BOILERPLATE_PAGE_SHARE = 0.5
+BOILERPLATE_EDGE_LINES = 1
+BOILERPLATE_MAX_WORDS = 12
+# Fewer pages than this give too little evidence of what repeats
+BOILERPLATE_MIN_PAGES = 3
+# Cleaning that keeps less than this share of the text is wrong about what
+# is boilerplate; the text is then used as it is
+MIN_KEPT_SHARE = 0.5
+# BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_PARAGRAPH_BREAK = "\n\n"
+_DIGITS_RE = re.compile(r"\d+")
+_PAGE_NUMBER_RE = re.compile(
+    r"^(?:page|trang|p\.|seite|ページ)?\s*[-–(]?\s*\d{1,4}\s*[-–)]?"
+    r"(?:\s*(?:/|of|trên|sur)\s*\d{1,4})?$",
+    re.IGNORECASE,
+)
+
+
+def _line_key(line: str) -> str:
+    return " ".join(line.casefold().split())
+
+
+def _edge_keys(lines: List[str]) -> set:
+    """Digit-insensitive keys of the short lines at the top and bottom of a page."""
+    lines = [line for line in lines if line.strip()]
+    edges = lines[:BOILERPLATE_EDGE_LINES] + lines[-BOILERPLATE_EDGE_LINES:]
+    return {
+        _DIGITS_RE.sub("#", _line_key(line))
+        for line in edges
+        if len(line.split()) <= BOILERPLATE_MAX_WORDS
+    }
+
+
+def remove_boilerplate(text: str) -> str:
+    """
+    Drop page numbers, running headers and footers (short lines at the top
+    or bottom of most pages, compared with digits ignored) and repeated
+    lines from text extracted from a PDF of BOILERPLATE_MIN_PAGES or more.
+
+    Only real page breaks (utils.PAGE_BREAK) delimit pages: other text,
+    pasted or from slides, is returned as it is, since its blank lines and
+    repeated lines are content. So is the text if cleaning would remove
+    most of it.
+
+    Args:
+        text: Extracted text, pages separated by PAGE_BREAK
+
+    Returns:
+        str: The cleaned text, pages separated by blank lines
+    """
+    pages = [page.split("\n") for page in text.split(PAGE_BREAK)]
+    if len(pages) < BOILERPLATE_MIN_PAGES:
+        return text.replace(PAGE_BREAK, _PARAGRAPH_BREAK)
+
+    page_counts = Counter()
+    for lines in pages:
+        page_counts.update(_edge_keys(lines))
+    min_pages = max(BOILERPLATE_MIN_PAGES, BOILERPLATE_PAGE_SHARE * len(pages))
+    boilerplate = {key for key, count in page_counts.items() if count >= min_pages}
+
+    seen = set()
+    cleaned_pages = []
+    for lines in pages:
+        edges = _edge_keys(lines) & boilerplate
+        kept = []
+        for line in lines:
+            key = _line_key(line)
+            if not key or key in seen or _PAGE_NUMBER_RE.match(key):
+                continue
+            if edges and _DIGITS_RE.sub("#", key) in edges:
+                continue
+            seen.add(key)
+            kept.append(line.strip())
+        if kept:
+            cleaned_pages.append("\n".join(kept))
+    cleaned = _PARAGRAPH_BREAK.join(cleaned_pages)
+    if len(cleaned) < MIN_KEPT_SHARE * len(text.strip()):
+        return text.replace(PAGE_BREAK, _PARAGRAPH_BREAK)
+    return cleaned
+
+
+def bm25_scores(counts, vocabulary: dict, query: str) -> np.ndarray:
+    """
+    Okapi BM25 score of every row of a sentence-by-term count matrix
+    against ``query``.
+    """
+    columns = [vocabulary[word] for word in set(tokenize(query)) if word in vocabulary]
+    n_rows = counts.shape[0]
+    if not columns:
+        return np.zeros(n_rows)
+
+    lengths = np.asarray(counts.sum(axis=1)).ravel()
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / max(lengths.mean(), 1e-9))
+    tf = counts[:, columns].toarray()
+    df = (tf > 0).sum(axis=0)
+    idf = np.log((n_rows - df + 0.5) / (df + 0.5) + 1.0)
+    return (idf * tf * (BM25_K1 + 1) / (tf + norm[:, None])).sum(axis=1)
+
+
+def select_content(
+    text: str, subject: str = "", max_tokens: int = INPUT_TOKEN_BUDGET
+) -> str:
+    """
+    Cleaned text that fits ``max_tokens``.
+
+    Boilerplate is always removed. If the rest is still over budget, the
+    sentences most relevant to the subject (BM25) and most central to the
+    document (TF-IDF) are kept, in their original order.
+
+    Args:
+        text: The extracted document text
+        subject: Subject/topic used as the BM25 query
+        max_tokens: Input token budget
+
+    Returns:
+        str: The selected content
+    """
+    text = remove_boilerplate(text)
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    sentences = split_sentences(text)
+    counts, vocabulary = count_matrix(sentences)
+    centrality = score_sentences(tfidf_weights(counts), vocabulary)
+    relevance = bm25_scores(counts, vocabulary, subject)
+    # Both signals scaled to [0, 1] so neither dominates
+    scores = centrality / max(centrality.max(), 1e-9)
+    if relevance.any():
+        scores = scores + relevance / relevance.max()
+
+    chosen: List[int] = []
+    used = 0
+    for index in np.argsort(-scores, kind="stable"):
+        if used >= max_tokens:
+            break
+        tokens = estimate_tokens(sentences[index]) + 1
+        if used + tokens > max_tokens:
+            continue  # A shorter sentence may still fit
+        chosen.append(int(index))
+        used += tokens
+    return "\n".join(sentences[index] for index in sorted(chosen))
@@ -0,0 +1,169 @@
+"""
+Bộ thẻ bất biến có phiên bản (piece table): mỗi lần sửa/xóa/thêm thẻ tạo
+một phiên bản mới dùng chung dữ liệu với phiên bản cũ, nên lưu, nạp và giữ
+lịch sử chỉnh sửa không phải sao chép cả bộ thẻ
+"""
+
+from bisect import bisect_right
+from collections.abc import Sequence
+from itertools import accumulate
+from typing import Iterable, Iterator, Optional, Tuple
+
+# Pieces a version may reach before adjacent short pieces are merged
+MAX_PIECES = 64
+# Lazy-source pieces this short are read into memory when merging
+MERGE_READ_CARDS = 32
+# Cards read per slice when iterating over a lazy source (e.g. StoredDeck)
+ITER_PAGE = 500
+
+Piece = Tuple[Sequence, int, int]  # (source, start, stop)
+
+
+class Deck(Sequence):
+    """
+    Immutable sequence of cards with structural sharing.
+
+    A deck is a list of pieces, each a range of an immutable source: a
+    tuple of cards or a lazy view such as deck_store.StoredDeck. Editing
+    one card adds a one-card piece and splits the piece it falls in, so a
+    new version costs O(pieces), never a copy of the cards, and versions
+    share every source. Cards themselves are frozen, so no version can
+    change another. ``parent`` links each version to the one it was made
+    from, which is the edit history.
+
+    Sources must not change while a deck refers to them; a StoredDeck
+    raises deck_store.StaleSetError once its set has changed.
+    """
+
+    __slots__ = ("_pieces", "_ends", "parent", "version", "action")
+
+    def __init__(
+        self,
+        pieces: Iterable[Piece] = (),
+        parent: Optional["Deck"] = None,
+        action: str = "",
+    ):
+        self._pieces = tuple(piece for piece in pieces if piece[2] > piece[1])
+        # End offset (exclusive) of each piece within the deck
+        self._ends = tuple(accumulate(stop - start for _, start, stop in self._pieces))
+        self.parent = parent
+        self.version = parent.version + 1 if parent is not None else 0
+        self.action = action  # What made this version from its parent
+
+    @classmethod
+    def from_cards(cls, cards: Iterable) -> "Deck":
+        """A deck holding ``cards`` (copied once into a tuple)."""
+        cards = tuple(cards)
+        return cls([(cards, 0, len(cards))])
+
+    @classmethod
+    def over(cls, source: Sequence) -> "Deck":
+        """A deck over ``source`` without reading it: O(1)."""
+        return cls([(source, 0, len(source))])
+
+    def __len__(self) -> int:
+        return self._ends[-1] if self._ends else 0
+
+    def _position(self, index: int) -> int:
+        size = len(self)
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError("deck index out of range")
+        return index
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step == 1:
+                return list(self._iter_range(start, stop))
+            return [self[i] for i in range(start, stop, step)]
+
+        index = self._position(index)
+        piece = bisect_right(self._ends, index)
+        source, start, _ = self._pieces[piece]
+        begin = self._ends[piece - 1] if piece else 0
+        return source[start + index - begin]
+
+    def __iter__(self) -> Iterator:
+        return self._iter_range(0, len(self))
+
+    def _range(self, start: int, stop: int) -> Iterator[Piece]:
+        """The pieces (clipped) covering deck positions ``start`` to ``stop``."""
+        begin = 0
+        for (source, first, last), end in zip(self._pieces, self._ends):
+            if end > start and begin < stop:
+                lo = first + max(start - begin, 0)
+                hi = last - max(end - stop, 0)
+                yield source, lo, hi
+            begin = end
+            if begin >= stop:
+                break
+
+    def _iter_range(self, start: int, stop: int) -> Iterator:
+        for source, lo, hi in self._range(start, stop):
+            if isinstance(source, tuple):
+                yield from source[lo:hi]
+                continue
+            # Lazy sources are read a page at a time
+            for page in range(lo, hi, ITER_PAGE):
+                yield from source[page : min(page + ITER_PAGE, hi)]
+
+    def _splice(self, start: int, stop: int, cards: tuple, action: str) -> "Deck":
+        """New version with positions ``start``..``stop`` replaced by ``cards``."""
+        pieces = list(self._range(0, start))
+        if cards:
+            pieces.append((cards, 0, len(cards)))
+        pieces.extend(self._range(stop, len(self)))
+        if len(pieces) > MAX_PIECES:
+            pieces = _merge_small_pieces(pieces)
+        return Deck(pieces, parent=self, action=action)
+
+    def replace(self, index: int, card) -> "Deck":
+        index = self._position(index)
+        return self._splice(index, index + 1, (card,), "edit")
+
+    def delete(self, index: int) -> "Deck":
+        index = self._position(index)
+        return self._splice(index, index + 1, (), "delete")
+
+    def insert(self, index: int, card) -> "Deck":
+        index = max(0, min(index, len(self)))
+        return self._splice(index, index, (card,), "insert")
+
+    def append(self, card) -> "Deck":
+        return self.insert(len(self), card)
+
+    def undo(self) -> "Deck":
+        """The previous version (this one if there is none)."""
+        return self.parent if self.parent is not None else self
+
+    def history(self) -> Iterator["Deck"]:
+        """This version and its ancestors, newest first."""
+        deck = self
+        while deck is not None:
+            yield deck
+            deck = deck.parent
+
+    def __repr__(self):
+        return f"Deck(version={self.version}, cards={len(self)})"
+
+
+def _merge_small_pieces(pieces):
+    """
+    Join runs of adjacent in-memory pieces (and short ranges of lazy
+    sources) into one tuple. Long ranges of lazy sources are kept, so
+    compacting never reads a large part of a stored set.
+    """
+    merged, run = [], []
+    for source, start, stop in pieces:
+        if isinstance(source, tuple) or stop - start <= MERGE_READ_CARDS:
+            run.extend(source[start:stop])
+            continue
+        if run:
+            merged.append((tuple(run), 0, len(run)))
+            run = []
+        merged.append((source, start, stop))
+    if run:
+        merged.append((tuple(run), 0, len(run)))
+    return merged
@@ -0,0 +1,288 @@
+"""
+Định dạng nhị phân gọn cho bộ thẻ (.fcdeck): header, các khối thẻ nén
+(zlib; zstd chỉ khi được chọn, vì cần Python 3.14 để đọc) và bảng chỉ
+mục vị trí khối ở cuối file. File được đọc qua mmap nên lấy thẻ thứ i chỉ
+giải nén một khối nhỏ, không phải cả file
+"""
+
+import mmap
+import os
+import struct
+import zlib
+from collections import OrderedDict
+from collections.abc import Sequence
+from typing import IO, Iterable, Iterator, List, Tuple
+
+try:  # Python 3.14+
+    from compression import zstd
+except ImportError:
+    zstd = None
+
+MAGIC = b"FCDK"
+VERSION = 1
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+# zlib files open on every supported Python; zstd (3.14+) is opt-in
+DEFAULT_CODEC = CODEC_ZLIB
+# Cards per compressed block: larger blocks compress better, smaller ones
+# make fetching a single card cheaper
+BLOCK_CARDS = 64
+ZLIB_LEVEL = 6
+# Decoded blocks kept per open file (moving to the next card is a hit)
+BLOCK_CACHE = 4
+
+Card = Tuple[str, str]  # (front, back)
+
+# magic, version, codec, cards per block
+_HEADER = struct.Struct("<4sBBH")
+# card count, index offset, magic
+_TRAILER = struct.Struct("<QQ4s")
+_OFFSET = struct.Struct("<Q")
+_CORRUPT_BLOCK_ERRORS = (zlib.error,) + ((zstd.ZstdError,) if zstd else ())
+
+
+class CorruptDeckError(ValueError):
+    """The file, or a block of it, is damaged."""
+
+
+def _compress(data: bytes, codec: int) -> bytes:
+    if codec == CODEC_ZSTD:
+        return zstd.compress(data)
+    return zlib.compress(data, ZLIB_LEVEL)
+
+
+def _decompress(data, codec: int) -> bytes:
+    if codec == CODEC_ZSTD:
+        return zstd.decompress(data)
+    return zlib.decompress(data)
+
+
+def _encode_block(cards: List[Card], codec: int) -> bytes:
+    """
+    One block: the end offset of every string (front, back, front, ...)
+    as uint32, then the UTF-8 strings back to back, compressed together.
+    """
+    strings = [text.encode("utf-8") for card in cards for text in card]
+    ends, end = [], 0
+    for data in strings:
+        end += len(data)
+        ends.append(end)
+    table = struct.pack(f"<{len(ends)}I", *ends)
+    return _compress(table + b"".join(strings), codec)
+
+
+def _decode_card(data: bytes, count: int, offset: int) -> Card:
+    """Card ``offset`` of a decompressed block of ``count`` cards."""
+    base = 8 * count
+    first = 2 * offset
+    start = struct.unpack_from("<I", data, 4 * (first - 1))[0] if first else 0
+    middle, end = struct.unpack_from("<2I", data, 4 * first)
+    return (
+        data[base + start : base + middle].decode("utf-8"),
+        data[base + middle : base + end].decode("utf-8"),
+    )
+
+
+def _decode_block(data: bytes, count: int) -> List[Card]:
+    ends = struct.unpack_from(f"<{2 * count}I", data)
+    payload = memoryview(data)[8 * count :]
+    texts, start = [], 0
+    for end in ends:
+        texts.append(str(payload[start:end], "utf-8"))
+        start = end
+    return list(zip(texts[::2], texts[1::2]))
+
+
+def write_deck(
+    cards: Iterable[Card],
+    target: IO[bytes],
+    codec: int = DEFAULT_CODEC,
+    block_cards: int = BLOCK_CARDS,
+) -> int:
+    """
+    Write ``cards`` to ``target`` in the .fcdeck format.
+
+    Blocks are compressed and written as they fill and the index goes in
+    the trailer, so the cards are streamed and ``target`` need not be
+    seekable.
+
+    Args:
+        cards: (front, back) pairs; may be a generator
+        target: Writable binary file
+        codec: CODEC_ZLIB, or CODEC_ZSTD for smaller files that only
+            Python 3.14+ can read
+        block_cards: Cards per compressed block
+
+    Returns:
+        int: Number of cards written
+    """
+    if codec == CODEC_ZSTD and zstd is None:
+        raise ValueError("zstd cần Python 3.14 trở lên")
+    if not 0 < block_cards < 1 << 16:
+        raise ValueError(f"block_cards phải nằm trong 1..65535: {block_cards}")
+
+    position = target.write(_HEADER.pack(MAGIC, VERSION, codec, block_cards))
+    offsets, block, count = [], [], 0
+
+    def flush():
+        nonlocal position
+        offsets.append(position)
+        position += target.write(_encode_block(block, codec))
+        block.clear()
+
+    for front, back in cards:
+        block.append((front, back))
+        count += 1
+        if len(block) == block_cards:
+            flush()
+    if block:
+        flush()
+
+    # Index: the start of every block, then the end of the last one
+    offsets.append(position)
+    index = struct.pack(f"<{len(offsets)}Q", *offsets)
+    target.write(index + _TRAILER.pack(count, position, MAGIC))
+    return count
+
+
+class DeckFile(Sequence):
+    """
+    Read-only, random-access view of a .fcdeck file.
+
+    The file is memory-mapped (or, for in-memory files such as uploads,
+    its buffer is used without copying); reading card *i* decompresses
+    only the block holding it. The last few decoded blocks are cached, so
+    stepping through the cards decodes each block once. Items are
+    ``card_type(front, back)``.
+
+    Args:
+        source: Path, or a binary file object positioned anywhere
+        card_type: Callable building an item from (front, back)
+
+    Raises:
+        CorruptDeckError: The file is damaged. Reading a card from a
+            damaged block raises it too.
+    """
+
+    def __init__(self, source, card_type=tuple):
+        self._card_type = card_type
+        self._file = self._mmap = self._buffer = None
+        if isinstance(source, (str, os.PathLike)):
+            self._file = source = open(source, "rb")
+        if hasattr(source, "getbuffer"):
+            self._buffer = source.getbuffer()
+        else:
+            self._mmap = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+            self._buffer = memoryview(self._mmap)
+        self._blocks = OrderedDict()
+        try:
+            self._read_layout()
+        except BaseException:
+            self.close()
+            raise
+
+    def _read_layout(self):
+        buffer = self._buffer
+        if len(buffer) < _HEADER.size + _OFFSET.size + _TRAILER.size:
+            raise CorruptDeckError("File .fcdeck không hợp lệ: quá ngắn")
+        magic, version, self._codec, self._block_cards = _HEADER.unpack_from(buffer)
+        self._length, index_offset, end_magic = _TRAILER.unpack_from(
+            buffer, len(buffer) - _TRAILER.size
+        )
+        if magic != MAGIC or end_magic != MAGIC:
+            raise CorruptDeckError("File .fcdeck không hợp lệ")
+        if version != VERSION:
+            raise ValueError(f"Phiên bản .fcdeck không được hỗ trợ: {version}")
+        if self._codec not in (CODEC_ZLIB, CODEC_ZSTD):
+            raise ValueError(f"Kiểu nén không được hỗ trợ: {self._codec}")
+        if self._codec == CODEC_ZSTD and zstd is None:
+            raise ValueError("File .fcdeck nén bằng zstd cần Python 3.14 trở lên")
+        if not self._block_cards:
+            raise CorruptDeckError("File .fcdeck không hợp lệ: khối không có thẻ")
+        index_size = (self._block_count() + 1) * _OFFSET.size
+        if index_offset + index_size != len(buffer) - _TRAILER.size:
+            raise CorruptDeckError("File .fcdeck không hợp lệ: chỉ mục hỏng")
+        self._index_offset = index_offset
+
+    def _block_count(self) -> int:
+        return -(-self._length // self._block_cards)
+
+    def _cards_in(self, block: int) -> int:
+        return min(self._block_cards, self._length - block * self._block_cards)
+
+    def _block(self, block: int) -> bytes:
+        """Decompressed block, from the cache when it was read recently."""
+        data = self._blocks.get(block)
+        if data is not None:
+            self._blocks.move_to_end(block)
+            return data
+        data = self._blocks[block] = self._inflate(block)
+        if len(self._blocks) > BLOCK_CACHE:
+            self._blocks.popitem(last=False)
+        return data
+
+    def _inflate(self, block: int) -> bytes:
+        start, end = struct.unpack_from(
+            "<2Q", self._buffer, self._index_offset + block * _OFFSET.size
+        )
+        try:
+            data = _decompress(self._buffer[start:end], self._codec)
+        except _CORRUPT_BLOCK_ERRORS as e:
+            raise CorruptDeckError(f"Khối {block} của file .fcdeck bị hỏng: {e}") from e
+        if len(data) < 8 * self._cards_in(block):
+            raise CorruptDeckError(f"Khối {block} của file .fcdeck bị hỏng")
+        return data
+
+    def _card(self, card: Card):
+        if self._card_type is tuple:
+            return card
+        return self._card_type(*card)
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._length)
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            return list(self._iter_range(start, stop))
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("card index out of range")
+        block, offset = divmod(index, self._block_cards)
+        data = self._block(block)
+        return self._card(_decode_card(data, self._cards_in(block), offset))
+
+    def _iter_range(self, start: int, stop: int) -> Iterator:
+        position = start
+        while position < stop:
+            block, offset = divmod(position, self._block_cards)
+            cards = _decode_block(self._block(block), self._cards_in(block))
+            cards = cards[offset : offset + stop - position]
+            yield from map(self._card, cards)
+            position += len(cards)
+
+    def __iter__(self):
+        # Read straight through, without filling the block cache
+        for block in range(self._block_count()):
+            cards = _decode_block(self._inflate(block), self._cards_in(block))
+            yield from map(self._card, cards)
+
+    def close(self):
+        """Release the mapping (cards already read stay valid)."""
+        self._blocks.clear()
+        if self._buffer is not None:
+            self._buffer.release()
+            self._buffer = None
+        if self._mmap is not None:
+            self._mmap.close()
+        if self._file is not None:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,504 @@
+"""
+Xuất/nhập bộ thẻ dạng CSV, JSONL, Anki .apkg và .fcdeck theo kiểu
+streaming: thẻ được đọc, kiểm tra và ghi theo từng lô, nên bộ 100k thẻ
+cũng chỉ chiếm một lượng bộ nhớ nhỏ, cố định
+"""
+
+import csv
+import hashlib
+import html
+import io
+import json
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import time
+import zipfile
+from dataclasses import dataclass
+from typing import IO, Iterable, Iterator, Tuple
+
+from deck_format import DeckFile, write_deck
+from deck_store import PAGE_SIZE
+
+FORMATS = ("csv", "jsonl", "apkg", "fcdeck")
+MIME_TYPES = {
+    "csv": "text/csv",
+    "jsonl": "application/jsonl",
+    "apkg": "application/octet-stream",
+    "fcdeck": "application/octet-stream",
+}
+# Exports larger than this are written to a temporary file instead of memory
+SPOOL_SIZE = int(os.getenv("FLASHCARD_EXPORT_SPOOL_MB", "8")) * 1024 * 1024
+# Longest front or back accepted on import, in characters
+MAX_FIELD_LENGTH = 10_000
+# Anki rejects .apkg files whose collection predates schema 11
+ANKI_SCHEMA_VERSION = 11
+
+Card = Tuple[str, str]  # (front, back)
+
+_CSV_HEADER = ("front", "back")
+_ANKI_FIELD_SEPARATOR = "\x1f"
+_BR_RE = re.compile(r"<br\s*/?>|</(?:div|p)>", re.IGNORECASE)
+_TAG_RE = re.compile(r"<[^>]*>")
+# Collections inside an .apkg, newest first; anki21b is zstd-compressed
+_ANKI_COLLECTIONS = ("collection.anki21", "collection.anki2")
+
+_ANKI_SCHEMA = """
+CREATE TABLE col (
+    id integer PRIMARY KEY, crt integer NOT NULL, mod integer NOT NULL,
+    scm integer NOT NULL, ver integer NOT NULL, dty integer NOT NULL,
+    usn integer NOT NULL, ls integer NOT NULL, conf text NOT NULL,
+    models text NOT NULL, decks text NOT NULL, dconf text NOT NULL,
+    tags text NOT NULL
+);
+CREATE TABLE notes (
+    id integer PRIMARY KEY, guid text NOT NULL, mid integer NOT NULL,
+    mod integer NOT NULL, usn integer NOT NULL, tags text NOT NULL,
+    flds text NOT NULL, sfld integer NOT NULL, csum integer NOT NULL,
+    flags integer NOT NULL, data text NOT NULL
+);
+CREATE TABLE cards (
+    id integer PRIMARY KEY, nid integer NOT NULL, did integer NOT NULL,
+    ord integer NOT NULL, mod integer NOT NULL, usn integer NOT NULL,
+    type integer NOT NULL, queue integer NOT NULL, due integer NOT NULL,
+    ivl integer NOT NULL, factor integer NOT NULL, reps integer NOT NULL,
+    lapses integer NOT NULL, left integer NOT NULL, odue integer NOT NULL,
+    odid integer NOT NULL, flags integer NOT NULL, data text NOT NULL
+);
+CREATE TABLE revlog (
+    id integer PRIMARY KEY, cid integer NOT NULL, usn integer NOT NULL,
+    ease integer NOT NULL, ivl integer NOT NULL, lastIvl integer NOT NULL,
+    factor integer NOT NULL, time integer NOT NULL, type integer NOT NULL
+);
+CREATE TABLE graves (usn integer NOT NULL, oid integer NOT NULL, type integer NOT NULL);
+CREATE INDEX ix_notes_usn ON notes (usn);
+CREATE INDEX ix_cards_usn ON cards (usn);
+CREATE INDEX ix_revlog_usn ON revlog (usn);
+CREATE INDEX ix_cards_nid ON cards (nid);
+CREATE INDEX ix_cards_sched ON cards (did, queue, due);
+CREATE INDEX ix_revlog_cid ON revlog (cid);
+CREATE INDEX ix_notes_csum ON notes (csum);
+"""
+_ANKI_NOTE = "INSERT INTO notes VALUES (?, ?, ?, ?, -1, '', ?, ?, ?, 0, '')"
+
+
+@dataclass
+class ImportResult:
+    set_name: str
+    imported: int
+    skipped: int  # Rows that were malformed, empty or too long
+
+
+# ---------------------------------------------------------------- export
+
+
+def iter_csv(cards: Iterable[Card], batch_size: int = PAGE_SIZE) -> Iterator[str]:
+    """CSV text of ``cards`` with a front,back header, one chunk per batch."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(_CSV_HEADER)
+    for count, card in enumerate(cards, 1):
+        writer.writerow(card)
+        if count % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def iter_jsonl(cards: Iterable[Card], batch_size: int = PAGE_SIZE) -> Iterator[str]:
+    """One JSON object per card, one chunk per batch."""
+    lines = []
+    for front, back in cards:
+        lines.append(
+            json.dumps({"front": front, "back": back}, ensure_ascii=False) + "\n"
+        )
+        if len(lines) == batch_size:
+            yield "".join(lines)
+            lines = []
+    yield "".join(lines)
+
+
+def _anki_html(text: str) -> str:
+    return html.escape(text, quote=False).replace("\n", "<br>")
+
+
+def _anki_deck(deck_id: int, name: str, now: int) -> dict:
+    return {
+        "id": deck_id,
+        "name": name,
+        "mod": now,
+        "usn": -1,
+        "desc": "",
+        "dyn": 0,
+        "conf": 1,
+        "collapsed": False,
+        "extendNew": 10,
+        "extendRev": 50,
+        "lrnToday": [0, 0],
+        "revToday": [0, 0],
+        "newToday": [0, 0],
+        "timeToday": [0, 0],
+    }
+
+
+def _anki_collection(deck_name: str, now: int):
+    """
+    Ids and JSON columns (conf, models, decks, dconf) of the col row: one
+    Front/Back note type, the deck and Anki's default deck options.
+    """
+    model_id, deck_id = now * 1000, now * 1000 + 1
+    fields = [
+        {
+            "name": name,
+            "ord": order,
+            "sticky": False,
+            "rtl": False,
+            "font": "Arial",
+            "size": 20,
+            "media": [],
+        }
+        for order, name in enumerate(("Front", "Back"))
+    ]
+    model = {
+        "id": model_id,
+        "name": "FlashCard Master",
+        "type": 0,
+        "mod": now,
+        "usn": -1,
+        "sortf": 0,
+        "did": deck_id,
+        "tmpls": [
+            {
+                "name": "Card 1",
+                "ord": 0,
+                "qfmt": "{{Front}}",
+                "afmt": "{{FrontSide}}<hr id=answer>{{Back}}",
+                "did": None,
+                "bqfmt": "",
+                "bafmt": "",
+            }
+        ],
+        "flds": fields,
+        "css": ".card { font-family: arial; font-size: 20px; text-align: center; }",
+        "latexPre": "\\documentclass[12pt]{article}\n\\begin{document}\n",
+        "latexPost": "\\end{document}",
+        "tags": [],
+        "vers": [],
+        "req": [[0, "any", [0]]],
+    }
+    decks = {
+        "1": _anki_deck(1, "Default", now),
+        str(deck_id): _anki_deck(deck_id, deck_name, now),
+    }
+    options = {
+        "id": 1,
+        "name": "Default",
+        "mod": 0,
+        "usn": 0,
+        "maxTaken": 60,
+        "autoplay": True,
+        "timer": 0,
+        "replayq": True,
+        "dyn": False,
+        "new": {
+            "delays": [1, 10],
+            "ints": [1, 4, 7],
+            "initialFactor": 2500,
+            "order": 1,
+            "perDay": 20,
+            "bury": True,
+            "separate": True,
+        },
+        "rev": {
+            "perDay": 200,
+            "ease4": 1.3,
+            "fuzz": 0.05,
+            "maxIvl": 36500,
+            "bury": True,
+            "minSpace": 1,
+            "ivlFct": 1,
+        },
+        "lapse": {
+            "delays": [10],
+            "mult": 0,
+            "minInt": 1,
+            "leechFails": 8,
+            "leechAction": 0,
+        },
+    }
+    conf = {"curDeck": deck_id, "curModel": str(model_id), "nextPos": 1}
+    return model_id, deck_id, conf, {str(model_id): model}, decks, {"1": options}
+
+
+def write_apkg(cards: Iterable[Card], target: IO[bytes], deck_name: str) -> int:
+    """
+    Write ``cards`` as an Anki package (a zip holding an SQLite collection).
+
+    The collection is built in a temporary file with batched inserts, then
+    streamed into the zip, so neither the cards nor the database are held
+    in memory.
+
+    Args:
+        cards: (front, back) pairs; may be a generator
+        target: Writable binary file
+        deck_name: Name of the Anki deck
+
+    Returns:
+        int: Number of cards written
+    """
+    now = int(time.time())
+    model_id, deck_id, *columns = _anki_collection(deck_name, now)
+    count = 0
+
+    def rows():
+        nonlocal count
+        for front, back in cards:
+            # Anki checksums and sorts by the plain text of the first field
+            checksum = int(hashlib.sha1(front.encode("utf-8")).hexdigest()[:8], 16)
+            fields = _anki_html(front) + _ANKI_FIELD_SEPARATOR + _anki_html(back)
+            # Stable per deck and position, so re-importing updates the notes
+            guid = hashlib.sha1(f"{deck_name}\0{count}".encode()).hexdigest()[:10]
+            yield now * 1000 + count, guid, model_id, now, fields, front, checksum
+            count += 1
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "collection.anki2")
+        conn = sqlite3.connect(path)
+        try:
+            conn.executescript(_ANKI_SCHEMA)
+            conn.execute(
+                "INSERT INTO col VALUES (1, ?, ?, ?, ?, 0, 0, 0, ?, ?, ?, ?, '{}')",
+                (
+                    now,
+                    now * 1000,
+                    now * 1000,
+                    ANKI_SCHEMA_VERSION,
+                    *(json.dumps(column) for column in columns),
+                ),
+            )
+            conn.executemany(_ANKI_NOTE, rows())
+            # One card per note; its id follows the note's, due is the order
+            conn.execute(
+                "INSERT INTO cards SELECT id, id, ?, 0, mod, -1, 0, 0, "
+                "id - ? + 1, 0, 0, 0, 0, 0, 0, 0, 0, '' FROM notes",
+                (deck_id, now * 1000),
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+        with zipfile.ZipFile(target, "w", zipfile.ZIP_DEFLATED) as package:
+            package.write(path, "collection.anki2")
+            package.writestr("media", "{}")
+    return count
+
+
+def export_deck(
+    cards: Iterable[Card], fmt: str, deck_name: str = "FlashCard Master"
+):
+    """
+    Export ``cards`` to a rewound temporary file, in memory while small
+    and on disk past SPOOL_SIZE.
+
+    Args:
+        cards: (front, back) pairs; may be a generator
+        fmt: One of FORMATS
+        deck_name: Deck name stored in .apkg files
+
+    Returns:
+        SpooledTemporaryFile: The exported file, positioned at the start
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Định dạng xuất không được hỗ trợ: {fmt}")
+    output = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+    try:
+        if fmt == "apkg":
+            write_apkg(cards, output, deck_name)
+        elif fmt == "fcdeck":
+            write_deck(cards, output)
+        else:
+            chunks = iter_csv(cards) if fmt == "csv" else iter_jsonl(cards)
+            for chunk in chunks:
+                output.write(chunk.encode("utf-8"))
+    except BaseException:
+        output.close()
+        raise
+    output.seek(0)
+    return output
+
+
+def download_data(exported: IO[bytes]) -> bytes:
+    """
+    The content of an exported file for st.download_button, which takes
+    str, bytes or a few io classes (BytesIO, BufferedReader...) but not a
+    SpooledTemporaryFile. The button keeps the whole file in memory anyway.
+    """
+    exported.seek(0)
+    return exported.read()
+
+
+# ---------------------------------------------------------------- import
+
+
+def _valid_card(front, back) -> bool:
+    return (
+        isinstance(front, str)
+        and isinstance(back, str)
+        and bool(front.strip())
+        and bool(back.strip())
+        and len(front) <= MAX_FIELD_LENGTH
+        and len(back) <= MAX_FIELD_LENGTH
+    )
+
+
+class _CardReader:
+    """Validating iterator over the cards of an import; counts skipped rows."""
+
+    def __init__(self, rows: Iterable):
+        self._rows = rows
+        self.skipped = 0
+
+    def __iter__(self) -> Iterator[Card]:
+        for row in self._rows:
+            if row is not None and _valid_card(*row):
+                yield row[0].strip(), row[1].strip()
+            else:
+                self.skipped += 1
+
+
+def read_csv(source: IO[bytes]) -> Iterator:
+    """(front, back) rows of a CSV file; a front,back header row is skipped."""
+    text = io.TextIOWrapper(source, encoding="utf-8-sig", newline="")
+    try:
+        for index, row in enumerate(csv.reader(text)):
+            header = tuple(cell.strip().casefold() for cell in row)
+            if index == 0 and header == _CSV_HEADER:
+                continue
+            if not any(cell.strip() for cell in row):
+                continue  # Blank lines are not cards
+            yield (row[0], row[1]) if len(row) == 2 else None
+    finally:
+        text.detach()  # Leave the upload open for the caller
+
+
+def read_jsonl(source: IO[bytes]) -> Iterator:
+    """(front, back) of each ``{"front": ..., "back": ...}`` line."""
+    for line in source:
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield None
+            continue
+        if isinstance(record, dict):
+            yield record.get("front"), record.get("back")
+        else:
+            yield None
+
+
+def _from_anki_html(text: str) -> str:
+    return html.unescape(_TAG_RE.sub("", _BR_RE.sub("\n", text))).strip()
+
+
+def read_apkg(source: IO[bytes]) -> Iterator:
+    """
+    (front, back) of each note of an Anki package: the first two fields,
+    with HTML removed. Notes with fewer fields yield None.
+
+    Raises:
+        ValueError: Not an .apkg, only a zstd-compressed (anki21b) one, or
+            its collection is not a readable database
+    """
+    try:
+        package = zipfile.ZipFile(source)
+    except zipfile.BadZipFile as e:
+        raise ValueError(f"File .apkg không hợp lệ: {e}") from e
+    with package, tempfile.TemporaryDirectory() as workdir:
+        names = set(package.namelist())
+        if "collection.anki21b" in names and "collection.anki21" not in names:
+            # collection.anki2 is then only an "update Anki" placeholder
+            raise ValueError(
+                "File .apkg dùng định dạng mới của Anki; hãy xuất lại với "
+                "tùy chọn 'Support older Anki versions'"
+            )
+        member = next((name for name in _ANKI_COLLECTIONS if name in names), None)
+        if member is None:
+            raise ValueError("File .apkg không chứa bộ sưu tập Anki")
+
+        path = os.path.join(workdir, "collection.db")
+        with package.open(member) as packed, open(path, "wb") as unpacked:
+            shutil.copyfileobj(packed, unpacked)
+        conn = sqlite3.connect(path)
+        try:
+            # Reported here, so that import_deck does not mistake errors of
+            # the database it saves into for a damaged file
+            for (fields,) in conn.execute("SELECT flds FROM notes ORDER BY id"):
+                fields = fields.split(_ANKI_FIELD_SEPARATOR)
+                if len(fields) < 2:
+                    yield None
+                    continue
+                yield _from_anki_html(fields[0]), _from_anki_html(fields[1])
+        except sqlite3.DatabaseError as e:
+            raise ValueError(f"Không đọc được file: {e}") from e
+        finally:
+            conn.close()
+
+
+def read_fcdeck(source: IO[bytes]) -> Iterator:
+    """(front, back) of each card of a .fcdeck file, block by block."""
+    with DeckFile(source) as cards:
+        yield from cards
+
+
+_READERS = {
+    "csv": read_csv,
+    "jsonl": read_jsonl,
+    "apkg": read_apkg,
+    "fcdeck": read_fcdeck,
+}
+
+
+def import_format(filename: str) -> str:
+    """Import format of a file, from its extension."""
+    extension = os.path.splitext(filename)[1].lower().lstrip(".")
+    fmt = "jsonl" if extension in ("jsonl", "ndjson") else extension
+    if fmt not in _READERS:
+        raise ValueError(f"Định dạng file không được hỗ trợ: .{extension}")
+    return fmt
+
+
+def import_deck(store, source: IO[bytes], fmt: str, set_name: str) -> ImportResult:
+    """
+    Validate the cards of an exported file and save them as a new set.
+
+    Rows stream from the file into one batched insert (a single
+    transaction), so a failed import leaves no partial set behind.
+
+    Args:
+        store: DeckStore to save into
+        source: Seekable binary file positioned at the start
+        fmt: One of FORMATS
+        set_name: Name of the new set
+
+    Returns:
+        ImportResult: Set name and counts of imported and skipped rows
+
+    Raises:
+        ValueError: Unsupported or unreadable file, the set exists, or no
+            valid card was found
+    """
+    if fmt not in _READERS:
+        raise ValueError(f"Định dạng file không được hỗ trợ: {fmt}")
+    reader = _CardReader(_READERS[fmt](source))
+    try:
+        imported = store.save_set(set_name, reader)
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise ValueError(f"Không đọc được file: {e}") from e
+    if not imported:
+        store.delete_set(set_name)
+        raise ValueError("File không chứa thẻ hợp lệ nào")
+    return ImportResult(set_name, imported, reader.skipped)
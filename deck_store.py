@@ -0,0 +1,504 @@
+"""
+Lưu trữ bộ thẻ bền vững bằng SQLite (chế độ WAL) thay cho dict
+st.session_state.sets: bảng sets/cards có chỉ mục, ghi theo lô, truy vấn
+từng thẻ hoặc từng trang để giao diện không phải nạp cả bộ vào RAM.
+Chỉ mục FTS5 (bỏ dấu tiếng Việt) cho phép tìm thẻ trong mọi bộ thẻ.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections.abc import Sequence
+from dataclasses import dataclass
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+DB_PATH = os.getenv(
+    "FLASHCARD_DB_PATH",
+    os.path.join(os.path.expanduser("~"), ".flashcard_master", "decks.db"),
+)
+# Cards fetched per query when iterating over a whole set
+PAGE_SIZE = 500
+# Statements kept compiled per connection
+CACHED_STATEMENTS = 64
+# Search results returned per query, and matches ranked to pick them
+SEARCH_LIMIT = 50
+SEARCH_CANDIDATES = 500
+# bm25 weights of the front, back and set name columns
+SEARCH_WEIGHTS = (2.0, 1.0, 0.5)
+
+Card = Tuple[str, str]  # (front, back)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sets (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    card_count INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    revision INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS cards (
+    id INTEGER PRIMARY KEY,
+    set_id INTEGER NOT NULL REFERENCES sets(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    front TEXT NOT NULL,
+    back TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_cards_set_position ON cards(set_id, position);
+CREATE INDEX IF NOT EXISTS idx_sets_updated ON sets(updated_at);
+"""
+
+# Contentless full-text index (rowid = cards.id): it stores only the
+# inverted index, the text stays in the cards table. unicode61 drops
+# diacritics; fold() also maps "đ" to "d", which unicode61 keeps.
+_SEARCH_SCHEMA = """
+CREATE VIRTUAL TABLE cards_fts USING fts5(
+    front, back, set_name,
+    content = '',
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+);
+INSERT INTO cards_fts (rowid, front, back, set_name)
+    SELECT c.id, fold(c.front), fold(c.back), fold(s.name)
+    FROM cards c JOIN sets s ON s.id = c.set_id;
+"""
+# The index is updated with one statement per write rather than by row
+# triggers: FTS5 flushes a segment per trigger call, which made saving a
+# set several times slower. A contentless table deletes a row from the
+# values it was indexed with, so "delete" reads them back from cards.
+_INDEX_CARDS = """
+INSERT INTO cards_fts ({command}rowid, front, back, set_name)
+    SELECT {value}c.id, fold(c.front), fold(c.back), fold(s.name)
+    FROM cards c JOIN sets s ON s.id = c.set_id
+    WHERE c.set_id = ? AND c.position >= ? AND c.position < ?
+"""
+_ADD_TO_INDEX = _INDEX_CARDS.format(command="", value="")
+_REMOVE_FROM_INDEX = _INDEX_CARDS.format(command="cards_fts, ", value="'delete', ")
+_ALL_POSITIONS = 1 << 62
+
+_FOLD_TABLE = str.maketrans("đĐ", "dD")
+_QUERY_TERM_RE = re.compile(r"\w+")
+
+# Statements are module constants so every call reuses the compiled form
+_SET_ID = "SELECT id FROM sets WHERE name = ?"
+_INSERT_SET = (
+    "INSERT INTO sets (name, card_count, created_at, updated_at) VALUES (?, 0, ?, ?)"
+)
+_INSERT_CARD = "INSERT INTO cards (set_id, position, front, back) VALUES (?, ?, ?, ?)"
+# Every change to a set bumps its revision (see StoredDeck)
+_SET_COUNT = (
+    "UPDATE sets SET card_count = ?, updated_at = ?, revision = revision + 1"
+    " WHERE id = ?"
+)
+_TOUCH_SET = "UPDATE sets SET updated_at = ?, revision = revision + 1 WHERE id = ?"
+# Replace a set only if it is still at the expected revision. As the first
+# write it also takes the write lock, so nothing can change the set between
+# the check and the replacement
+_CLAIM_REVISION = (
+    "UPDATE sets SET revision = revision + 1 WHERE id = ? AND revision = ?"
+)
+_SET_REVISION = "SELECT revision, card_count FROM sets WHERE name = ?"
+_LIST_SETS = (
+    "SELECT name, card_count, created_at, updated_at FROM sets"
+    " ORDER BY updated_at DESC, id DESC LIMIT ? OFFSET ?"
+)
+_GET_CARD = (
+    "SELECT front, back FROM cards"
+    " WHERE set_id = (SELECT id FROM sets WHERE name = ?) AND position = ?"
+)
+_GET_PAGE = (
+    "SELECT front, back FROM cards"
+    " WHERE set_id = (SELECT id FROM sets WHERE name = ?)"
+    " AND position >= ? ORDER BY position LIMIT ?"
+)
+# The revision and the cards come from one statement, so from one snapshot
+_GET_RANGE = (
+    "SELECT s.revision, c.front, c.back FROM sets s"
+    " LEFT JOIN cards c"
+    " ON c.set_id = s.id AND c.position >= ? AND c.position < ?"
+    " WHERE s.name = ? ORDER BY c.position"
+)
+# bm25 is computed only for the newest SEARCH_CANDIDATES matches: ranking
+# every match of a very common word would take hundreds of milliseconds
+_SEARCH = (
+    "SELECT s.name, c.position, c.front, c.back, f.score"
+    " FROM (SELECT rowid, rank AS score FROM cards_fts WHERE cards_fts MATCH ?"
+    " ORDER BY rowid DESC LIMIT ?) AS f"
+    " JOIN cards c ON c.id = f.rowid JOIN sets s ON s.id = c.set_id"
+    " ORDER BY f.score LIMIT ?"
+)
+
+
+def fold(text: Optional[str]) -> Optional[str]:
+    """Text as indexed for search ("đ" becomes "d"; unicode61 strips the rest)."""
+    return text.translate(_FOLD_TABLE) if text else text
+
+
+def search_query(text: str) -> str:
+    """
+    FTS5 query for free text: every word must match, the last one as a
+    prefix (so results appear while typing). Words are quoted, so FTS5
+    syntax in the input is searched literally.
+    """
+    terms = [f'"{term}"' for term in _QUERY_TERM_RE.findall(fold(text))]
+    if terms:
+        terms[-1] += "*"
+    return " ".join(terms)
+
+
+@dataclass
+class DeckInfo:
+    name: str
+    card_count: int
+    created_at: float
+    updated_at: float
+
+
+@dataclass
+class SearchHit:
+    set_name: str
+    position: int
+    front: str
+    back: str
+    score: float  # bm25 rank, lower is better
+
+
+class DeckStore:
+    """
+    Card sets in one SQLite database, shared by every session of the server.
+
+    Each thread gets its own connection (WAL lets readers run while a set
+    is written). Cards are stored one row each, ordered by ``position``
+    within their set, so a single card or one page of a set is an indexed
+    lookup. Set sizes are kept in the sets table, so listing sets never
+    counts cards.
+
+    Fronts, backs and set names are also in an FTS5 index that every write
+    method updates. Without FTS5 in the SQLite build, ``search_enabled`` is
+    False and everything else still works.
+    """
+
+    def __init__(self, path: str = DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connection() as conn:
+            conn.executescript(_SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(sets)")}
+            if "revision" not in columns:  # Created before sets had revisions
+                conn.execute(
+                    "ALTER TABLE sets ADD COLUMN revision INTEGER NOT NULL DEFAULT 0"
+                )
+        self.search_enabled = self._create_search_index()
+
+    def _create_search_index(self) -> bool:
+        conn = self._connection()
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'cards_fts'"
+        ).fetchone()
+        try:
+            with conn:
+                if not exists:
+                    # Also indexes cards saved before the index existed
+                    conn.executescript(_SEARCH_SCHEMA)
+                    weights = ", ".join(map(str, SEARCH_WEIGHTS))
+                    conn.execute(
+                        "INSERT INTO cards_fts (cards_fts, rank) VALUES ('rank', ?)",
+                        (f"bm25({weights})",),
+                    )
+        except sqlite3.OperationalError as e:
+            print(f"Full-text search unavailable: {str(e)}")
+            return False
+        return True
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.path, timeout=30, cached_statements=CACHED_STATEMENTS
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            # WAL + NORMAL only risks the last commits on power loss, never
+            # corruption, and avoids an fsync per transaction
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            # Used to fill the search index
+            conn.create_function("fold", 1, fold, deterministic=True)
+            self._local.conn = conn
+        return conn
+
+    def _set_id(self, conn: sqlite3.Connection, name: str) -> Optional[int]:
+        row = conn.execute(_SET_ID, (name,)).fetchone()
+        return row[0] if row else None
+
+    def _index(self, conn, set_id: int, start=0, stop=_ALL_POSITIONS, add=True):
+        """Add cards ``start``..``stop`` of a set to the search index (or remove)."""
+        if self.search_enabled:
+            statement = _ADD_TO_INDEX if add else _REMOVE_FROM_INDEX
+            conn.execute(statement, (set_id, start, stop))
+
+    def _require_set(self, conn: sqlite3.Connection, name: str) -> int:
+        set_id = self._set_id(conn, name)
+        if set_id is None:
+            raise KeyError(name)
+        return set_id
+
+    def has_set(self, name: str) -> bool:
+        return self._set_id(self._connection(), name) is not None
+
+    def save_set(
+        self,
+        name: str,
+        cards: Iterable[Card],
+        replace: bool = False,
+        revision: Optional[int] = None,
+    ) -> int:
+        """
+        Store ``cards`` as set ``name`` in one transaction.
+
+        Args:
+            name: Set name (unique)
+            cards: (front, back) pairs in order; may be a generator
+            replace: Overwrite an existing set instead of raising
+            revision: Replace the set only if it is still at this revision
+                (the one the cards were loaded from)
+
+        Returns:
+            int: Number of cards stored
+
+        Raises:
+            ValueError: The set exists and ``replace`` is False
+            StaleSetError: The set changed or was deleted after ``revision``
+        """
+        now = time.time()
+        with self._connection() as conn:
+            set_id = self._set_id(conn, name)
+            if set_id is not None and not replace:
+                raise ValueError(f"Set already exists: {name}")
+            if revision is not None and (
+                set_id is None
+                or not conn.execute(_CLAIM_REVISION, (set_id, revision)).rowcount
+            ):
+                raise StaleSetError(name)
+            if set_id is None:
+                set_id = conn.execute(_INSERT_SET, (name, now, now)).lastrowid
+            else:
+                self._index(conn, set_id, add=False)
+                conn.execute("DELETE FROM cards WHERE set_id = ?", (set_id,))
+            count = self._insert_cards(conn, set_id, 0, cards)
+            self._index(conn, set_id)
+            conn.execute(_SET_COUNT, (count, now, set_id))
+        return count
+
+    def _insert_cards(self, conn, set_id: int, start: int, cards: Iterable[Card]):
+        """Batch-insert cards from ``start`` on; returns the resulting set size."""
+        position = start
+
+        def rows():
+            nonlocal position
+            for front, back in cards:
+                yield set_id, position, front, back
+                position += 1
+
+        conn.executemany(_INSERT_CARD, rows())
+        return position
+
+    def append_cards(self, name: str, cards: Iterable[Card]) -> int:
+        """Add cards at the end of a set; returns the new set size."""
+        with self._connection() as conn:
+            set_id = self._require_set(conn, name)
+            start = self.count_cards(name)
+            count = self._insert_cards(conn, set_id, start, cards)
+            self._index(conn, set_id, start)
+            conn.execute(_SET_COUNT, (count, time.time(), set_id))
+        return count
+
+    def delete_set(self, name: str) -> bool:
+        with self._connection() as conn:
+            set_id = self._set_id(conn, name)
+            if set_id is None:
+                return False
+            self._index(conn, set_id, add=False)
+            # Cards go with the set (ON DELETE CASCADE)
+            conn.execute("DELETE FROM sets WHERE id = ?", (set_id,))
+            return True
+
+    def list_sets(self, limit: int = -1, offset: int = 0) -> List[DeckInfo]:
+        """Sets, most recently changed first; ``limit=-1`` returns all."""
+        rows = self._connection().execute(_LIST_SETS, (limit, offset))
+        return [DeckInfo(*row) for row in rows]
+
+    def count_sets(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM sets").fetchone()[0]
+
+    def count_cards(self, name: str) -> int:
+        row = (
+            self._connection()
+            .execute("SELECT card_count FROM sets WHERE name = ?", (name,))
+            .fetchone()
+        )
+        return row[0] if row else 0
+
+    def set_revision(self, name: str) -> Optional[Tuple[int, int]]:
+        """
+        (revision, card count) of a set, or None if there is no such set.
+        The revision goes up with every change to the set.
+        """
+        row = self._connection().execute(_SET_REVISION, (name,)).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def get_cards_at(
+        self, name: str, revision: int, start: int, stop: int
+    ) -> List[Card]:
+        """
+        Cards ``start``..``stop`` of a set as of ``revision``.
+
+        Raises:
+            StaleSetError: The set changed or was deleted after ``revision``
+        """
+        rows = self._connection().execute(_GET_RANGE, (start, stop, name)).fetchall()
+        if not rows or rows[0][0] != revision:
+            raise StaleSetError(name)
+        return [(front, back) for _, front, back in rows if front is not None]
+
+    def get_card(self, name: str, position: int) -> Optional[Card]:
+        """The card at ``position`` (0-based), or None."""
+        row = self._connection().execute(_GET_CARD, (name, position)).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def get_cards(
+        self, name: str, offset: int = 0, limit: int = PAGE_SIZE
+    ) -> List[Card]:
+        """One page of a set, in order."""
+        rows = self._connection().execute(_GET_PAGE, (name, offset, limit))
+        return [(front, back) for front, back in rows]
+
+    def iter_cards(self, name: str, page_size: int = PAGE_SIZE) -> Iterator[Card]:
+        """Every card of a set, fetched page by page."""
+        offset = 0
+        while True:
+            page = self.get_cards(name, offset, page_size)
+            yield from page
+            if len(page) < page_size:
+                return
+            offset += page_size
+
+    def update_card(self, name: str, position: int, front: str, back: str) -> bool:
+        with self._connection() as conn:
+            set_id = self._require_set(conn, name)
+            self._index(conn, set_id, position, position + 1, add=False)
+            updated = conn.execute(
+                "UPDATE cards SET front = ?, back = ?"
+                " WHERE set_id = ? AND position = ?",
+                (front, back, set_id, position),
+            ).rowcount
+            self._index(conn, set_id, position, position + 1)
+            conn.execute(_TOUCH_SET, (time.time(), set_id))
+        return updated > 0
+
+    def delete_card(self, name: str, position: int) -> bool:
+        """Remove one card; the cards after it move up one position."""
+        with self._connection() as conn:
+            set_id = self._require_set(conn, name)
+            self._index(conn, set_id, position, position + 1, add=False)
+            deleted = conn.execute(
+                "DELETE FROM cards WHERE set_id = ? AND position = ?",
+                (set_id, position),
+            ).rowcount
+            if not deleted:
+                return False
+            conn.execute(
+                "UPDATE cards SET position = position - 1"
+                " WHERE set_id = ? AND position > ?",
+                (set_id, position),
+            )
+            conn.execute(
+                "UPDATE sets SET card_count = card_count - 1, updated_at = ?,"
+                " revision = revision + 1 WHERE id = ?",
+                (time.time(), set_id),
+            )
+        return True
+
+    def search(self, text: str, limit: int = SEARCH_LIMIT) -> List[SearchHit]:
+        """
+        Cards of every set matching ``text`` in their front, back or set
+        name, best first (bm25, fronts weighted highest). Accents and case
+        are ignored. When more than SEARCH_CANDIDATES cards match, the
+        newest of them are ranked.
+        """
+        query = search_query(text)
+        if not query or not self.search_enabled:
+            return []
+        rows = self._connection().execute(_SEARCH, (query, SEARCH_CANDIDATES, limit))
+        return [SearchHit(*row) for row in rows]
+
+    def deck(self, name: str, card_type: Callable[[str, str], object] = tuple):
+        """A lazy, read-only StoredDeck view of set ``name`` as it is now."""
+        return StoredDeck(self, name, card_type)
+
+
+class StaleSetError(Exception):
+    """A set changed after the revision that was read or is being replaced."""
+
+
+class StoredDeck(Sequence):
+    """
+    Read-only sequence view of one revision of a stored set that reads
+    cards on demand: an index reads one card, a slice reads one page.
+    Cards are built with ``card_type(front, back)``. Used as a lazy source
+    of deck.Deck, so loading a set reads nothing until a card is shown.
+
+    The revision and size are pinned when the view is made. Once the set
+    changes (in any session), reading raises StaleSetError instead of
+    returning cards of the new revision, so a deck over the view never
+    mixes two versions of the set.
+
+    Raises:
+        KeyError: There is no set ``name``
+    """
+
+    def __init__(self, store: DeckStore, name: str, card_type=tuple):
+        state = store.set_revision(name)
+        if state is None:
+            raise KeyError(name)
+        self.store = store
+        self.name = name
+        self.card_type = card_type
+        self.revision, self._length = state
+
+    def _read(self, start: int, stop: int) -> list:
+        cards = self.store.get_cards_at(self.name, self.revision, start, stop)
+        if self.card_type is tuple:
+            return cards
+        return [self.card_type(*card) for card in cards]
+
+    def is_current(self) -> bool:
+        """Whether the set is still at the revision this view shows."""
+        return self.store.set_revision(self.name) == (self.revision, self._length)
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._length)
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            return self._read(start, max(stop, start))
+
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("card index out of range")
+        return self._read(index, index + 1)[0]
+
+    def __iter__(self):
+        for start in range(0, self._length, PAGE_SIZE):
+            yield from self._read(start, start + PAGE_SIZE)
+
+
+# Global instance
+deck_store = DeckStore()
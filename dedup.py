@@ -0,0 +1,180 @@
+"""
+Phát hiện thẻ gần trùng (diễn đạt lại) bằng MinHash + LSH trên văn bản đã
+chuẩn hóa của mặt trước/mặt sau, chạy gần tuyến tính theo số thẻ
+"""
+
+from typing import List, Sequence
+
+import numpy as np
+
+from chunking import normalize_card_text
+
+# Signature length and its split into LSH bands (NUM_BANDS * ROWS_PER_BAND)
+NUM_PERMUTATIONS = 64
+NUM_BANDS = 16
+ROWS_PER_BAND = NUM_PERMUTATIONS // NUM_BANDS
+# Estimated Jaccard similarity at or above which two cards are duplicates
+DEFAULT_THRESHOLD = 0.7
+SHINGLE_SIZE = 4  # Characters per shingle
+# Shingles permuted per block while computing signatures
+BLOCK_SIZE = 65536
+# Following cards of the same LSH bucket each card is compared with
+MAX_BUCKET_NEIGHBOURS = 32
+
+_MAX_HASH = (1 << 32) - 1
+
+# Multiply-shift hash functions h(x) = ((a * x + b) mod 2**64) >> 32 with odd a.
+# Fixed seed: signatures are comparable across calls and processes
+_rng = np.random.default_rng(20240601)
+_PERM_A = _rng.integers(0, 1 << 63, NUM_PERMUTATIONS, dtype=np.uint64) * np.uint64(2)
+_PERM_A |= np.uint64(1)
+_PERM_B = _rng.integers(0, 1 << 63, NUM_PERMUTATIONS, dtype=np.uint64)
+
+
+def _card_text(card) -> str:
+    return f"{normalize_card_text(card.front)} {normalize_card_text(card.back)}"
+
+
+def _shingle_hashes(texts: Sequence[str]):
+    """
+    32-bit hashes of every character shingle of every text, computed on
+    one code point array for all texts.
+
+    Returns:
+        tuple: (hashes in text order, number of shingles per text)
+    """
+    # Short texts become a single shingle; empty texts get none
+    padded = [text.ljust(SHINGLE_SIZE) if text else "" for text in texts]
+    codes = np.frombuffer("\0".join(padded).encode("utf-32-le"), dtype=np.uint32)
+    separator = codes == 0
+    text_ids = np.cumsum(separator)
+
+    # A window is valid when it starts on a character and stays in one text
+    last = len(codes) - SHINGLE_SIZE + 1
+    valid = ~separator[:last] & (text_ids[:last] == text_ids[SHINGLE_SIZE - 1 :])
+    starts = np.flatnonzero(valid)
+
+    hashes = np.zeros(len(starts), dtype=np.uint64)
+    for offset in range(SHINGLE_SIZE):
+        hashes = (hashes ^ codes[starts + offset]) * np.uint64(0x100000001B3)
+    hashes ^= hashes >> np.uint64(29)
+    hashes &= np.uint64(_MAX_HASH)
+    counts = np.bincount(text_ids[starts], minlength=len(texts))
+    return hashes, counts
+
+
+def minhash_signatures(texts: Sequence[str]) -> np.ndarray:
+    """
+    MinHash signature of each text, one row of NUM_PERMUTATIONS per text.
+
+    All shingle hashes go through the permutations together, in blocks of
+    whole texts, and are reduced per text with np.minimum.reduceat. Empty
+    texts get an all-max signature that never matches anything.
+    """
+    hashes, counts = _shingle_hashes(texts)
+    signatures = np.full((len(texts), NUM_PERMUTATIONS), _MAX_HASH, dtype=np.uint64)
+    rows = np.flatnonzero(counts)
+    if not len(rows):
+        return signatures
+
+    ends = np.cumsum(counts[rows])
+    first = 0
+    while first < len(rows):
+        begin = ends[first - 1] if first else 0
+        # At least one text per block, then as many as fit in BLOCK_SIZE
+        last = max(first + 1, int(np.searchsorted(ends, begin + BLOCK_SIZE, "right")))
+        block = hashes[begin : ends[last - 1]]
+        # One row per hash function keeps reduceat on contiguous memory
+        permuted = (_PERM_A[:, None] * block + _PERM_B[:, None]) >> np.uint64(32)
+        offsets = np.concatenate(([0], ends[first : last - 1] - begin))
+        minima = np.minimum.reduceat(permuted, offsets, axis=1)
+        signatures[rows[first:last]] = minima.T
+        first = last
+    return signatures
+
+
+def _band_pairs(signatures: np.ndarray, band: int, candidates: np.ndarray):
+    """
+    (earlier, later) row pairs that share one LSH band, each row paired
+    with up to MAX_BUCKET_NEIGHBOURS following rows of its bucket.
+    """
+    columns = signatures[candidates, band * ROWS_PER_BAND : (band + 1) * ROWS_PER_BAND]
+    keys = np.ascontiguousarray(columns).view(
+        np.dtype((np.void, columns.dtype.itemsize * ROWS_PER_BAND))
+    )
+    _, inverse = np.unique(keys.ravel(), return_inverse=True)
+    inverse = inverse.ravel()
+    order = np.argsort(inverse, kind="stable")  # Keeps document order per bucket
+    rows, keys = candidates[order], inverse[order]
+
+    earlier, later = [], []
+    for distance in range(1, MAX_BUCKET_NEIGHBOURS + 1):
+        same = np.flatnonzero(keys[distance:] == keys[:-distance])
+        if not len(same):
+            break
+        earlier.append(rows[same])
+        later.append(rows[same + distance])
+    return earlier, later
+
+
+def find_duplicates(cards: Sequence, threshold: float = DEFAULT_THRESHOLD) -> List[int]:
+    """
+    Indices of cards that near-duplicate an earlier card.
+
+    Cards sharing an LSH band bucket are compared by the share of equal
+    MinHash values (an estimate of Jaccard similarity), all pairs at once.
+    A card is a duplicate only if it matches an earlier card that is kept,
+    so the first card of each group stays and results follow document
+    order.
+
+    Args:
+        cards: Objects with ``front`` and ``back`` attributes
+        threshold: Minimum estimated Jaccard similarity for a duplicate
+
+    Returns:
+        list: Sorted indices of the duplicates
+    """
+    signatures = minhash_signatures([_card_text(card) for card in cards])
+    candidates = np.flatnonzero(~(signatures == _MAX_HASH).all(axis=1))
+    if len(candidates) < 2:
+        return []
+
+    earlier, later = [], []
+    for band in range(NUM_BANDS):
+        band_earlier, band_later = _band_pairs(signatures, band, candidates)
+        earlier += band_earlier
+        later += band_later
+    if not earlier:
+        return []
+    # The same pair usually collides in several bands: compare it once
+    pairs = np.unique(
+        np.concatenate(later).astype(np.int64) * len(cards) + np.concatenate(earlier)
+    )
+    later, earlier = np.divmod(pairs, len(cards))
+    similarity = (signatures[earlier] == signatures[later]).mean(axis=1)
+    similar = similarity >= threshold
+
+    # Pairs are sorted by the later card, so each earlier card is settled
+    # before it is looked at
+    duplicate = np.zeros(len(cards), dtype=bool)
+    for first, second in zip(earlier[similar].tolist(), later[similar].tolist()):
+        if not duplicate[first]:
+            duplicate[second] = True
+    return np.flatnonzero(duplicate).tolist()
+
+
+def dedupe_cards(cards: Sequence, threshold: float = DEFAULT_THRESHOLD) -> List:
+    """
+    Drop cards that near-duplicate an earlier card, keeping the order.
+
+    Args:
+        cards: Flashcard objects (anything with ``front`` and ``back``)
+        threshold: Minimum estimated Jaccard similarity for a duplicate
+
+    Returns:
+        list: The remaining cards
+    """
+    if len(cards) < 2:
+        return list(cards)
+    duplicates = set(find_duplicates(cards, threshold))
+    return [card for index, card in enumerate(cards) if index not in duplicates]
@@ -1,8 +1,41 @@
+import hashlib
 import os
+import threading
+from collections import OrderedDict
 import google.generativeai as genai
+from google.ai import generativelanguage as glm
 from dataclasses import dataclass
 
-@dataclass
+from cache import response_cache, response_cache_key
+from card_parser import (
+    CARD_SCHEMA,
+    IncrementalCardParser,
+    iter_stream_cards,
+    parse_cards,
+)
+from content_selection import select_content
+from dedup import dedupe_cards
+from offline_generator import generate_offline_cards
+from token_budget import input_token_budget, output_token_budget, token_stats
+
+GEMINI_MODEL = "gemini-2.0-flash"
+# Ask Gemini for JSON matching CARD_SCHEMA; the THẺ text format is the fallback
+JSON_OUTPUT = True
+GENERATION_CONFIG = (
+    {"response_mime_type": "application/json", "response_schema": CARD_SCHEMA}
+    if JSON_OUTPUT
+    else {}
+)
+# Language of the cards this module's prompt asks for
+PROMPT_LANGUAGE = "vi"
+# Configured models kept per API key (least recently used evicted first)
+MODEL_CACHE_SIZE = 32
+
+_model_cache = OrderedDict()
+_model_cache_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
 class Flashcard:
     front: str  # Question/term
     back: str  # Answer/definition
@@ -10,7 +43,12 @@ class Flashcard:
 
 def setup_gemini_model(api_key=None):
     """
-    Set up and configure the Gemini model
+    Get a Gemini model bound to the given API key
+
+    Models are cached per key, so repeated generations skip client setup.
+    Each key gets its own client instead of going through the process-wide
+    genai.configure(), so concurrent sessions with different keys never
+    use each other's credentials.
 
     Args:
         api_key: Optional API key provided by the user
@@ -25,10 +63,25 @@ def setup_gemini_model(api_key=None):
     if not api_key:
         raise ValueError("Google API Key is required")
 
-    genai.configure(api_key=api_key)
+    cache_key = hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+    with _model_cache_lock:
+        model = _model_cache.get(cache_key)
+        if model is not None:
+            _model_cache.move_to_end(cache_key)
+            return model
+
+    model = genai.GenerativeModel(GEMINI_MODEL)
+    # GenerativeModel has no public client argument; it falls back to the
+    # global client only while _client is unset
+    model._client = glm.GenerativeServiceClient(client_options={"api_key": api_key})
 
-    # Return the generative model
-    return genai.GenerativeModel("gemini-2.0-flash")
+    with _model_cache_lock:
+        # Another thread may have built one meanwhile; keep the first
+        model = _model_cache.setdefault(cache_key, model)
+        _model_cache.move_to_end(cache_key)
+        while len(_model_cache) > MODEL_CACHE_SIZE:
+            _model_cache.popitem(last=False)
+    return model
 
 
 def get_sample_flashcards(subject):
@@ -94,6 +147,8 @@ def generate_flashcards(
     api_key=None,
     use_sample_on_error=False,
     use_local_model=True,
+    use_cache=True,
+    on_card=None,
 ):
     """
     Generate flashcards using various AI models (Gemini, Local AI, or rule-based)
@@ -104,19 +159,29 @@ def generate_flashcards(
         num_cards (int): Number of flashcards to generate
         api_key (str, optional): Google API key for Gemini model
         use_sample_on_error (bool): Whether to return sample cards on error
-        use_local_model (bool): Whether to try local AI models first
+        use_local_model (bool): Whether to fall back to the offline generator
+        use_cache (bool): Whether to reuse a cached response for the same prompt
+        on_card (callable, optional): Called with each Gemini card as soon as
+            it is streamed
 
     Returns:
         list: List of Flashcard objects
     """
-    # Thử local model trước nếu được bật
     # Thử Gemini nếu có API key
     if api_key or os.getenv("GOOGLE_API_KEY"):
         try:
-            return generate_flashcards_gemini(content, subject, num_cards, api_key)
+            return generate_flashcards_gemini(
+                content, subject, num_cards, api_key, use_cache, on_card
+            )
         except Exception as e:
             print(f"Gemini failed: {e}")
 
+    # Không có API key hoặc Gemini lỗi: tạo thẻ ngoại tuyến từ nội dung
+    if use_local_model:
+        flashcards = generate_flashcards_offline(content, subject, num_cards)
+        if flashcards:
+            return flashcards
+
     # Fallback về sample cards
     if use_sample_on_error:
         return get_sample_flashcards(subject)[:num_cards]
@@ -124,14 +189,69 @@ def generate_flashcards(
         raise Exception("Không thể tạo thẻ ghi nhớ với bất kỳ phương pháp nào")
 
 
-def generate_flashcards_gemini(content, subject, num_cards=10, api_key=None):
+def generate_flashcards_offline(content, subject, num_cards=10, language="vi"):
     """
-    Generate flashcards specifically using Google's Gemini model
+    Generate flashcards from the content alone, without calling any API
+
+    Args:
+        content (str): The educational content to convert to flashcards
+        subject (str): The subject or topic of the content
+        num_cards (int): Number of flashcards to generate
+        language (str): Language of the card templates
+
+    Returns:
+        list: List of Flashcard objects (may be fewer than num_cards)
     """
-    try:
-        model = setup_gemini_model(api_key)
-        # Prompt engineering for better results
-        prompt = f"""
+    return [
+        Flashcard(front, back)
+        for front, back in generate_offline_cards(content, subject, num_cards, language)
+    ]
+
+
+def _generation_config(num_cards):
+    """GENERATION_CONFIG plus an output budget sized for num_cards"""
+    return {
+        **GENERATION_CONFIG,
+        "max_output_tokens": output_token_budget(num_cards, PROMPT_LANGUAGE),
+    }
+
+
+def _is_truncated(response):
+    """Whether the response stopped at max_output_tokens"""
+    candidates = getattr(response, "candidates", None) or []
+    reason = getattr(candidates[0], "finish_reason", None) if candidates else None
+    return getattr(reason, "name", None) == "MAX_TOKENS"
+
+
+def _record_usage(response, cards):
+    """Update the per-card token statistics from a (complete) SDK response"""
+    usage = getattr(response, "usage_metadata", None)
+    token_stats.record(
+        PROMPT_LANGUAGE,
+        getattr(usage, "candidates_token_count", None),
+        cards,
+        truncated=_is_truncated(response),
+    )
+
+
+def _build_gemini_prompt(content, subject, num_cards):
+    if JSON_OUTPUT:
+        output_format = f"""Định dạng đầu ra: một mảng JSON gồm {num_cards} phần tử, mỗi phần tử có dạng
+        {{"front": "[Câu hỏi hoặc thuật ngữ]", "back": "[Câu trả lời hoặc định nghĩa]"}}"""
+    else:
+        output_format = f"""Định dạng đầu ra:
+        THẺ 1
+        Mặt trước: [Câu hỏi hoặc thuật ngữ]
+        Mặt sau: [Câu trả lời hoặc định nghĩa]
+        
+        THẺ 2
+        Mặt trước: [Câu hỏi hoặc thuật ngữ]
+        Mặt sau: [Câu trả lời hoặc định nghĩa]
+        
+        (và cứ thế cho tất cả {num_cards} thẻ)"""
+
+    # Prompt engineering for better results
+    prompt = f"""
         Tạo {num_cards} thẻ ghi nhớ học tập chi tiết về {subject} dựa trên nội dung sau. 
         Cho mỗi thẻ ghi nhớ, hãy tạo:
         1. Một câu hỏi hoặc thuật ngữ rõ ràng, ngắn gọn ở mặt trước
@@ -146,51 +266,74 @@ def generate_flashcards_gemini(content, subject, num_cards=10, api_key=None):
         Nội dung cần phân tích:
         {content}
         
-        Định dạng đầu ra:
-        THẺ 1
-        Mặt trước: [Câu hỏi hoặc thuật ngữ]
-        Mặt sau: [Câu trả lời hoặc định nghĩa]
-        
-        THẺ 2
-        Mặt trước: [Câu hỏi hoặc thuật ngữ]
-        Mặt sau: [Câu trả lời hoặc định nghĩa]
-        
-        (và cứ thế cho tất cả {num_cards} thẻ)
+        {output_format}
         """
+    return prompt
+
+
+def _stream_response(model, prompt, num_cards, on_card):
+    """
+    Call Gemini with stream=True, passing each card to on_card as soon as
+    it is complete. Returns the finished response and its cards.
+    """
+    response = model.generate_content(
+        prompt, generation_config=_generation_config(num_cards), stream=True
+    )
+    fragments = (chunk.text for chunk in response)
+    flashcards = []
+    for front, back in iter_stream_cards(fragments, IncrementalCardParser()):
+        flashcards.append(Flashcard(front, back))
+        on_card(flashcards[-1])
+    return response, flashcards
+
+
+def generate_flashcards_gemini(
+    content, subject, num_cards=10, api_key=None, use_cache=True, on_card=None
+):
+    """
+    Generate flashcards specifically using Google's Gemini model
 
-        response = model.generate_content(prompt)
-        response_text = response.text
-        # Parse the response to extract flashcards
-        flashcards = []
-        card_blocks = response_text.split("THẺ ")
-
-        for block in card_blocks[1:]:  # Skip the first empty block
-            # Extract front and back content
-            lines = block.strip().split("\n")
-
-            front = ""
-            back = ""
-            front_section = True
-
-            for line in lines[1:]:  # Skip the card number line
-                if line.startswith("Mặt trước:"):
-                    front = line.replace("Mặt trước:", "").strip()
-                    continue
-                if line.startswith("Mặt sau:"):
-                    back = line.replace("Mặt sau:", "").strip()
-                    front_section = False
-                    continue  # If not a header line, append to appropriate section
-                if front_section:
-                    if front and not line.startswith("Mặt trước:"):
-                        front += " " + line.strip()
-                else:
-                    if back and not line.startswith("Mặt sau:"):
-                        back += " " + line.strip()
-
-            if front and back:
-                flashcards.append(Flashcard(front, back))
+    Responses are cached by prompt and model; use_cache=False skips the
+    lookup (regenerate) but still stores the fresh response. With on_card,
+    the response is streamed (generate_content(stream=True)) and on_card
+    is called with each card as soon as it is complete.
+    """
+    try:
+        # Only the most informative passages, within the input token budget
+        content = select_content(content, subject, input_token_budget(num_cards))
+        prompt = _build_gemini_prompt(content, subject, num_cards)
+
+        # The output budget is left out of the key: it follows the statistics
+        cache_key = response_cache_key(prompt, GEMINI_MODEL, GENERATION_CONFIG)
+        response_text = response_cache.get(cache_key) if use_cache else None
+        if response_text is not None:
+            flashcards = [
+                Flashcard(front, back) for front, back in parse_cards(response_text)
+            ]
+            if on_card:  # A cached response is shown all at once
+                for card in flashcards:
+                    on_card(card)
+        else:
+            model = setup_gemini_model(api_key)
+            if on_card:
+                response, flashcards = _stream_response(
+                    model, prompt, num_cards, on_card
+                )
+            else:
+                response = model.generate_content(
+                    prompt, generation_config=_generation_config(num_cards)
+                )
+                flashcards = [
+                    Flashcard(front, back) for front, back in parse_cards(response.text)
+                ]
+            if not _is_truncated(response):
+                response_cache.set(cache_key, response.text)
+            _record_usage(response, len(flashcards))
 
+        # Drop paraphrased duplicates before trimming to the requested number
+        flashcards = dedupe_cards(flashcards)
         return flashcards[:num_cards]  # Ensure we only return the requested number
 
     except Exception as e:
         raise Exception(f"Lỗi khi tạo thẻ ghi nhớ: {str(e)}")
+
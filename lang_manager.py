@@ -80,15 +80,71 @@ class LanguageManager:
                 "set_not_found": "Không tìm thấy bộ thẻ '{name}'",  # AI methods
                 "ai_methods": {
                     "gemini": "Google Gemini",
+                    "offline": "Ngoại tuyến (không cần API)",
                 },
                 "ai_method_help": {
                     "gemini": "Google Gemini (cần API key)",
+                    "offline": "Tạo thẻ ngay từ nội dung, không cần API key hay kết nối mạng",
                 },  # Additional UI text
                 "gemini_api_guide": "Cách Lấy API Key Gemini (Miễn Phí)",
                 "visit_studio": "Truy cập",
                 "login_google": "Đăng nhập bằng tài khoản Google",
                 "create_api_key": "Tạo API key",
                 "copy_paste": "Sao chép và dán vào đây",
+                # Page range / extraction progress
+                "first_page": "Từ trang/slide:",
+                "last_page": "Đến trang/slide:",
+                "last_page_help": "0 = đến trang cuối",
+                "extracting_pages": "Đang trích xuất trang {done}/{total}...",
+                "include_notes": "Bao gồm ghi chú của người thuyết trình",
+                # Regenerate
+                "regenerate_btn": "Tạo Lại",
+                "regenerate_help": "Bỏ qua kết quả đã lưu và gọi lại Gemini",
+                # Statistics
+                "stats_title": "Thống kê",
+                "parse_stats_label": "Số phản hồi theo cách phân tích (json / json_partial / qa / blocks / failed)",
+                "cache_stats_label": "Bộ nhớ đệm",
+                "token_stats_label": "Token đầu ra trung bình mỗi thẻ",
+                # Offline generator
+                "generating_offline": "Đang tạo thẻ ghi nhớ ngoại tuyến từ nội dung...",
+                # Near-duplicate cleanup
+                "clean_set_btn": "Lọc thẻ trùng",
+                "clean_set_help": "Xóa các thẻ trùng hoặc gần trùng (diễn đạt lại) trong bộ thẻ",
+                "set_clean_success": "Đã xóa {count} thẻ trùng khỏi '{name}'",
+                # Shared in-flight generations
+                "flight_stats_label": "Lần tạo dùng chung (bắt đầu / gộp vào lần đang chạy / đã hủy)",
+                # Saved set paging
+                "sets_page_label": "Trang",
+                # Deck versions
+                "undo_btn": "Hoàn tác",
+                "undo_help": "Quay lại phiên bản trước của bộ thẻ (hiện tại: phiên bản {version})",
+                # Card search
+                "search_cards_label": "🔍 Tìm thẻ trong mọi bộ thẻ",
+                "search_cards_placeholder": "Từ khóa ở mặt trước, mặt sau hoặc tên bộ thẻ (không cần dấu)",
+                "search_no_results": "Không tìm thấy thẻ nào",
+                "search_open_label": "Mở thẻ",
+                "search_open_btn": "Mở",
+                "front_column": "Mặt trước",
+                "back_column": "Mặt sau",
+                # Export / import
+                "import_set_title": "Nhập bộ thẻ (CSV, JSONL, Anki .apkg)",
+                "import_file_label": "Chọn file cần nhập",
+                "import_set_btn": "Nhập",
+                "importing_set": "Đang nhập bộ thẻ...",
+                "import_success": "Đã nhập {count} thẻ vào '{name}' (bỏ qua {skipped} dòng không hợp lệ)",
+                "import_error": "Lỗi khi nhập bộ thẻ: {error}",
+                "export_format_label": "Định dạng xuất",
+                "export_set_btn": "Xuất bộ thẻ",
+                "exporting_set": "Đang xuất bộ thẻ...",
+                "download_set_btn": "Tải xuống",
+                # Binary deck files
+                "open_archive_btn": "Xem không cần nhập",
+                "open_archive_help": "Mở file .fcdeck trực tiếp; chỉ thẻ đang xem được giải nén",
+                # A loaded set changed in another session
+                "set_changed_reloaded": "Bộ thẻ '{name}' đã bị thay đổi ở phiên khác. Đã mở lại bản đã lưu; các chỉnh sửa chưa lưu bị bỏ.",
+                "set_changed_error": "Bộ thẻ '{name}' đã bị thay đổi ở phiên khác sau khi được mở, nên không ghi đè. Hãy mở lại bộ thẻ.",
+                # A block of an opened .fcdeck file is damaged
+                "archive_damaged": "File .fcdeck đang xem bị hỏng nên đã đóng lại: {error}",
             },
             "en": {
                 # App basics
@@ -164,16 +220,72 @@ class LanguageManager:
                 "ai_methods": {
                     "online": "Online AI",
                     "gemini": "Google Gemini",
+                    "offline": "Offline (no API)",
                 },
                 "ai_method_help": {
                     "online": "Use free online AI APIs",
                     "gemini": "Google Gemini (requires API key)",
+                    "offline": "Build cards from the content instantly, no API key or network needed",
                 },  # Additional UI text
                 "gemini_api_guide": "How to Get Gemini API Key (Free)",
                 "visit_studio": "Visit",
                 "login_google": "Sign in with Google account",
                 "create_api_key": "Create API key",
                 "copy_paste": "Copy and paste here",
+                # Page range / extraction progress
+                "first_page": "From page/slide:",
+                "last_page": "To page/slide:",
+                "last_page_help": "0 = until the last page",
+                "extracting_pages": "Extracting page {done}/{total}...",
+                "include_notes": "Include speaker notes",
+                # Regenerate
+                "regenerate_btn": "Regenerate",
+                "regenerate_help": "Ignore cached results and call Gemini again",
+                # Statistics
+                "stats_title": "Statistics",
+                "parse_stats_label": "Responses by parsing path (json / json_partial / qa / blocks / failed)",
+                "cache_stats_label": "Caches",
+                "token_stats_label": "Average output tokens per card",
+                # Offline generator
+                "generating_offline": "Generating flashcards offline from the content...",
+                # Near-duplicate cleanup
+                "clean_set_btn": "Clean duplicates",
+                "clean_set_help": "Remove duplicate and paraphrased cards from the set",
+                "set_clean_success": "Removed {count} duplicate cards from '{name}'",
+                # Shared in-flight generations
+                "flight_stats_label": "Shared generations (started / joined an in-flight one / cancelled)",
+                # Saved set paging
+                "sets_page_label": "Page",
+                # Deck versions
+                "undo_btn": "Undo",
+                "undo_help": "Go back to the previous version of the deck (current: version {version})",
+                # Card search
+                "search_cards_label": "🔍 Search cards in all sets",
+                "search_cards_placeholder": "Words from the front, back or set name",
+                "search_no_results": "No matching cards",
+                "search_open_label": "Open card",
+                "search_open_btn": "Open",
+                "front_column": "Front",
+                "back_column": "Back",
+                # Export / import
+                "import_set_title": "Import a set (CSV, JSONL, Anki .apkg)",
+                "import_file_label": "Choose a file to import",
+                "import_set_btn": "Import",
+                "importing_set": "Importing set...",
+                "import_success": "Imported {count} cards into '{name}' ({skipped} invalid rows skipped)",
+                "import_error": "Error importing set: {error}",
+                "export_format_label": "Export format",
+                "export_set_btn": "Export set",
+                "exporting_set": "Exporting set...",
+                "download_set_btn": "Download",
+                # Binary deck files
+                "open_archive_btn": "View without importing",
+                "open_archive_help": "Open the .fcdeck file directly; only the card on screen is decompressed",
+                # A loaded set changed in another session
+                "set_changed_reloaded": "Set '{name}' was changed in another session. Its saved version was reopened; unsaved edits were discarded.",
+                "set_changed_error": "Set '{name}' was changed in another session after it was opened, so it was not overwritten. Please reopen the set.",
+                # A block of an opened .fcdeck file is damaged
+                "archive_damaged": "The .fcdeck file being viewed is damaged and was closed: {error}",
             },
             "ja": {
                 # App basics
@@ -252,14 +364,70 @@ class LanguageManager:
                     "auto": "自動",
                     "online": "オンラインAI",
                     "gemini": "Google Gemini",
+                    "offline": "オフライン（API不要）",
                     "rule": "ルールベース",
                 },
                 "ai_method_help": {
                     "auto": "最適な無料AI APIを自動選択",
                     "online": "無料オンラインAI APIを使用（Cohere、Groq）",
                     "gemini": "Google Gemini（APIキー必要）",
+                    "offline": "APIキーやネット接続なしで内容から即座にカードを作成",
                     "rule": "AIなしで自動生成",
                 },
+                # Page range / extraction progress
+                "first_page": "開始ページ/スライド:",
+                "last_page": "終了ページ/スライド:",
+                "last_page_help": "0 = 最後のページまで",
+                "extracting_pages": "ページを抽出中 {done}/{total}...",
+                "include_notes": "発表者ノートを含める",
+                # Regenerate
+                "regenerate_btn": "再生成",
+                "regenerate_help": "キャッシュを使わずにGeminiを再度呼び出す",
+                # Statistics
+                "stats_title": "統計",
+                "parse_stats_label": "解析方法別の応答数 (json / json_partial / qa / blocks / failed)",
+                "cache_stats_label": "キャッシュ",
+                "token_stats_label": "カードあたりの平均出力トークン",
+                # Offline generator
+                "generating_offline": "内容からオフラインで単語カード生成中...",
+                # Near-duplicate cleanup
+                "clean_set_btn": "重複を削除",
+                "clean_set_help": "セット内の重複・言い換えカードを削除します",
+                "set_clean_success": "'{name}' から重複カードを {count} 枚削除しました",
+                # Shared in-flight generations
+                "flight_stats_label": "共有された生成（開始 / 実行中に合流 / キャンセル）",
+                # Saved set paging
+                "sets_page_label": "ページ",
+                # Deck versions
+                "undo_btn": "元に戻す",
+                "undo_help": "前のバージョンに戻します（現在: バージョン {version}）",
+                # Card search
+                "search_cards_label": "🔍 すべてのセットからカードを検索",
+                "search_cards_placeholder": "表面・裏面・セット名のキーワード",
+                "search_no_results": "一致するカードはありません",
+                "search_open_label": "カードを開く",
+                "search_open_btn": "開く",
+                "front_column": "表面",
+                "back_column": "裏面",
+                # Export / import
+                "import_set_title": "セットをインポート (CSV, JSONL, Anki .apkg)",
+                "import_file_label": "インポートするファイルを選択",
+                "import_set_btn": "インポート",
+                "importing_set": "セットをインポート中...",
+                "import_success": "'{name}' に {count} 枚のカードをインポートしました (無効な行 {skipped} 件をスキップ)",
+                "import_error": "セットのインポート中にエラー: {error}",
+                "export_format_label": "エクスポート形式",
+                "export_set_btn": "セットをエクスポート",
+                "exporting_set": "セットをエクスポート中...",
+                "download_set_btn": "ダウンロード",
+                # Binary deck files
+                "open_archive_btn": "インポートせずに表示",
+                "open_archive_help": ".fcdeck ファイルを直接開きます。表示中のカードだけが展開されます",
+                # A loaded set changed in another session
+                "set_changed_reloaded": "セット'{name}'は別のセッションで変更されました。保存済みのバージョンを開き直しました。未保存の編集は破棄されました。",
+                "set_changed_error": "セット'{name}'は開いた後に別のセッションで変更されたため、上書きしませんでした。セットを開き直してください。",
+                # A block of an opened .fcdeck file is damaged
+                "archive_damaged": "表示中の.fcdeckファイルが破損しているため閉じました：{error}",
             },
             "fr": {
                 # App basics
@@ -338,14 +506,70 @@ class LanguageManager:
                     "auto": "Auto",
                     "online": "IA En Ligne",
                     "gemini": "Google Gemini",
+                    "offline": "Hors ligne (sans API)",
                     "rule": "Règles",
                 },
                 "ai_method_help": {
                     "auto": "Choisir automatiquement la meilleure API IA gratuite",
                     "online": "Utiliser des API IA en ligne gratuites (Cohere, Groq)",
                     "gemini": "Google Gemini (nécessite une clé API)",
+                    "offline": "Crée des cartes directement à partir du contenu, sans clé API ni réseau",
                     "rule": "Génération automatique sans IA",
                 },
+                # Page range / extraction progress
+                "first_page": "De la page/diapositive :",
+                "last_page": "À la page/diapositive :",
+                "last_page_help": "0 = jusqu'à la dernière page",
+                "extracting_pages": "Extraction de la page {done}/{total}...",
+                "include_notes": "Inclure les notes de l'orateur",
+                # Regenerate
+                "regenerate_btn": "Régénérer",
+                "regenerate_help": "Ignorer le cache et rappeler Gemini",
+                # Statistics
+                "stats_title": "Statistiques",
+                "parse_stats_label": "Réponses par méthode d'analyse (json / json_partial / qa / blocks / failed)",
+                "cache_stats_label": "Caches",
+                "token_stats_label": "Jetons de sortie moyens par carte",
+                # Offline generator
+                "generating_offline": "Génération hors ligne de cartes à partir du contenu...",
+                # Near-duplicate cleanup
+                "clean_set_btn": "Nettoyer les doublons",
+                "clean_set_help": "Supprime les cartes en double ou reformulées du jeu",
+                "set_clean_success": "{count} cartes en double supprimées de '{name}'",
+                # Shared in-flight generations
+                "flight_stats_label": "Générations partagées (lancées / jointes en cours / annulées)",
+                # Saved set paging
+                "sets_page_label": "Page",
+                # Deck versions
+                "undo_btn": "Annuler",
+                "undo_help": "Revenir à la version précédente du jeu (actuelle : version {version})",
+                # Card search
+                "search_cards_label": "🔍 Rechercher dans tous les jeux",
+                "search_cards_placeholder": "Mots du recto, du verso ou du nom du jeu",
+                "search_no_results": "Aucune carte trouvée",
+                "search_open_label": "Ouvrir la carte",
+                "search_open_btn": "Ouvrir",
+                "front_column": "Recto",
+                "back_column": "Verso",
+                # Export / import
+                "import_set_title": "Importer un jeu (CSV, JSONL, Anki .apkg)",
+                "import_file_label": "Choisissez un fichier à importer",
+                "import_set_btn": "Importer",
+                "importing_set": "Importation du jeu...",
+                "import_success": "{count} cartes importées dans '{name}' ({skipped} lignes invalides ignorées)",
+                "import_error": "Erreur lors de l'importation du jeu : {error}",
+                "export_format_label": "Format d'exportation",
+                "export_set_btn": "Exporter le jeu",
+                "exporting_set": "Exportation du jeu...",
+                "download_set_btn": "Télécharger",
+                # Binary deck files
+                "open_archive_btn": "Afficher sans importer",
+                "open_archive_help": "Ouvrir le fichier .fcdeck directement ; seule la carte affichée est décompressée",
+                # A loaded set changed in another session
+                "set_changed_reloaded": "Le jeu '{name}' a été modifié dans une autre session. Sa version enregistrée a été rouverte ; les modifications non enregistrées ont été abandonnées.",
+                "set_changed_error": "Le jeu '{name}' a été modifié dans une autre session après son ouverture ; il n'a pas été écrasé. Veuillez rouvrir le jeu.",
+                # A block of an opened .fcdeck file is damaged
+                "archive_damaged": "Le fichier .fcdeck affiché est endommagé et a été fermé : {error}",
             },
         }
 
@@ -0,0 +1,246 @@
+"""
+Tạo thẻ ghi nhớ ngoại tuyến (không cần API key): chấm điểm câu bằng TF-IDF
+trên ma trận thưa NumPy/SciPy rồi biến các câu tiêu biểu nhất thành thẻ
+định nghĩa hoặc thẻ điền vào chỗ trống
+"""
+
+import re
+from itertools import chain
+from typing import List, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from chunking import split_sentences
+from token_budget import CJK_CHARS, estimate_tokens
+
+Card = Tuple[str, str]  # (front, back)
+
+# Sentences outside this length make poor cards. It is measured in estimated
+# tokens, not words, so languages written without spaces count too
+MIN_SENTENCE_TOKENS = 6  # About five English words
+MAX_SENTENCE_TOKENS = 100  # About sixty
+# Candidates more similar than this to an already chosen sentence are skipped
+MAX_SIMILARITY = 0.6
+# Sentences considered per wanted card when skipping near-duplicates
+CANDIDATE_FACTOR = 10
+# Score multiplier for sentences that mention the subject
+SUBJECT_BOOST = 1.5
+
+# Runs of word characters outside CJK scripts, or runs of CJK characters
+_WORD_RE = re.compile(rf"[^\W{CJK_CHARS}]+|[{CJK_CHARS}]+")
+_CJK_RE = re.compile(f"[{CJK_CHARS}]")
+# Japanese particles and inflections: bigrams with them make poor blanks
+_HIRAGANA_RE = re.compile("[\u3040-\u309f]")
+_DEFINITION_RES = [
+    re.compile(
+        r"^(?P<term>[^,.;:!?]{2,60}?)\s+"
+        r"(?:là|được gọi là|is|are|refers to|means|est|sont|désigne)\s+"
+        r"(?P<definition>.{10,})$",
+        re.IGNORECASE,
+    ),
+    re.compile(r"^(?P<term>[^,.;:!?]{2,60}):\s+(?P<definition>.{10,})$"),
+]
+
+_TEMPLATES = {
+    "vi": {"definition": "{term} là gì?", "cloze": "Điền vào chỗ trống: {text}"},
+    "en": {"definition": "What is {term}?", "cloze": "Fill in the blank: {text}"},
+    "ja": {"definition": "{term}とは何ですか？", "cloze": "空欄を埋めてください：{text}"},
+    "fr": {
+        "definition": "Qu'est-ce que {term} ?",
+        "cloze": "Complétez la phrase : {text}",
+    },
+}
+_BLANK = "_____"
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lower-cased word tokens. Runs of CJK characters, which are written
+    without spaces between words, become overlapping character bigrams.
+    """
+    words = _WORD_RE.findall(text.lower())
+    if text.isascii():
+        return words
+    tokens = []
+    for word in words:
+        if len(word) > 2 and _CJK_RE.match(word):
+            tokens.extend(word[i : i + 2] for i in range(len(word) - 1))
+        else:
+            tokens.append(word)
+    return tokens
+
+
+def count_matrix(sentences: Sequence[str]) -> Tuple[sparse.csr_matrix, dict]:
+    """Sentence-by-term count matrix and the term -> column vocabulary."""
+    tokens = [tokenize(sentence) for sentence in sentences]
+    words = list(chain.from_iterable(tokens))
+    # dict.fromkeys keeps first-seen order; both passes run in C
+    vocabulary = {word: column for column, word in enumerate(dict.fromkeys(words))}
+    indices = np.fromiter(map(vocabulary.__getitem__, words), np.int64, len(words))
+    indptr = np.zeros(len(tokens) + 1, dtype=np.int64)
+    np.cumsum([len(row) for row in tokens], out=indptr[1:])
+
+    matrix = sparse.csr_matrix(
+        (np.ones(len(words)), indices, indptr),
+        shape=(len(sentences), len(vocabulary)),
+    )
+    matrix.sum_duplicates()  # Repeated words become term counts
+    return matrix, vocabulary
+
+
+def tfidf_weights(counts: sparse.csr_matrix) -> sparse.csr_matrix:
+    """L2-normalised TF-IDF rows computed from a count matrix (left unchanged)."""
+    matrix = counts.copy()
+    n_rows = matrix.shape[0]
+    # Document frequency is the number of rows each column appears in
+    df = np.bincount(matrix.indices, minlength=matrix.shape[1])
+    idf = np.log((1 + n_rows) / (1 + df)) + 1.0
+
+    matrix.data *= idf[matrix.indices]
+    row_lengths = np.diff(matrix.indptr)
+    norms = np.sqrt(
+        np.add.reduceat(matrix.data**2, matrix.indptr[:-1])
+        if matrix.nnz
+        else np.zeros(n_rows)
+    )
+    norms[row_lengths == 0] = 1.0  # reduceat repeats values for empty rows
+    matrix.data /= np.repeat(norms, row_lengths)
+    return matrix
+
+
+def tfidf_matrix(sentences: Sequence[str]) -> Tuple[sparse.csr_matrix, dict]:
+    """
+    L2-normalised TF-IDF rows for ``sentences``.
+
+    Args:
+        sentences: The sentences to vectorise
+
+    Returns:
+        tuple: (CSR matrix with one row per sentence, vocabulary)
+    """
+    counts, vocabulary = count_matrix(sentences)
+    return tfidf_weights(counts), vocabulary
+
+
+def score_sentences(
+    matrix: sparse.csr_matrix, vocabulary: dict, subject: str = ""
+) -> np.ndarray:
+    """
+    Centrality score per sentence: cosine similarity to the document
+    centroid, boosted for sentences that mention a subject term.
+    """
+    centroid = np.asarray(matrix.mean(axis=0)).ravel()
+    scores = matrix @ centroid
+
+    subject_terms = [
+        vocabulary[word]
+        for word in tokenize(subject)
+        if word in vocabulary
+    ]
+    if subject_terms:
+        mentions = matrix[:, subject_terms].getnnz(axis=1) > 0
+        scores = np.where(mentions, scores * SUBJECT_BOOST, scores)
+    return scores
+
+
+def select_sentences(
+    matrix: sparse.csr_matrix, scores: np.ndarray, count: int
+) -> List[int]:
+    """
+    Indices of the ``count`` best sentences, skipping near-duplicates of
+    sentences already chosen. Returned best first.
+
+    Only the top ``count * CANDIDATE_FACTOR`` sentences are considered, so
+    their pairwise similarities fit in one small dense matrix.
+    """
+    ranked = np.argsort(-scores, kind="stable")[: count * CANDIDATE_FACTOR]
+    ranked = ranked[scores[ranked] > 0]
+    similarity = (matrix[ranked] @ matrix[ranked].T).toarray()
+
+    chosen = []
+    for position in range(len(ranked)):
+        if len(chosen) >= count:
+            break
+        if chosen and similarity[position, chosen].max() > MAX_SIMILARITY:
+            continue
+        chosen.append(position)
+    return [int(ranked[position]) for position in chosen]
+
+
+def _definition_card(sentence: str, templates: dict):
+    for pattern in _DEFINITION_RES:
+        match = pattern.match(sentence)
+        if match:
+            term = match.group("term").strip()
+            definition = match.group("definition").strip()
+            return templates["definition"].format(term=term), definition
+    return None
+
+
+def _cloze_card(sentence: str, row: sparse.csr_matrix, terms: List[str], templates):
+    """
+    Blank out the sentence's highest-weighted term of three or more
+    characters (a CJK bigram without hiragana).
+    """
+    for column in row.indices[np.argsort(-row.data, kind="stable")]:
+        term = terms[column]
+        cjk = _CJK_RE.match(term)
+        if len(term) < (2 if cjk else 3) or (cjk and _HIRAGANA_RE.search(term)):
+            continue
+        # There are no word boundaries between CJK characters
+        boundary = "" if cjk else r"\b"
+        pattern = re.compile(
+            rf"{boundary}{re.escape(term)}{boundary}", re.IGNORECASE
+        )
+        match = pattern.search(sentence)
+        if match:
+            text = sentence[: match.start()] + _BLANK + sentence[match.end() :]
+            return templates["cloze"].format(text=text), match.group(0)
+    return None
+
+
+def generate_offline_cards(
+    content: str, subject: str = "", num_cards: int = 10, language: str = "vi"
+) -> List[Card]:
+    """
+    Build flashcards from the text alone, without any API call.
+
+    Sentences are scored with TF-IDF centrality; the best ones become
+    definition cards ("X là Y", "X: Y") or cloze cards that blank out their
+    most distinctive term.
+
+    Args:
+        content: The extracted document text
+        subject: Subject/topic; sentences mentioning it rank higher
+        num_cards: Number of cards wanted
+        language: Language of the card templates (vi, en, ja, fr)
+
+    Returns:
+        list: (front, back) pairs, at most ``num_cards``
+    """
+    sentences = [
+        sentence
+        for sentence in split_sentences(content)
+        if MIN_SENTENCE_TOKENS <= estimate_tokens(sentence) <= MAX_SENTENCE_TOKENS
+    ]
+    if not sentences:
+        return []
+
+    matrix, vocabulary = tfidf_matrix(sentences)
+    scores = score_sentences(matrix, vocabulary, subject)
+    templates = _TEMPLATES.get(language, _TEMPLATES["en"])
+    terms = list(vocabulary)  # Insertion order matches the column numbers
+
+    cards = []
+    # Some sentences yield no card, so consider a few spares
+    for index in select_sentences(matrix, scores, num_cards * 2):
+        card = _definition_card(sentences[index], templates) or _cloze_card(
+            sentences[index], matrix[index], terms, templates
+        )
+        if card:
+            cards.append((index, card))
+        if len(cards) >= num_cards:
+            break
+    # Present the cards in the order the material introduces them
+    return [card for _, card in sorted(cards)]
@@ -2,14 +2,50 @@
 Module xử lý các API AI miễn phí cho deployment online
 """
 
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import Callable, Iterator, List, Optional, Sequence, Tuple
 
 import requests
 import streamlit as st
-
-
-@dataclass
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from cache import hash_key, response_cache, response_cache_key
+from card_parser import (
+    CARD_SCHEMA,
+    IncrementalCardParser,
+    iter_stream_cards,
+    parse_cards,
+)
+from retry_policy import RateLimiter, RetryPolicy, call_with_retry
+from chunking import CHUNK_TOKENS, allocate_cards, chunk_document, merge_cards
+from content_selection import select_content
+from dedup import dedupe_cards
+from singleflight import flight_key, generation_flights
+from token_budget import (
+    estimate_tokens,
+    input_token_budget,
+    output_token_budget,
+    token_stats,
+)
+
+# Số request Gemini chạy song song tối đa (semaphore của client async)
+MAX_CONCURRENT_REQUESTS = 4
+# Kết nối giữ lại trong pool: đủ cho các request song song của nhiều session
+HTTP_POOL_SIZE = 16
+REQUEST_TIMEOUT = 30
+# Yêu cầu Gemini trả về JSON theo CARD_SCHEMA (định dạng Q/A chỉ còn là dự phòng)
+JSON_OUTPUT = True
+# Độ dài tối đa của mỗi câu hỏi đã có khi gửi kèm request bổ sung thẻ
+TOP_UP_DIGEST_CHARS = 60
+
+
+@dataclass(frozen=True)
 class Flashcard:
     front: str
     back: str
@@ -24,162 +60,674 @@ class OnlineAIGenerator:
         # Chỉ sử dụng Gemini API
         self.apis = {
             "gemini": {
+                "model": "gemini-1.5-flash-latest",
                 "url": "https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash-latest:generateContent",
+                "stream_url": "https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash-latest:streamGenerateContent?alt=sse",
                 "enabled": True,
                 "free": True,
             },
         }
+        self.session = self._create_session()
+        self.retry_policy = RetryPolicy()
+        self.rate_limiter = RateLimiter()
+        self._warm_up_lock = threading.Lock()
+        self._warmed_up = False
 
-    def generate_with_gemini_free(
-        self,
-        content: str,
-        subject: str,
-        num_cards: int = 10,
-        language: str = "vi",
-        gemini_api_key: Optional[str] = None,
-    ) -> List[Flashcard]:
+    def _create_session(self) -> requests.Session:
         """
-        Sử dụng Google Gemini API để tạo flashcards
+        Session dùng chung với pool kết nối keep-alive, để mỗi request
+        không phải bắt tay TCP + TLS lại từ đầu. Adapter của requests dùng
+        pool thread-safe của urllib3 nên các thread script của Streamlit
+        có thể dùng chung session này.
         """
-        try:
-            # Nếu không có API key, skip method này
-            if not gemini_api_key:
-                print("Gemini API key not provided, skipping...")
-                return []
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=len(self.apis),
+            pool_maxsize=HTTP_POOL_SIZE,
+            # Chỉ thử lại lỗi kết nối; lỗi HTTP do tầng trên quyết định
+            max_retries=Retry(
+                total=2, connect=2, read=0, status=0, redirect=0, backoff_factor=0.2
+            ),
+        )
+        session.mount("https://", adapter)
+        session.headers.update({"Content-Type": "application/json"})
+        return session
+
+    def warm_up(self, background: bool = True):
+        """
+        Mở sẵn kết nối TLS tới Gemini để request đầu tiên không phải chờ
+        bắt tay. Chỉ chạy một lần cho mỗi process.
+        """
+        with self._warm_up_lock:
+            if self._warmed_up:
+                return
+            self._warmed_up = True
+
+        def connect():
+            try:
+                self.session.head(self.apis["gemini"]["url"], timeout=5)
+            except requests.RequestException as e:
+                print(f"Gemini warm-up failed: {str(e)}")
+
+        if background:
+            threading.Thread(target=connect, daemon=True).start()
+        else:
+            connect()
+
+    def _build_prompt(
+        self, content: str, subject: str, num_cards: int, language: str
+    ) -> str:
+        """
+        Tạo prompt cho một đoạn nội dung
+        """
+        if JSON_OUTPUT:
+            formats = {
+                "vi": '4. Trả về mảng JSON, mỗi phần tử có dạng {"front": "câu hỏi", "back": "câu trả lời"}',
+                "en": '4. Return a JSON array where each item is {"front": "question", "back": "answer"}',
+            }
+        else:
+            formats = {
+                "vi": "4. Định dạng: Q: [câu hỏi] | A: [câu trả lời]\n5. Mỗi thẻ trên một dòng riêng",
+                "en": "4. Format: Q: [question] | A: [answer]\n5. Each card on a separate line",
+            }
 
-            # Template cải tiến cho flashcard với Gemini
-            templates = {
-                "vi": {
-                    "prompt": f"""Tạo {num_cards} thẻ ghi nhớ về chủ đề "{subject}" từ nội dung sau:
+        templates = {
+            "vi": {
+                "prompt": f"""Tạo {num_cards} thẻ ghi nhớ về chủ đề "{subject}" từ nội dung sau:
 
-{content[:800]}
+{content}
 
 Yêu cầu:
 1. Mỗi thẻ có câu hỏi rõ ràng và câu trả lời chính xác
 2. Câu hỏi kiểm tra hiểu biết thực tế, không chỉ ghi nhớ máy móc
 3. Câu trả lời ngắn gọn nhưng đầy đủ thông tin
-4. Định dạng: Q: [câu hỏi] | A: [câu trả lời]
-5. Mỗi thẻ trên một dòng riêng
+{formats["vi"]}
 
 Tạo {num_cards} thẻ ghi nhớ:"""
-                },
-                "en": {
-                    "prompt": f"""Create {num_cards} flashcards about "{subject}" from the following content:
+            },
+            "en": {
+                "prompt": f"""Create {num_cards} flashcards about "{subject}" from the following content:
 
-{content[:800]}
+{content}
 
 Requirements:
 1. Each card has clear questions and accurate answers
 2. Questions test understanding, not just memorization
 3. Answers are concise but complete
-4. Format: Q: [question] | A: [answer]
-5. Each card on a separate line
+{formats["en"]}
 
 Create {num_cards} flashcards:"""
-                },
+            },
+        }
+
+        template = templates.get(language, templates["vi"])
+        return template["prompt"]
+
+    def _build_top_up_prompt(
+        self,
+        content: str,
+        subject: str,
+        missing: int,
+        existing_fronts: Sequence[str],
+        language: str,
+    ) -> str:
+        """
+        Prompt ngắn chỉ xin thêm số thẻ còn thiếu, kèm danh sách rút gọn các
+        câu hỏi đã có để model không lặp lại
+        """
+        digest = "\n".join(
+            f"- {front[:TOP_UP_DIGEST_CHARS]}" for front in existing_fronts
+        )
+        if JSON_OUTPUT:
+            formats = {
+                "vi": 'Trả về mảng JSON, mỗi phần tử có dạng {"front": "câu hỏi", "back": "câu trả lời"}',
+                "en": 'Return a JSON array where each item is {"front": "question", "back": "answer"}',
+            }
+        else:
+            formats = {
+                "vi": "Định dạng: Q: [câu hỏi] | A: [câu trả lời], mỗi thẻ một dòng",
+                "en": "Format: Q: [question] | A: [answer], one card per line",
             }
 
-            template = templates.get(language, templates["vi"])
+        templates = {
+            "vi": f"""Đã có các thẻ ghi nhớ về "{subject}" với câu hỏi:
+{digest}
 
-            # Google Gemini API endpoint
-            api_url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash-latest:generateContent?key={gemini_api_key}"
+Tạo thêm đúng {missing} thẻ mới, không trùng các câu hỏi trên, từ nội dung sau:
 
-            headers = {
-                "Content-Type": "application/json",
-            }
+{content}
 
-            payload = {
-                "contents": [{"parts": [{"text": template["prompt"]}]}],
-                "generationConfig": {
-                    "temperature": 0.7,
-                    "topK": 1,
-                    "topP": 1,
-                    "maxOutputTokens": 2048,
-                },
-            }
+{formats["vi"]}""",
+            "en": f"""Flashcards about "{subject}" already exist for these questions:
+{digest}
 
-            response = requests.post(api_url, headers=headers, json=payload, timeout=30)
+Create exactly {missing} new cards, not repeating the questions above, from this content:
 
-            if response.status_code == 200:
-                result = response.json()
-                if "candidates" in result and len(result["candidates"]) > 0:
-                    generated_text = result["candidates"][0]["content"]["parts"][0][
-                        "text"
-                    ]
+{content}
 
-                    if generated_text:
-                        flashcards = self._parse_qa_format(generated_text, num_cards)
-                        if flashcards and len(flashcards) >= 3:  # Ít nhất 3 thẻ hợp lệ
-                            print("✅ Success with Gemini API")
-                            return flashcards
-            else:
-                print(f"Gemini API error: {response.status_code} - {response.text}")
+{formats["en"]}""",
+        }
+        return templates.get(language, templates["vi"])
 
-            return []
+    def _generation_config(self, num_cards: int, language: str) -> dict:
+        """
+        generationConfig cho một request; maxOutputTokens được tính theo số
+        thẻ và số token mỗi thẻ đã quan sát được cho ngôn ngữ đó
+        """
+        config = {
+            "temperature": 0.7,
+            "topK": 1,
+            "topP": 1,
+            "maxOutputTokens": output_token_budget(num_cards, language),
+        }
+        if JSON_OUTPUT:
+            config["responseMimeType"] = "application/json"
+            config["responseSchema"] = CARD_SCHEMA
+        return config
+
+    def _cache_key(self, prompt: str, generation_config: dict) -> str:
+        # maxOutputTokens thay đổi theo thống kê nên không đưa vào khóa cache
+        config = {
+            key: value
+            for key, value in generation_config.items()
+            if key != "maxOutputTokens"
+        }
+        return response_cache_key(prompt, self.apis["gemini"]["model"], config)
 
-        except Exception as e:
-            print(f"Gemini API error: {str(e)}")
-            return []
+    def _post_gemini(
+        self,
+        url: str,
+        payload: dict,
+        gemini_api_key: str,
+        deadline: Optional[float] = None,
+        stream: bool = False,
+    ):
+        """
+        POST tới Gemini qua session dùng chung, có thử lại theo retry_policy
+        """
+        # API key đi trong header thay vì query string để không lộ trong URL/log
+        headers = {"x-goog-api-key": gemini_api_key}
+
+        return call_with_retry(
+            lambda timeout: self.session.post(
+                url, headers=headers, json=payload, timeout=timeout, stream=stream
+            ),
+            self.rate_limiter.bucket(gemini_api_key),
+            self.retry_policy,
+            retry_exceptions=(requests.ConnectionError, requests.Timeout),
+            deadline=deadline,
+            timeout=REQUEST_TIMEOUT,
+        )
+
+    def _call_gemini(
+        self,
+        prompt: str,
+        gemini_api_key: str,
+        generation_config: dict,
+        use_cache: bool = True,
+        deadline: Optional[float] = None,
+        usage: Optional[dict] = None,
+    ) -> Optional[str]:
+        """
+        Gửi một prompt tới Gemini và trả về văn bản sinh ra (hoặc None).
+
+        Kết quả được lưu cache theo prompt, model và generationConfig;
+        use_cache=False bỏ qua cache khi đọc (tạo lại) nhưng vẫn ghi kết quả mới.
+        Kết quả bị cắt do maxOutputTokens không được lưu cache. Lỗi 429/5xx
+        được thử lại theo self.retry_policy cho tới deadline (mốc
+        time.monotonic()). Nếu có usage, dict này được điền usageMetadata và
+        finishReason của response.
+        """
+        cache_key = self._cache_key(prompt, generation_config)
+        if use_cache:
+            cached = response_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        payload = {
+            "contents": [{"parts": [{"text": prompt}]}],
+            "generationConfig": generation_config,
+        }
 
-    def _parse_qa_format(self, text: str, num_cards: int) -> List[Flashcard]:
+        response = self._post_gemini(
+            self.apis["gemini"]["url"], payload, gemini_api_key, deadline
+        )
+
+        if response.status_code == 200:
+            result = response.json()
+            if "candidates" in result and len(result["candidates"]) > 0:
+                candidate = result["candidates"][0]
+                finish_reason = candidate.get("finishReason")
+                if usage is not None:
+                    usage.update(result.get("usageMetadata", {}))
+                    usage["finishReason"] = finish_reason
+                generated_text = candidate["content"]["parts"][0]["text"]
+                if generated_text and finish_reason != "MAX_TOKENS":
+                    response_cache.set(cache_key, generated_text)
+                return generated_text or None
+        else:
+            print(f"Gemini API error: {response.status_code} - {response.text}")
+
+        return None
+
+    def _request_cards(
+        self,
+        content: str,
+        subject: str,
+        num_cards: int,
+        language: str,
+        gemini_api_key: str,
+        use_cache: bool = True,
+        deadline: Optional[float] = None,
+    ) -> List[Flashcard]:
         """
-        Parse flashcards from Q: ... A: ... format
+        Gọi Gemini một lần cho một đoạn nội dung
+        """
+        prompt = self._build_prompt(content, subject, num_cards, language)
+        usage = {}
+        generated_text = self._call_gemini(
+            prompt,
+            gemini_api_key,
+            self._generation_config(num_cards, language),
+            use_cache,
+            deadline,
+            usage,
+        )
+        if generated_text:
+            flashcards = self._parse_cards(generated_text, num_cards)
+            token_stats.record_usage(language, usage, len(flashcards))
+            return flashcards
+        return []
+
+    def _stream_gemini(
+        self,
+        prompt: str,
+        gemini_api_key: str,
+        generation_config: dict,
+        use_cache: bool = True,
+        deadline: Optional[float] = None,
+        usage: Optional[dict] = None,
+    ) -> Iterator[str]:
         """
-        flashcards = []
-        lines = text.strip().split("\n")
+        Gọi streamGenerateContent (SSE) và trả về từng đoạn văn bản ngay khi
+        nhận được. Toàn bộ văn bản được lưu cache và usage được điền như
+        _call_gemini.
+        """
+        cache_key = self._cache_key(prompt, generation_config)
+        if use_cache:
+            cached = response_cache.get(cache_key)
+            if cached is not None:
+                yield cached
+                return
+
+        payload = {
+            "contents": [{"parts": [{"text": prompt}]}],
+            "generationConfig": generation_config,
+        }
+        response = self._post_gemini(
+            self.apis["gemini"]["stream_url"],
+            payload,
+            gemini_api_key,
+            deadline,
+            stream=True,
+        )
+
+        with response:
+            if response.status_code != 200:
+                print(f"Gemini API error: {response.status_code} - {response.text}")
+                return
 
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
+            response.encoding = "utf-8"
+            fragments = []
+            finish_reason = None
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                event = json.loads(line[len("data:") :])
+                if usage is not None and "usageMetadata" in event:
+                    usage.update(event["usageMetadata"])
+                for candidate in event.get("candidates", [])[:1]:
+                    finish_reason = candidate.get("finishReason", finish_reason)
+                    for part in candidate.get("content", {}).get("parts", []):
+                        if part.get("text"):
+                            fragments.append(part["text"])
+                            yield part["text"]
+
+        if usage is not None:
+            usage["finishReason"] = finish_reason
+        if fragments and finish_reason != "MAX_TOKENS":
+            response_cache.set(cache_key, "".join(fragments))
+
+    def stream_cards(
+        self,
+        content: str,
+        subject: str,
+        num_cards: int,
+        language: str,
+        gemini_api_key: str,
+        use_cache: bool = True,
+        deadline: Optional[float] = None,
+    ) -> Iterator[Flashcard]:
+        """
+        Tạo thẻ ở chế độ streaming: mỗi thẻ được trả về ngay khi phần tử JSON
+        (hoặc dòng Q/A) của nó hoàn chỉnh
+        """
+        prompt = self._build_prompt(content, subject, num_cards, language)
+        usage = {}
+        fragments = self._stream_gemini(
+            prompt,
+            gemini_api_key,
+            self._generation_config(num_cards, language),
+            use_cache,
+            deadline,
+            usage,
+        )
+        count = 0
+        # Đọc hết stream (thường chỉ còn dấu "]") để có usageMetadata và để
+        # kết nối được trả lại pool; thẻ thừa bị bỏ qua
+        for front, back in iter_stream_cards(fragments, IncrementalCardParser()):
+            count += 1
+            if count <= num_cards:
+                yield Flashcard(front=front, back=back)
+        token_stats.record_usage(language, usage, count)
+
+    async def request_cards_async(
+        self,
+        content: str,
+        subject: str,
+        num_cards: int,
+        language: str,
+        gemini_api_key: str,
+        semaphore: asyncio.Semaphore,
+        use_cache: bool = True,
+        deadline: Optional[float] = None,
+        executor: Optional[Executor] = None,
+    ) -> List[Flashcard]:
+        """
+        Phiên bản async của _request_cards. semaphore là bắt buộc và phải
+        dùng chung cho mọi request cần giới hạn cùng nhau (semaphore gắn với
+        một event loop nên không thể là biến toàn cục khi mỗi batch chạy
+        asyncio.run riêng). Lời gọi HTTP chạy trong executor (mặc định là
+        thread pool của event loop) nên dùng chung transport (session,
+        retry, cache) với bản đồng bộ.
+        """
+        async with semaphore:
+            return await asyncio.get_running_loop().run_in_executor(
+                executor,
+                self._request_cards,
+                content,
+                subject,
+                num_cards,
+                language,
+                gemini_api_key,
+                use_cache,
+                deadline,
+            )
 
-            # Tìm pattern Q: ... A: ... hoặc Q: ... | A: ...
-            if "Q:" in line and ("A:" in line or "|" in line):
-                try:
-                    # Split bằng | hoặc A:
-                    if "|" in line:
-                        parts = line.split("|", 1)
-                        question_part = parts[0].strip()
-                        answer_part = parts[1].strip()
-                    else:
-                        parts = line.split("A:", 1)
-                        question_part = parts[0].strip()
-                        answer_part = parts[1].strip() if len(parts) > 1 else ""
+    async def request_cards_batch_async(
+        self,
+        jobs: Sequence[Tuple[str, int]],
+        subject: str,
+        language: str,
+        gemini_api_key: str,
+        max_concurrency: int = MAX_CONCURRENT_REQUESTS,
+        use_cache: bool = True,
+        deadline: Optional[float] = None,
+    ) -> List[List[Flashcard]]:
+        """
+        Chạy nhiều request generateContent đồng thời, mỗi job là
+        (nội dung, số thẻ). Kết quả giữ đúng thứ tự của jobs; job lỗi trả
+        về danh sách rỗng.
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+        # Thread pool riêng đủ max_concurrency luồng: pool mặc định của event
+        # loop chỉ có min(32, số CPU + 4) luồng, ít hơn giới hạn trên máy nhỏ
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            results = await asyncio.gather(
+                *(
+                    self.request_cards_async(
+                        content,
+                        subject,
+                        count,
+                        language,
+                        gemini_api_key,
+                        semaphore,
+                        use_cache,
+                        deadline,
+                        executor,
+                    )
+                    for content, count in jobs
+                ),
+                return_exceptions=True,
+            )
 
-                    # Clean question and answer
-                    question = question_part.replace("Q:", "").strip()
-                    answer = answer_part.replace("A:", "").strip()
+        cards = []
+        for result in results:
+            if isinstance(result, Exception):
+                print(f"Gemini API error on chunk: {str(result)}")
+                cards.append([])
+            else:
+                cards.append(result)
+        return cards
 
-                    if question and answer:
-                        flashcards.append(Flashcard(front=question, back=answer))
+    def request_cards_batch(
+        self,
+        jobs: Sequence[Tuple[str, int]],
+        subject: str,
+        language: str,
+        gemini_api_key: str,
+        max_concurrency: int = MAX_CONCURRENT_REQUESTS,
+        use_cache: bool = True,
+        deadline: Optional[float] = None,
+    ) -> List[List[Flashcard]]:
+        """
+        Wrapper đồng bộ cho request_cards_batch_async, dùng được từ thread
+        script của Streamlit (nơi không có event loop đang chạy)
+        """
+        return asyncio.run(
+            self.request_cards_batch_async(
+                jobs,
+                subject,
+                language,
+                gemini_api_key,
+                max_concurrency,
+                use_cache,
+                deadline,
+            )
+        )
 
-                except Exception as e:
-                    continue
+    def _generate_chunked(
+        self,
+        content: str,
+        subject: str,
+        num_cards: int,
+        language: str,
+        gemini_api_key: str,
+        use_cache: bool = True,
+        deadline: Optional[float] = None,
+    ) -> List[Flashcard]:
+        """
+        Map-reduce cho tài liệu dài: chia đoạn, tạo thẻ đồng thời cho từng
+        đoạn theo tỉ lệ độ dài, rồi gộp và loại bỏ thẻ trùng
+        """
+        chunks = chunk_document(content, num_cards)
+        counts = allocate_cards(chunks, num_cards)
+        jobs = [(chunk, count) for chunk, count in zip(chunks, counts) if count > 0]
+
+        results = self.request_cards_batch(
+            jobs,
+            subject,
+            language,
+            gemini_api_key,
+            use_cache=use_cache,
+            deadline=deadline,
+        )
+        return merge_cards(results, num_cards)
+
+    def _top_up_cards(
+        self,
+        content: str,
+        subject: str,
+        flashcards: List[Flashcard],
+        num_cards: int,
+        language: str,
+        gemini_api_key: str,
+        use_cache: bool = True,
+        deadline: Optional[float] = None,
+    ) -> List[Flashcard]:
+        """
+        Khi nhận được ít thẻ hơn yêu cầu, gửi thêm một request nhỏ chỉ cho
+        số thẻ còn thiếu (trong cùng deadline). Trả về các thẻ mới không
+        trùng (kể cả gần trùng) với thẻ đã có.
+        """
+        missing = num_cards - len(flashcards)
+        if missing <= 0 or (deadline is not None and time.monotonic() >= deadline):
+            return []
 
-        # Nếu không đủ thẻ, tạo thêm từ content
-        if len(flashcards) < num_cards:
-            additional_needed = num_cards - len(flashcards)
-            additional_cards = self._generate_simple_cards_from_content(
-                text, additional_needed
+        prompt = self._build_top_up_prompt(
+            select_content(content, subject, input_token_budget(missing)),
+            subject,
+            missing,
+            [card.front for card in flashcards],
+            language,
+        )
+        usage = {}
+        try:
+            generated_text = self._call_gemini(
+                prompt,
+                gemini_api_key,
+                self._generation_config(missing, language),
+                use_cache,
+                deadline,
+                usage,
             )
-            flashcards.extend(additional_cards)
+        except Exception as e:
+            print(f"Gemini top-up error: {str(e)}")
+            return []
+        if not generated_text:
+            return []
 
-        return flashcards[:num_cards]
+        # Không cắt trước khi lọc trùng: thẻ lặp lại không được tính
+        parsed = self._parse_cards(generated_text, num_cards)
+        token_stats.record_usage(language, usage, len(parsed))
 
-    def _generate_simple_cards_from_content(
-        self, content: str, count: int
+        # flashcards đã được lọc trùng nên không thẻ cũ nào bị bỏ ở đây
+        merged = dedupe_cards(flashcards + parsed)
+        return merged[len(flashcards) :][:missing]
+
+    def generate_with_gemini_free(
+        self,
+        content: str,
+        subject: str,
+        num_cards: int = 10,
+        language: str = "vi",
+        gemini_api_key: Optional[str] = None,
+        use_cache: bool = True,
+        on_card: Optional[Callable[[Flashcard], None]] = None,
+        cancelled: Optional[threading.Event] = None,
     ) -> List[Flashcard]:
-        """Generate simple Q&A pairs from content when AI parsing fails"""
-        cards = []
-        sentences = [s.strip() for s in content.split(".") if s.strip()]
+        """
+        Sử dụng Google Gemini API để tạo flashcards
 
-        for i, sentence in enumerate(sentences[:count]):
-            if len(sentence) > 20:  # Only meaningful sentences
-                question = f"Câu hỏi {i+1}: {sentence[:50]}...?"
-                answer = sentence
-                cards.append(Flashcard(front=question, back=answer))
+        Nội dung được lọc bởi select_content() trước; nội dung ngắn được gửi
+        trong một request, tài liệu dài được chia thành nhiều đoạn và xử lý
+        song song. Nếu có on_card, request đơn được stream và on_card được
+        gọi cho từng thẻ ngay khi thẻ đó hoàn chỉnh. Khi cancelled được set
+        (không còn ai chờ kết quả), stream dừng và không xin thêm thẻ.
+        """
+        try:
+            # Nếu không có API key, skip method này
+            if not gemini_api_key:
+                print("Gemini API key not provided, skipping...")
+                return []
 
-        return cards
+            # Bỏ header/footer, dòng trùng và giữ phần giàu thông tin nhất
+            # vừa ngân sách token đầu vào (theo số thẻ cần tạo)
+            content = select_content(content, subject, input_token_budget(num_cards))
+
+            # Một hạn chót chung cho mọi request (kể cả thử lại) của lần tạo này
+            deadline = time.monotonic() + self.retry_policy.deadline
+
+            if on_card and estimate_tokens(content) <= CHUNK_TOKENS:
+                flashcards = []
+                for card in self.stream_cards(
+                    content,
+                    subject,
+                    num_cards,
+                    language,
+                    gemini_api_key,
+                    use_cache,
+                    deadline,
+                ):
+                    if cancelled is not None and cancelled.is_set():
+                        break
+                    flashcards.append(card)
+                    on_card(card)
+            elif estimate_tokens(content) <= CHUNK_TOKENS:
+                flashcards = self._request_cards(
+                    content,
+                    subject,
+                    num_cards,
+                    language,
+                    gemini_api_key,
+                    use_cache,
+                    deadline,
+                )
+            else:
+                flashcards = self._generate_chunked(
+                    content,
+                    subject,
+                    num_cards,
+                    language,
+                    gemini_api_key,
+                    use_cache,
+                    deadline,
+                )
+                if on_card:
+                    for card in flashcards:
+                        on_card(card)
+
+            # Bỏ các thẻ diễn đạt lại cùng một ý (thường gặp khi chia đoạn)
+            flashcards = dedupe_cards(flashcards)
+
+            # Thiếu thẻ: chỉ xin thêm phần còn thiếu thay vì tạo lại cả bộ
+            stopped = cancelled is not None and cancelled.is_set()
+            if len(flashcards) < num_cards and not stopped:
+                extra_cards = self._top_up_cards(
+                    content,
+                    subject,
+                    flashcards,
+                    num_cards,
+                    language,
+                    gemini_api_key,
+                    use_cache,
+                    deadline,
+                )
+                if on_card:
+                    for card in extra_cards:
+                        on_card(card)
+                flashcards = flashcards + extra_cards
+
+            if flashcards and len(flashcards) >= 3:  # Ít nhất 3 thẻ hợp lệ
+                print("✅ Success with Gemini API")
+                return flashcards
+
+            return []
+
+        except Exception as e:
+            print(f"Gemini API error: {str(e)}")
+            return []
+
+    def _parse_cards(self, text: str, num_cards: int) -> List[Flashcard]:
+        """
+        Parse flashcards from JSON output, falling back to Q: ... | A: ...
+        lines and THẺ blocks
+        """
+        flashcards = [
+            Flashcard(front=question, back=answer)
+            for question, answer in parse_cards(text)
+        ]
+        return flashcards[:num_cards]
 
     def generate_flashcards(
         self,
@@ -188,9 +736,20 @@ Create {num_cards} flashcards:"""
         num_cards: int = 10,
         language: str = "vi",
         gemini_api_key: Optional[str] = None,
+        use_cache: bool = True,
+        on_card: Optional[Callable[[Flashcard], None]] = None,
     ) -> List[Flashcard]:
         """
         Main method để tạo flashcards online - chỉ sử dụng Gemini API
+
+        on_card (tùy chọn) được gọi cho từng thẻ ngay khi nhận được, để giao
+        diện hiển thị thẻ đầu tiên mà không phải chờ cả bộ.
+
+        Các request giống hệt nhau (cùng nội dung, chủ đề, số thẻ, ngôn ngữ,
+        model và API key) đến cùng lúc chỉ gọi Gemini một lần qua
+        generation_flights; mọi người chờ nhận cùng các thẻ, kể cả qua
+        on_card. Kết quả thất bại (dưới 3 thẻ) không được chia sẻ: người chờ
+        tự gọi lại bằng request của mình.
         """
         # Kiểm tra Gemini API key
         if not gemini_api_key:
@@ -199,9 +758,35 @@ Create {num_cards} flashcards:"""
 
         try:
             st.info("🤖 Đang tạo flashcards với Gemini API...")
-            flashcards = self.generate_with_gemini_free(
-                content, subject, num_cards, language, gemini_api_key
+            # Tạo lại (use_cache=False) không gộp với một lần tạo thường. Chỉ
+            # gộp request cùng API key: key hỏng hoặc hết quota của một
+            # session không được làm hỏng request của session khác
+            key = flight_key(
+                content,
+                subject,
+                num_cards,
+                language,
+                self.apis["gemini"]["model"],
+                use_cache,
+                hash_key(gemini_api_key),
+            )
+            flashcards = generation_flights.do(
+                key,
+                lambda publish, cancelled: self.generate_with_gemini_free(
+                    content,
+                    subject,
+                    num_cards,
+                    language,
+                    gemini_api_key,
+                    use_cache,
+                    on_card=publish,
+                    cancelled=cancelled,
+                ),
+                on_item=on_card,
+                shareable=lambda cards: len(cards) >= 3,
             )
+            # Danh sách riêng cho mỗi người chờ (session tự sửa danh sách của mình)
+            flashcards = list(flashcards)
 
             if flashcards and len(flashcards) >= 3:  # Ít nhất 3 thẻ hợp lệ
                 st.success("✅ Tạo flashcards thành công!")
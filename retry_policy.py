@@ -0,0 +1,192 @@
+"""
+Chính sách thử lại cho API Gemini: backoff lũy thừa có jitter, tôn trọng
+Retry-After, token bucket theo từng API key và hạn chót tổng cho mỗi request
+"""
+
+import email.utils
+import hashlib
+import logging
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, FrozenSet, Optional, Tuple, Type
+
+# Gemini free tier allows about 15 requests per minute per key
+REQUESTS_PER_MINUTE = float(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "15"))
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RetryPolicy:
+    max_attempts: int = 5
+    base_delay: float = 1.0  # Seconds before the first retry (before jitter)
+    max_delay: float = 30.0  # Cap on a single backoff sleep
+    deadline: float = 90.0  # Overall budget for one request, in seconds
+    retry_statuses: FrozenSet[int] = field(
+        default_factory=lambda: frozenset({429, 500, 502, 503, 504})
+    )
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for the given (0-based) retry."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a Retry-After header (delta seconds or HTTP date) into seconds.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. ``acquire`` blocks until a token is available
+    or the deadline passes; ``pause`` holds every caller back, e.g. for the
+    duration of a server-sent Retry-After.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate  # Tokens per second
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    def acquire(self, deadline: Optional[float] = None) -> bool:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self._paused_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = max(
+                    self._paused_until - now, (1 - self._tokens) / self.rate, 0.01
+                )
+            if deadline is not None and now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+class RateLimiter:
+    """One token bucket per API key (keys are stored hashed)."""
+
+    def __init__(self, requests_per_minute: float = REQUESTS_PER_MINUTE):
+        self.rate = requests_per_minute / 60.0
+        self.capacity = max(1.0, requests_per_minute)
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, api_key: str) -> TokenBucket:
+        key = hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+        with self._lock:
+            if key not in self._buckets:
+                self._buckets[key] = TokenBucket(self.rate, self.capacity)
+            return self._buckets[key]
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+def call_with_retry(
+    send: Callable[[float], object],
+    bucket: TokenBucket,
+    policy: RetryPolicy,
+    retry_exceptions: Tuple[Type[BaseException], ...] = (),
+    deadline: Optional[float] = None,
+    timeout: float = 30.0,
+):
+    """
+    Call ``send(timeout)`` until it returns a non-retryable response.
+
+    Each attempt first takes a token from ``bucket``. Retryable status codes
+    and exceptions are retried with jittered exponential backoff, or after
+    the server's Retry-After when it sends one (which also pauses the
+    bucket for every other caller on the same key). A retried response is
+    closed before the backoff sleep, so a streamed response does not hold
+    its pooled connection while waiting.
+
+    Args:
+        send: Callable taking a per-attempt timeout and returning a response
+            with ``status_code``, ``headers`` and ``close()``
+        bucket: Token bucket for the API key in use
+        policy: Retry settings
+        retry_exceptions: Exception types that count as transient
+        deadline: Absolute time.monotonic() deadline; defaults to
+            now + policy.deadline
+        timeout: Per-attempt timeout cap in seconds
+
+    Returns:
+        The last response received (which may still be an error response
+        if attempts or time run out right after it)
+
+    Raises:
+        The last retryable exception if there is no response to return, or
+        DeadlineExceeded if the deadline passed with no response to return
+    """
+    if deadline is None:
+        deadline = time.monotonic() + policy.deadline
+
+    response = None
+    last_error = None
+    for attempt in range(policy.max_attempts):
+        if not bucket.acquire(deadline):
+            break
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+
+        delay = None
+        try:
+            response = send(min(timeout, remaining))
+        except retry_exceptions as e:
+            last_error = e
+            logger.warning("Gemini request failed (attempt %d): %s", attempt + 1, e)
+        else:
+            if response.status_code not in policy.retry_statuses:
+                return response
+            delay = parse_retry_after(response.headers.get("Retry-After"))
+            if delay is not None:
+                bucket.pause(delay)
+
+        if delay is None:
+            delay = policy.backoff(attempt)
+        if attempt + 1 == policy.max_attempts or time.monotonic() + delay >= deadline:
+            break
+        if response is not None:
+            # Release the connection; this response is not returned any more
+            response.close()
+            response = None
+        time.sleep(delay)
+
+    if response is None:
+        if last_error is not None:
+            raise last_error
+        raise DeadlineExceeded("Hết thời gian chờ phản hồi từ Gemini API")
+    return response
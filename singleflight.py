@@ -0,0 +1,179 @@
+"""
+Gộp các request tạo thẻ giống hệt nhau đang chạy cùng lúc (single-flight):
+request đầu tiên gọi Gemini, các request trùng chờ và nhận cùng kết quả,
+lỗi hoặc từng thẻ streaming; lệnh gọi bị hủy khi mọi người chờ đã rời đi
+"""
+
+import threading
+from collections import Counter
+from typing import Any, Callable, Dict, Optional
+
+from cache import hash_key
+
+
+def flight_key(
+    content: str, subject: str, num_cards: int, language: str, model: str, *extra
+) -> str:
+    """
+    Key of a generation request. Content is compared by the hash of its
+    whitespace-normalised text and the subject case-insensitively, so the
+    same handout uploaded by different users maps to one key.
+    """
+    normalized = " ".join(content.split())
+    return hash_key(
+        hash_key(normalized),
+        " ".join(subject.casefold().split()),
+        num_cards,
+        language,
+        model,
+        *extra,
+    )
+
+
+class _Flight:
+    """State of one in-flight call, shared by all of its waiters."""
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.items = []  # Published progress items, in order
+        self.done = False
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+        self.cancelled = threading.Event()
+
+    def publish(self, item):
+        with self.condition:
+            self.items.append(item)
+            self.condition.notify_all()
+
+
+class SingleFlight:
+    """
+    Thread-safe de-duplication of concurrent calls by key.
+
+    The first caller for a key starts ``fn`` in a worker thread; every
+    caller for that key (the first included) waits for it and gets its
+    return value, or has its exception raised. Items ``fn`` publishes are
+    replayed to each waiter's ``on_item`` in its own thread, so a waiter
+    that joins late still sees every item. With ``shareable``, a result it
+    rejects (or an error) is only returned to the first caller; the others
+    run ``fn`` themselves rather than get a failure that may not be theirs. If all waiters leave before the
+    call finishes, its ``cancelled`` event is set and the key is freed.
+    A finished call is forgotten at once; repeated requests are served by
+    the response cache instead.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self._stats = Counter()  # started, joined, cancelled, retried
+
+    def do(
+        self,
+        key: str,
+        fn: Callable[[Callable[[Any], None], threading.Event], Any],
+        on_item: Optional[Callable[[Any], None]] = None,
+        shareable: Optional[Callable[[Any], bool]] = None,
+    ):
+        """
+        Run ``fn(publish, cancelled)`` once for all concurrent callers of ``key``.
+
+        Args:
+            key: Request key (see flight_key)
+            fn: The call; ``publish(item)`` reports progress and
+                ``cancelled`` is set once nobody waits for the result
+            on_item: Called in the caller's thread for every published item
+            shareable: Whether a result may be handed to callers that joined
+                the call; those get neither a rejected result nor an error,
+                they call ``fn`` again on their own
+
+        Returns:
+            The value returned by ``fn``
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            flight.waiters += 1
+            self._stats["started" if leader else "joined"] += 1
+
+        try:
+            if leader:
+                threading.Thread(
+                    target=self._run, args=(key, flight, fn), daemon=True
+                ).start()
+            try:
+                result = self._wait(flight, on_item)
+            except Exception:
+                if leader or shareable is None:
+                    raise
+                shared = False
+            else:
+                shared = leader or shareable is None or shareable(result)
+        finally:
+            self._leave(key, flight)
+        if shared:
+            return result
+
+        # The call this one joined failed: retry alone, without the flight
+        with self._lock:
+            self._stats["retried"] += 1
+        return fn(on_item or (lambda item: None), threading.Event())
+
+    def _run(self, key: str, flight: _Flight, fn):
+        try:
+            result, error = fn(flight.publish, flight.cancelled), None
+        except BaseException as e:  # Re-raised in every waiter
+            result, error = None, e
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        with flight.condition:
+            flight.result, flight.error = result, error
+            flight.done = True
+            flight.condition.notify_all()
+
+    def _wait(self, flight: _Flight, on_item):
+        delivered = 0
+        while True:
+            with flight.condition:
+                while delivered == len(flight.items) and not flight.done:
+                    flight.condition.wait()
+                items = flight.items[delivered:]
+                done = flight.done
+            # Callbacks run outside the lock so a slow waiter blocks no one
+            for item in items:
+                if on_item:
+                    on_item(item)
+            delivered += len(items)
+            if done and delivered == len(flight.items):
+                break
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    def _leave(self, key: str, flight: _Flight):
+        with self._lock:
+            flight.waiters -= 1
+            if flight.waiters or flight.done:
+                return
+            # Nobody is left to receive the result: stop the call and let
+            # the next identical request start a fresh one
+            flight.cancelled.set()
+            self._stats["cancelled"] += 1
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    def stats(self) -> dict:
+        """
+        Calls started, requests that joined one, calls cancelled and
+        joined requests that retried on their own.
+        """
+        with self._lock:
+            return {**self._stats, "in_flight": len(self._flights)}
+
+
+# Global instance
+generation_flights = SingleFlight()
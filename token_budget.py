@@ -0,0 +1,153 @@
+"""
+Ước lượng token và ngân sách token cho Gemini: số token đầu vào theo chữ viết
+(Latin, tiếng Việt có dấu, CJK), maxOutputTokens theo số thẻ và ngôn ngữ,
+hiệu chỉnh dần bằng số token thực tế mỗi thẻ lấy từ usageMetadata
+"""
+
+import os
+import re
+import threading
+from typing import Dict, Optional
+
+# Upper bound on content tokens sent per generation, across all chunks
+INPUT_TOKEN_BUDGET = int(os.getenv("FLASHCARD_INPUT_TOKENS", "12000"))
+# Content tokens worth sending per requested card, and the floor for that
+INPUT_TOKENS_PER_CARD = 600
+MIN_INPUT_TOKENS = 2000
+
+# Starting guess of output tokens per card (JSON object included), by language
+DEFAULT_TOKENS_PER_CARD = {"vi": 80, "en": 55, "ja": 100, "fr": 70}
+FALLBACK_TOKENS_PER_CARD = 80
+RESPONSE_OVERHEAD_TOKENS = 64  # Array brackets, preamble, trailing text
+OUTPUT_SAFETY_FACTOR = 1.3  # Headroom over the expected output length
+MIN_OUTPUT_TOKENS = 256
+MAX_OUTPUT_TOKENS = 8192
+# Weight of each new observation in the per-card moving average
+EWMA_ALPHA = 0.2
+# Per-card estimate growth after a response hit maxOutputTokens
+TRUNCATION_GROWTH = 1.25
+
+# Approximate tokens per character for each kind of script
+ASCII_CHARS_PER_TOKEN = 4
+OTHER_CHARS_PER_TOKEN = 2  # Accented Latin, Vietnamese, Cyrillic...
+CJK_TOKENS_PER_CHAR = 1.0
+
+# Kana, CJK ideographs, Hangul and full-width forms (a regex character range)
+CJK_CHARS = r"\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uff00-\uffef"
+_CJK_RE = re.compile(f"[{CJK_CHARS}]")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Token estimate that accounts for the script: about four ASCII
+    characters per token, two for other alphabetic text (such as
+    Vietnamese with diacritics) and one token per CJK character.
+    """
+    if text.isascii():
+        return (len(text) + ASCII_CHARS_PER_TOKEN - 1) // ASCII_CHARS_PER_TOKEN
+    cjk = len(_CJK_RE.findall(text))
+    ascii_chars = len(text.encode("ascii", "ignore"))
+    other = len(text) - cjk - ascii_chars
+    tokens = (
+        ascii_chars / ASCII_CHARS_PER_TOKEN
+        + other / OTHER_CHARS_PER_TOKEN
+        + cjk * CJK_TOKENS_PER_CHAR
+    )
+    return int(tokens + 0.999)
+
+
+def input_token_budget(num_cards: int) -> int:
+    """Content tokens to send for ``num_cards`` cards, capped by INPUT_TOKEN_BUDGET."""
+    wanted = max(MIN_INPUT_TOKENS, num_cards * INPUT_TOKENS_PER_CARD)
+    return min(INPUT_TOKEN_BUDGET, wanted)
+
+
+class TokenStats:
+    """
+    Thread-safe moving average of output tokens per card for each language,
+    updated from the usage metadata of real responses.
+    """
+
+    def __init__(self, alpha: float = EWMA_ALPHA):
+        self.alpha = alpha
+        self._per_card: Dict[str, float] = {}
+        self._samples: Dict[str, int] = {}
+        self._truncated: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _current(self, language: str) -> float:
+        default = DEFAULT_TOKENS_PER_CARD.get(language, FALLBACK_TOKENS_PER_CARD)
+        return self._per_card.get(language, default)
+
+    def tokens_per_card(self, language: str) -> float:
+        with self._lock:
+            return self._current(language)
+
+    def record(
+        self,
+        language: str,
+        output_tokens: Optional[int],
+        cards: int,
+        truncated: bool = False,
+    ):
+        """
+        Fold one response into the average. A response cut off by
+        maxOutputTokens also grows the estimate, so the next budget for the
+        language is larger.
+        """
+        if not truncated and not (output_tokens and cards):
+            return
+        with self._lock:
+            current = self._current(language)
+            if output_tokens and cards:
+                current += self.alpha * (output_tokens / cards - current)
+                self._samples[language] = self._samples.get(language, 0) + 1
+            if truncated:
+                current *= TRUNCATION_GROWTH
+                self._truncated[language] = self._truncated.get(language, 0) + 1
+            self._per_card[language] = current
+
+    def record_usage(self, language: str, usage: dict, cards: int):
+        """Record a Gemini REST response from its usageMetadata and finishReason."""
+        self.record(
+            language,
+            usage.get("candidatesTokenCount"),
+            cards,
+            truncated=usage.get("finishReason") == "MAX_TOKENS",
+        )
+
+    def snapshot(self) -> dict:
+        """Per-language averages and sample counts, for display."""
+        with self._lock:
+            return {
+                language: {
+                    "tokens_per_card": round(value, 1),
+                    "samples": self._samples.get(language, 0),
+                    "truncated": self._truncated.get(language, 0),
+                }
+                for language, value in self._per_card.items()
+            }
+
+
+def output_token_budget(
+    num_cards: int, language: str, stats: Optional["TokenStats"] = None
+) -> int:
+    """
+    maxOutputTokens for a request of ``num_cards`` cards in ``language``.
+
+    Args:
+        num_cards: Number of cards requested
+        language: Language of the generated cards
+        stats: Observed statistics (defaults to the process-wide token_stats)
+
+    Returns:
+        int: Budget between MIN_OUTPUT_TOKENS and MAX_OUTPUT_TOKENS
+    """
+    stats = stats or token_stats
+    expected = RESPONSE_OVERHEAD_TOKENS + num_cards * stats.tokens_per_card(language)
+    budget = int(expected * OUTPUT_SAFETY_FACTOR)
+    return max(MIN_OUTPUT_TOKENS, min(MAX_OUTPUT_TOKENS, budget))
+
+
+# Global instance
+token_stats = TokenStats()
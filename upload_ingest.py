@@ -0,0 +1,88 @@
+"""
+Tiếp nhận file tải lên: băm nội dung và ghi tạm ra đĩa với file lớn,
+để mỗi lượt tải lên chỉ giữ khoảng một bản sao trong bộ nhớ
+"""
+
+import hashlib
+import os
+import tempfile
+from contextlib import contextmanager
+
+CHUNK_SIZE = 1024 * 1024
+
+# Uploads larger than this are spooled to a temporary file before parsing
+SPOOL_THRESHOLD = int(os.getenv("FLASHCARD_SPOOL_THRESHOLD_MB", "8")) * 1024 * 1024
+
+
+def _iter_chunks(uploaded_file, chunk_size=CHUNK_SIZE):
+    """
+    Yield the file content in chunks without copying it.
+
+    In-memory uploads (Streamlit's UploadedFile is a BytesIO) are sliced
+    through a memoryview; anything else is read in chunks.
+    """
+    if hasattr(uploaded_file, "getbuffer"):
+        with uploaded_file.getbuffer() as view:
+            for start in range(0, len(view), chunk_size):
+                with view[start : start + chunk_size] as chunk:
+                    yield chunk
+        return
+
+    uploaded_file.seek(0)
+    while chunk := uploaded_file.read(chunk_size):
+        yield chunk
+    uploaded_file.seek(0)
+
+
+def upload_size(uploaded_file):
+    """Size of an uploaded file in bytes."""
+    size = getattr(uploaded_file, "size", None)
+    if size is not None:
+        return size
+    position = uploaded_file.tell()
+    size = uploaded_file.seek(0, os.SEEK_END)
+    uploaded_file.seek(position)
+    return size
+
+
+def file_sha256(uploaded_file):
+    """Hash an uploaded file without materializing another copy of it."""
+    digest = hashlib.sha256()
+    for chunk in _iter_chunks(uploaded_file):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+@contextmanager
+def spooled_upload(uploaded_file, threshold=SPOOL_THRESHOLD):
+    """
+    Give extractors a seekable binary view of an upload.
+
+    Small uploads are handed over as-is. Larger ones are written to a
+    temporary file once (straight from the upload's buffer) and extractors
+    read from that file instead, so parsers that slurp or re-wrap their
+    input never duplicate the in-memory upload. The temporary file is
+    removed on exit.
+
+    Args:
+        uploaded_file: The uploaded file object
+        threshold: Size in bytes above which the upload is spooled to disk
+
+    Yields:
+        A seekable binary file object positioned at the start
+    """
+    if upload_size(uploaded_file) <= threshold:
+        uploaded_file.seek(0)
+        yield uploaded_file
+        return
+
+    suffix = os.path.splitext(getattr(uploaded_file, "name", "") or "")[1]
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            for chunk in _iter_chunks(uploaded_file):
+                tmp.write(chunk)
+        with open(path, "rb") as spooled:
+            yield spooled
+    finally:
+        os.unlink(path)
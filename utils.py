@@ -1,69 +1,443 @@
-import io
+import multiprocessing
+import os
 import re
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Callable, Iterator, Optional, Tuple
+
 import PyPDF2
 from pptx import Presentation
+from pptx.shapes.group import GroupShape
 import streamlit as st
 
+from cache import TieredCache, hash_key
+from upload_ingest import file_sha256, spooled_upload
+
+
+@dataclass
+class ExtractedPage:
+    number: int  # 1-based page number in the source document
+    text: str  # Normalized text of the page
+
+
+_HORIZONTAL_SPACE_RE = re.compile(r"[^\S\n]+")
+
+# Below this many selected pages, process start-up costs more than it saves
+PARALLEL_MIN_PAGES = 40
+# Worker processes for PDF extraction (None = one per CPU)
+PDF_MAX_WORKERS = int(os.getenv("FLASHCARD_PDF_WORKERS", "0")) or None
 
-def extract_text_from_pdf(pdf_file):
+# Workers are started from a clean process, never forked from the Streamlit
+# server with its threads and locks; forkserver where the platform has it
+_PDF_POOL_START_METHOD = (
+    "forkserver"
+    if "forkserver" in multiprocessing.get_all_start_methods()
+    else "spawn"
+)
+
+# Bump whenever extraction output changes so stale cache entries are ignored
+EXTRACTOR_VERSION = "4"
+# Between the pages of extracted PDF text. A form feed line marks a real
+# page break (content_selection looks for running headers only across
+# these); it is whitespace to everything else
+PAGE_BREAK = "\n\f\n"
+
+# Shared by every session on this server: Streamlit reruns the script on
+# each click, but the same upload is only parsed once
+extraction_cache = TieredCache(
+    "extraction", max_entries=16, max_chars=64 * 1024 * 1024
+)
+
+
+def normalize_page_text(text):
     """
-    Extract text from a PDF file.
+    Collapse runs of whitespace inside each line and drop empty lines.
+
+    Line breaks are kept so later steps can still tell headers, footers and
+    paragraphs apart.
+    """
+    if not text:
+        return ""
+    lines = (_HORIZONTAL_SPACE_RE.sub(" ", line).strip() for line in text.splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def resolve_page_range(page_range: Optional[Tuple[int, int]], total: int) -> range:
+    """
+    Turn a 1-based, inclusive (first, last) page range into 0-based indices.
 
     Args:
-        pdf_file: The uploaded PDF file object
+        page_range: (first, last) pair, or None for the whole document.
+            A last page of 0 or None means "until the end".
+        total: Number of pages in the document
 
     Returns:
-        str: Extracted text from the PDF
+        range: 0-based page indices to extract
+    """
+    if page_range is None:
+        return range(total)
+
+    first, last = page_range
+    first = max(1, first or 1)
+    last = total if not last else min(last, total)
+    if first > last:
+        raise ValueError(f"Khoảng trang không hợp lệ: {first}-{last} (tổng {total})")
+    return range(first - 1, last)
+
+
+def iter_pdf_pages(
+    pdf_file,
+    page_range: Optional[Tuple[int, int]] = None,
+    progress_callback: Optional[Callable[[int, int], None]] = None,
+) -> Iterator[ExtractedPage]:
+    """
+    Lazily extract normalized text from a PDF, one page at a time.
+
+    Args:
+        pdf_file: The uploaded PDF file object
+        page_range: Optional 1-based, inclusive (first, last) page range
+        progress_callback: Optional callable receiving (done, total) after
+            each page, where total is the number of selected pages
+
+    Yields:
+        ExtractedPage: The page number and its normalized text
+    """
+    pdf_reader = PyPDF2.PdfReader(pdf_file)
+    indices = resolve_page_range(page_range, len(pdf_reader.pages))
+    yield from _iter_reader_pages(pdf_reader, indices, progress_callback)
+
+
+def _iter_reader_pages(pdf_reader, indices, progress_callback=None):
+    for done, page_num in enumerate(indices, start=1):
+        page = pdf_reader.pages[page_num]
+        yield ExtractedPage(page_num + 1, normalize_page_text(page.extract_text()))
+        if progress_callback:
+            progress_callback(done, len(indices))
+
+
+def _extract_pdf_page_batch(pdf_path, page_indices):
+    """Worker entry point: open the PDF independently and extract a batch."""
+    pdf_reader = PyPDF2.PdfReader(pdf_path)
+    return [
+        (page_num, normalize_page_text(pdf_reader.pages[page_num].extract_text()))
+        for page_num in page_indices
+    ]
+
+
+_pdf_pool = None
+_pdf_pool_workers = 0
+_pdf_pool_lock = threading.Lock()
+
+
+def _get_pdf_pool(workers):
+    """
+    The process pool shared by every extraction, started on first use and
+    kept so later uploads skip worker start-up.
+    """
+    global _pdf_pool, _pdf_pool_workers
+    with _pdf_pool_lock:
+        if _pdf_pool is None or _pdf_pool_workers != workers:
+            if _pdf_pool is not None:
+                _pdf_pool.shutdown(wait=False)  # Running batches still finish
+            _pdf_pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context(_PDF_POOL_START_METHOD),
+            )
+            _pdf_pool_workers = workers
+        return _pdf_pool
+
+
+def _discard_pdf_pool(pool):
+    """Drop a broken pool so the next extraction starts a new one."""
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is pool:
+            _pdf_pool = None
+
+
+def _split_batches(indices, batch_count):
+    batch_size = max(1, -(-len(indices) // batch_count))
+    return [indices[i : i + batch_size] for i in range(0, len(indices), batch_size)]
+
+
+def iter_pdf_pages_parallel(
+    pdf_file,
+    page_range: Optional[Tuple[int, int]] = None,
+    progress_callback: Optional[Callable[[int, int], None]] = None,
+    max_workers: Optional[int] = PDF_MAX_WORKERS,
+    min_pages: int = PARALLEL_MIN_PAGES,
+    pdf_path: Optional[str] = None,
+) -> Iterator[ExtractedPage]:
+    """
+    Extract PDF pages on a process pool, yielding them in page order.
+
+    Each worker opens the document on its own from a shared temporary file
+    and extracts a contiguous batch of pages. The pool is shared across
+    calls and kept alive. Small selections (fewer than ``min_pages`` pages)
+    or ``max_workers=1`` use the serial path.
+
+    Args:
+        pdf_file: The uploaded PDF file object
+        page_range: Optional 1-based, inclusive (first, last) page range
+        progress_callback: Optional callable receiving (done, total)
+        max_workers: Number of worker processes (None = one per CPU)
+        min_pages: Minimum number of selected pages to go parallel
+        pdf_path: Path of a file on disk holding the same PDF (the spooled
+            upload), opened by the workers instead of a fresh copy. Never
+            taken from ``pdf_file.name``, which is the client's file name
+
+    Yields:
+        ExtractedPage: The page number and its normalized text
     """
+    pdf_reader = PyPDF2.PdfReader(pdf_file)
+    indices = resolve_page_range(page_range, len(pdf_reader.pages))
+    workers = max_workers or os.cpu_count() or 1
+
+    if workers <= 1 or len(indices) < min_pages:
+        yield from _iter_reader_pages(pdf_reader, indices, progress_callback)
+        return
+
+    # Workers need a path they can open: reuse the spooled upload if there
+    # is one, otherwise write the upload out once
+    owns_file = pdf_path is None
+    if owns_file:
+        pdf_file.seek(0)
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
+            while chunk := pdf_file.read(1024 * 1024):
+                tmp.write(chunk)
+            pdf_path = tmp.name
+
     try:
-        pdf_reader = PyPDF2.PdfReader(pdf_file)
-        text = ""
+        # A few batches per worker keeps the pool busy when pages are uneven
+        batches = _split_batches(list(indices), workers * 4)
+        results = {}
+        next_index = 0
+        done = 0
+        pool = _get_pdf_pool(workers)
+        futures = [
+            pool.submit(_extract_pdf_page_batch, pdf_path, batch) for batch in batches
+        ]
+        try:
+            for future in as_completed(futures):
+                for page_num, text in future.result():
+                    results[page_num] = text
+                    done += 1
+                    if progress_callback:
+                        progress_callback(done, len(indices))
 
-        for page_num in range(len(pdf_reader.pages)):
-            page = pdf_reader.pages[page_num]
-            text += page.extract_text() + "\n\n"
+                # Hand out every page that is now contiguous with what was
+                # already yielded
+                while next_index < len(indices) and indices[next_index] in results:
+                    page_num = indices[next_index]
+                    yield ExtractedPage(page_num + 1, results.pop(page_num))
+                    next_index += 1
+        except BrokenProcessPool:
+            _discard_pdf_pool(pool)
+            raise
+        finally:
+            # Abandoned early (or failed): leave the shared pool to others
+            for future in futures:
+                future.cancel()
+    finally:
+        if owns_file:
+            os.unlink(pdf_path)
 
-        # Clean the text
-        text = re.sub(r"\s+", " ", text)
-        text = text.strip()
 
-        return text
+def extract_text_from_pdf(
+    pdf_file,
+    page_range=None,
+    progress_callback=None,
+    max_workers=PDF_MAX_WORKERS,
+    pdf_path=None,
+):
+    """
+    Extract text from a PDF file.
+
+    Large documents are extracted on a process pool; small ones (or
+    ``max_workers=1``) are read serially.
+
+    Args:
+        pdf_file: The uploaded PDF file object
+        page_range: Optional 1-based, inclusive (first, last) page range
+        progress_callback: Optional callable receiving (done, total)
+        max_workers: Number of worker processes (None = one per CPU)
+        pdf_path: Optional path of the spooled copy of ``pdf_file``
+
+    Returns:
+        str: Extracted text from the PDF, pages separated by PAGE_BREAK
+    """
+    try:
+        pages = [
+            page.text
+            for page in iter_pdf_pages_parallel(
+                pdf_file,
+                page_range,
+                progress_callback,
+                max_workers,
+                pdf_path=pdf_path,
+            )
+            if page.text
+        ]
+        return PAGE_BREAK.join(pages)
     except Exception as e:
         st.error(f"Lỗi khi trích xuất văn bản từ PDF: {str(e)}")
         raise
 
 
-def extract_text_from_pptx(pptx_file):
+def _iter_shape_text(shapes):
+    """Yield the text of every text-bearing shape, descending into groups."""
+    for shape in shapes:
+        if isinstance(shape, GroupShape):
+            yield from _iter_shape_text(shape.shapes)
+        elif shape.has_text_frame:
+            if shape.text_frame.text:
+                yield shape.text_frame.text
+        elif shape.has_table:
+            for row in shape.table.rows:
+                cells = [cell.text for cell in row.cells if cell.text]
+                if cells:
+                    yield " | ".join(cells)
+        # Pictures, charts, media etc. carry no extractable text
+
+
+def iter_pptx_slides(
+    pptx_file,
+    slide_range: Optional[Tuple[int, int]] = None,
+    include_notes: bool = True,
+    progress_callback: Optional[Callable[[int, int], None]] = None,
+) -> Iterator[ExtractedPage]:
+    """
+    Lazily extract normalized text from a presentation, one slide at a time.
+
+    Covers text frames, table cells, shapes nested in groups and,
+    optionally, speaker notes.
+
+    Args:
+        pptx_file: The uploaded PPTX file object
+        slide_range: Optional 1-based, inclusive (first, last) slide range
+        include_notes: Whether to append each slide's speaker notes
+        progress_callback: Optional callable receiving (done, total) after
+            each slide, where total is the number of selected slides
+
+    Yields:
+        ExtractedPage: The slide number and its normalized text
+    """
+    pptx_file.seek(0)
+    slides = Presentation(pptx_file).slides
+    indices = resolve_page_range(slide_range, len(slides))
+
+    for done, slide_num in enumerate(indices, start=1):
+        slide = slides[slide_num]
+        parts = list(_iter_shape_text(slide.shapes))
+        if include_notes and slide.has_notes_slide:
+            notes_frame = slide.notes_slide.notes_text_frame
+            if notes_frame is not None and notes_frame.text:
+                parts.append(notes_frame.text)
+
+        yield ExtractedPage(slide_num + 1, normalize_page_text("\n".join(parts)))
+        if progress_callback:
+            progress_callback(done, len(indices))
+
+
+def extract_text_from_pptx(
+    pptx_file, slide_range=None, include_notes=True, progress_callback=None
+):
     """
     Extract text from a PowerPoint file.
 
     Args:
         pptx_file: The uploaded PPTX file object
+        slide_range: Optional 1-based, inclusive (first, last) slide range
+        include_notes: Whether to include speaker notes
+        progress_callback: Optional callable receiving (done, total)
 
     Returns:
-        str: Extracted text from the presentation
+        str: Extracted text from the presentation, slides separated by blank lines
     """
     try:
-        pptx_data = pptx_file.getvalue()
-        presentation = Presentation(io.BytesIO(pptx_data))
-
-        text = ""
-        for slide in presentation.slides:
-            slide_text = ""
-            for shape in slide.shapes:
-                try:
-                    if hasattr(shape, "text") and shape.text:
-                        slide_text += shape.text + " "
-                except:
-                    # Skip shapes that don't have text
-                    pass
-            text += slide_text.strip() + "\n\n"
-
-        # Clean the text
-        text = re.sub(r"\s+", " ", text)
-        text = text.strip()
-
-        return text
+        slides = [
+            slide.text
+            for slide in iter_pptx_slides(
+                pptx_file, slide_range, include_notes, progress_callback
+            )
+            if slide.text
+        ]
+        return "\n\n".join(slides)
     except Exception as e:
         st.error(f"Lỗi khi trích xuất văn bản từ PowerPoint: {str(e)}")
         raise
+
+
+def upload_digest(uploaded_file):
+    """
+    SHA-256 of an upload, hashed once per upload in this session.
+
+    Streamlit reruns the script on every interaction with the same upload
+    object, so the digest is remembered in st.session_state under the
+    upload's file_id (or its name and size) instead of re-reading the file.
+    """
+    upload_key = getattr(uploaded_file, "file_id", None) or (
+        uploaded_file.name,
+        uploaded_file.size,
+    )
+    remembered = st.session_state.get("upload_digest")
+    if remembered and remembered[0] == upload_key:
+        return remembered[1]
+    digest = file_sha256(uploaded_file)
+    st.session_state.upload_digest = (upload_key, digest)
+    return digest
+
+
+def extract_text_from_upload(
+    uploaded_file, page_range=None, progress_callback=None, include_notes=True
+):
+    """
+    Extract text from an uploaded PDF or PPTX, reusing cached results.
+
+    The cache key is the SHA-256 of the file content (see upload_digest)
+    plus the extractor version and options, so reruns and other sessions
+    uploading the same file skip parsing entirely.
+
+    Args:
+        uploaded_file: The uploaded file object (PDF or PPTX)
+        page_range: Optional 1-based, inclusive (first, last) page or slide range
+        progress_callback: Optional callable receiving (done, total)
+        include_notes: Whether to include speaker notes (PPTX only)
+
+    Returns:
+        str: Extracted text
+    """
+    file_extension = os.path.splitext(uploaded_file.name)[1].lower()
+    if file_extension not in (".pdf", ".pptx"):
+        raise ValueError(f"Định dạng file không được hỗ trợ: {file_extension}")
+
+    key = hash_key(
+        upload_digest(uploaded_file),
+        EXTRACTOR_VERSION,
+        file_extension,
+        page_range,
+        file_extension == ".pptx" and include_notes,
+    )
+    text = extraction_cache.get(key)
+    if text is not None:
+        return text
+
+    # Only parse through a spooled, file-backed view on a cache miss
+    with spooled_upload(uploaded_file) as source:
+        if file_extension == ".pdf":
+            # Only a spooled copy (a different object) is a file of ours on
+            # disk; the upload's own name comes from the client
+            spooled_path = source.name if source is not uploaded_file else None
+            text = extract_text_from_pdf(
+                source, page_range, progress_callback, pdf_path=spooled_path
+            )
+        else:
+            text = extract_text_from_pptx(
+                source, page_range, include_notes, progress_callback
+            )
+
+    extraction_cache.set(key, text)
+    return text